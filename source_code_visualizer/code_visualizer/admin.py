@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import AnalysisJob, StoredGraph
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'language', 'graphs', 'status', 'progress', 'created', 'finished')
+    list_filter = ('status', 'language')
+    search_fields = ('id', 'digest')
+    exclude = ('code', 'result')
+
+
+@admin.register(StoredGraph)
+class StoredGraphAdmin(admin.ModelAdmin):
+    list_display = ('id', 'language', 'graph', 'analysis_version', 'node_count', 'edge_count', 'created')
+    list_filter = ('graph', 'language')
+    search_fields = ('id', 'digest')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CodeVisualizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'code_visualizer'
+
+    def ready(self):
+        from .frontends import frontend_options, preload
+        if frontend_options()['PRELOAD']:
+            preload()
@@ -0,0 +1,197 @@
+"""Multi-file analysis fanned out over a process pool."""
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .cache import code_digest
+from .frontends import get_frontend, language_for
+from .symbols import SymbolIndex, build_call_graph, file_symbols_for
+
+DEFAULT_MAX_FILES = 500
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_PROJECT_INDEXES = 16
+
+
+class BatchError(Exception):
+    """Raised when a batch as a whole cannot be accepted."""
+
+
+def batch_options():
+    """Return ``CODE_VISUALIZER_BATCH`` merged over the defaults."""
+    options = {
+        'WORKERS': None,
+        'MAX_FILES': DEFAULT_MAX_FILES,
+        'MAX_BYTES': DEFAULT_MAX_BYTES,
+        'PROJECT_INDEXES': DEFAULT_PROJECT_INDEXES,
+    }
+    options.update(getattr(settings, 'CODE_VISUALIZER_BATCH', {}))
+    return options
+
+
+# project -> (SymbolIndex, lock held while the project is analyzed)
+_project_indexes = OrderedDict()
+_project_indexes_lock = threading.Lock()
+
+
+def project_index(project):
+    """Return ``(index, lock)`` for the process-wide symbol index of ``project``.
+
+    Only the ``PROJECT_INDEXES`` most recently used projects are kept.
+    """
+    with _project_indexes_lock:
+        entry = _project_indexes.get(project)
+        if entry is None:
+            entry = _project_indexes[project] = (SymbolIndex(), threading.Lock())
+            while len(_project_indexes) > batch_options()['PROJECT_INDEXES']:
+                _project_indexes.popitem(last=False)
+        else:
+            _project_indexes.move_to_end(project)
+        return entry
+
+
+@receiver(setting_changed)
+def _reset_project_indexes(setting, **kwargs):
+    if setting == 'CODE_VISUALIZER_BATCH':
+        with _project_indexes_lock:
+            _project_indexes.clear()
+
+
+def read_zip(fileobj, max_files=DEFAULT_MAX_FILES, max_bytes=DEFAULT_MAX_BYTES):
+    """Return ``(name, source bytes)`` for the supported files in a zip archive.
+
+    The uncompressed size declared in the archive is checked before
+    anything is extracted.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Invalid zip archive: {e}") from e
+    with archive:
+        members = [info for info in archive.infolist() if not info.is_dir() and language_for(info.filename)]
+        if len(members) > max_files:
+            raise BatchError(f"Archive contains more than {max_files} source files")
+        if sum(info.file_size for info in members) > max_bytes:
+            raise BatchError(f"Archive expands to more than {max_bytes} bytes")
+        return [(info.filename, archive.read(info)) for info in members]
+
+
+def analyze_source(name, source, graph_names, indexed_digest=None):
+    """Parse one file and build its graphs; errors are returned, not raised.
+
+    Symbols are only extracted if the file's digest differs from
+    ``indexed_digest``, that of the version already in the symbol index.
+    """
+    language = language_for(name)
+    result = {"file": name, "language": language}
+    if language is None:
+        result["error"] = "Unsupported file type"
+        return result
+    try:
+        code = source.decode('utf-8') if isinstance(source, bytes) else source
+        frontend = get_frontend(language)
+        tree = frontend.parse(code)
+        builders = frontend.builders
+        result["graphs"] = {graph: builders[graph](tree) for graph in graph_names}
+        if getattr(tree, 'errors', None):
+            result["parse_errors"] = tree.errors
+        result["digest"] = code_digest(code)
+        if result["digest"] != indexed_digest:
+            result["symbols"] = file_symbols_for(tree, language, name)
+    except UnicodeDecodeError:
+        result["error"] = "File is not valid UTF-8"
+    except SyntaxError as e:
+        result["error"] = f"Syntax error in {language} code: {e}"
+    except Exception as e:
+        result["error"] = f"Error processing {language} code: {e}"
+    return result
+
+
+def _init_worker():
+    # Spawned (non-forked) workers need the app registry before importing views.
+    import django
+    django.setup()
+
+
+def summarize(results, graph_names):
+    """Return cross-file totals for a list of per-file results."""
+    totals = {graph: {"nodes": 0, "edges": 0} for graph in graph_names}
+    languages = {}
+    failed = 0
+    for result in results:
+        if "error" in result:
+            failed += 1
+            continue
+        languages[result["language"]] = languages.get(result["language"], 0) + 1
+        for graph, data in result["graphs"].items():
+            totals[graph]["nodes"] += len(data["nodes"])
+            totals[graph]["edges"] += len(data["edges"])
+    return {
+        "files": len(results),
+        "analyzed": len(results) - failed,
+        "failed": failed,
+        "languages": languages,
+        "graphs": totals,
+    }
+
+
+def analyze_files(files, graph_names, workers=None, index=None, project=None):
+    """Analyze ``(name, source)`` pairs, in parallel when it pays off.
+
+    Returns ``{"files": [...], "summary": {...}, "call_graph": {...}}``
+    with one entry per input file in input order. A file that fails (or
+    crashes its worker) gets an ``error`` entry instead of failing the
+    batch. The project call graph resolves calls across files through a
+    symbol index: an existing ``index``, the process-wide one of
+    ``project``, or a new one. The files are taken to be the whole
+    project, so an index is brought up to date with them: unchanged
+    files keep their symbols, and files that are gone or fail are removed.
+    """
+    files = list(files)
+    if workers is None:
+        workers = batch_options()['WORKERS'] or os.cpu_count() or 1
+    workers = min(workers, len(files))
+    lock = nullcontext()
+    if index is None and project:
+        index, lock = project_index(project)
+    elif index is None:
+        index = SymbolIndex()
+
+    with lock:
+        indexed = {path: digest for path, (digest, _) in index.files.items()}
+        if workers <= 1:
+            results = [analyze_source(name, source, graph_names, indexed.get(name)) for name, source in files]
+        else:
+            results = []
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                futures = [executor.submit(analyze_source, name, source, graph_names, indexed.get(name))
+                           for name, source in files]
+                for (name, _), future in zip(files, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append({"file": name, "language": language_for(name),
+                                        "error": f"Worker failed: {e}"})
+
+        project_symbols = []
+        for result in results:
+            file_symbols = result.pop("symbols", None)
+            digest = result.pop("digest", None)
+            if file_symbols is not None:
+                index.update(file_symbols, digest)
+                project_symbols.append(file_symbols)
+            elif digest is not None:
+                project_symbols.append(index.files[result["file"]][1])
+        current = {file_symbols.path for file_symbols in project_symbols}
+        for path in [path for path in index.files if path not in current]:
+            index.remove(path)
+        call_graph = build_call_graph(index, project_symbols).to_dict(edge_attr='label')
+
+    return {"files": results, "summary": summarize(results, graph_names), "call_graph": call_graph}
@@ -0,0 +1,321 @@
+"""Reproducible benchmarks of parsing, graph building and serialization.
+
+The corpus is generated, so every run measures the same inputs: Python
+and Java files in a few sizes plus pathologically deep ones. Each file is
+timed stage by stage (parse, each graph builder, JSON and compact
+serialization) on exactly the code paths the views use. Cold starts are
+timed separately, by importing the views in fresh interpreters. Results
+are plain dicts that can be saved as JSON and compared with an earlier
+run.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from .frontends import get_frontend
+from .views import GRAPH_TYPES, _encode_json
+from .wire import compact_payload
+
+RESULTS_VERSION = 1
+
+# Generated inputs: number of functions/classes per file.
+SIZES = {'small': 10, 'medium': 200, 'huge': 2000}
+# Nesting levels of the deep inputs. Python allows at most 100 indented
+# blocks; Java is limited by javalang's recursive descent.
+DEEP_BLOCKS = {'python': 90, 'java': 150}
+DEEP_TERMS = 900
+
+CORPUS_SIZES = tuple(SIZES) + ('deep',)
+CORPUS_LANGUAGES = ('python', 'java')
+# Slowdown over the baseline, as a fraction, reported as a regression.
+DEFAULT_THRESHOLD = 0.25
+# Differences smaller than this many seconds are noise.
+MIN_DIFFERENCE = 0.005
+
+# What a fresh interpreter does after importing the views, per scenario.
+IMPORT_SCENARIOS = {
+    'views': "",
+    'python': "views.generate_control_flow_graph('x = 1', 'python')",
+    'java': "views.generate_control_flow_graph('class A {}', 'java')",
+    'preload': "from code_visualizer.frontends import preload\npreload()",
+    'export': "import code_visualizer.export",
+}
+# Modules worth deferring; each scenario reports which of them it loaded.
+HEAVY_MODULES = ('javalang.parser', 'graphviz.backend', 'networkx', 'concurrent.futures.process')
+IMPORT_SCRIPT = """
+import json, sys, time
+import django
+django.setup()
+start = time.perf_counter()
+import code_visualizer.views as views
+{body}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": [name for name in {modules!r} if name in sys.modules]}}))
+"""
+
+
+def python_source(units):
+    """Generate a Python module with ``units`` functions and classes."""
+    lines = ["import os", "from collections import defaultdict", ""]
+    for i in range(units):
+        if i % 4 == 3:
+            lines += [
+                f"class Model{i}(Base):",
+                f"    size = {i}",
+                "    def __init__(self, items):",
+                "        self.items = [item for item in items if item]",
+                "    def total(self, scale=1):",
+                "        result = 0",
+                "        for item in self.items:",
+                "            try:",
+                "                result += item.value * scale",
+                "            except AttributeError as error:",
+                "                log(error)",
+                f"        return helper_{i - 1}(result)",
+                "",
+            ]
+        else:
+            lines += [
+                f"def helper_{i}(value, *args, limit={i}, **options):",
+                "    counts = defaultdict(int)",
+                "    while value > limit:",
+                "        value -= 1",
+                "        if value % 3 == 0:",
+                "            continue",
+                "        elif value % 7 == 0:",
+                "            break",
+                "        counts[value] += len(args)",
+                "    with open(os.devnull) as handle:",
+                "        handle.read()",
+                f"    return {{key: count for key, count in counts.items() if key != {i}}}",
+                "",
+            ]
+    lines += ["if __name__ == '__main__':", "    helper_0(10)"]
+    return "\n".join(lines)
+
+
+def java_source(units):
+    """Generate a Java file with ``units`` classes of a few methods each."""
+    parts = ["package demo;", "import java.util.List;", "import java.util.ArrayList;"]
+    for c in range(units):
+        parts += [
+            f"class Shape{c} extends Base implements Drawable {{",
+            "    private int size = 3;",
+            "    private List<Integer> items = new ArrayList<>();",
+            f"    public Shape{c}(int size) {{ this.size = size; }}",
+            "    public int area(int w, int h) {",
+            f"        int total = w * h + size + {c};",
+            "        for (int i = 0; i < items.size(); i++) {",
+            "            if (items.get(i) > total) { break; }",
+            "            total += items.get(i);",
+            "        }",
+            "        try {",
+            "            total = helper(total);",
+            "        } catch (IllegalStateException e) {",
+            "            total = -1;",
+            "        }",
+            "        return total;",
+            "    }",
+            "    private int helper(int value) {",
+            "        while (value > size) { value -= size; }",
+            "        switch (value) { case 0: return 0; default: return value * 2; }",
+            "    }",
+            "}",
+        ]
+    return "\n".join(parts)
+
+
+def deep_python_source():
+    """Generate Python code with deeply nested blocks and a long expression."""
+    blocks = DEEP_BLOCKS['python']
+    lines = ["def deep(x):"]
+    lines += ["    " * (level + 1) + f"if x > {level}:" for level in range(blocks)]
+    lines.append("    " * (blocks + 1) + "x = " + " + ".join(["x"] * DEEP_TERMS))
+    lines.append("    return x")
+    return "\n".join(lines)
+
+
+def deep_java_source():
+    """Generate Java code with deeply nested blocks and a long expression."""
+    blocks = DEEP_BLOCKS['java']
+    body = "".join(f"if (x > {level}) {{ " for level in range(blocks))
+    body += "x = " + " + ".join(["x"] * DEEP_TERMS) + "; " + "} " * blocks
+    return f"class Deep {{ int deep(int x) {{ {body}return x; }} }}"
+
+
+def corpus(sizes=CORPUS_SIZES, languages=('python', 'java')):
+    """Return the generated benchmark inputs as ``(name, language, code)``."""
+    generators = {
+        'python': (python_source, deep_python_source),
+        'java': (java_source, deep_java_source),
+    }
+    inputs = []
+    for size in sizes:
+        for language in languages:
+            generate, generate_deep = generators[language]
+            code = generate_deep() if size == 'deep' else generate(SIZES[size])
+            inputs.append((f"{language}/{size}", language, code))
+    return inputs
+
+
+def _time(function, repeat):
+    """Return the result of ``function`` and the seconds of each of ``repeat`` calls."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def _peak_memory(function):
+    """Return the peak bytes allocated during one call of ``function``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _stage(function, repeat, memory):
+    result, timings = _time(function, repeat)
+    stage = {
+        "min": min(timings),
+        "median": statistics.median(timings),
+    }
+    if memory:
+        # Tracing slows allocation down, so it gets a run of its own.
+        stage["peak_bytes"] = _peak_memory(function)
+    return result, stage
+
+
+def run_input(language, code, graph_names=GRAPH_TYPES, repeat=3, memory=True):
+    """Benchmark one input; returns its stages, node/edge counts and sizes."""
+    builders = get_frontend(language).builders
+    stages = {}
+    tree, stages["parse"] = _stage(lambda: get_frontend(language).parse(code), repeat, memory)
+    graphs = {}
+    for name in graph_names:
+        graphs[name], stages[name] = _stage(lambda: builders[name](tree), repeat, memory)
+    payload, stages["json"] = _stage(lambda: _encode_json(graphs), repeat, memory)
+    compact, stages["compact"] = _stage(
+        lambda: _encode_json(compact_payload(graphs, graph_names)), repeat, memory)
+    return {
+        "language": language,
+        "bytes": len(code.encode('utf-8')),
+        "lines": code.count("\n") + 1,
+        "stages": stages,
+        "graphs": {name: {"nodes": len(graph["nodes"]), "edges": len(graph["edges"])}
+                   for name, graph in graphs.items()},
+        "json_bytes": len(payload),
+        "compact_bytes": len(compact),
+    }
+
+
+def _import_run(body):
+    """Return ``(seconds, heavy modules loaded)`` of one cold import in a fresh interpreter."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+    script = IMPORT_SCRIPT.format(body=body, modules=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result["seconds"], result["modules"]
+
+
+def measure_imports(repeat=5, scenarios=IMPORT_SCENARIOS):
+    """Time importing the views, then each scenario, in ``repeat`` fresh interpreters.
+
+    The first run of each scenario is not timed: it writes the bytecode
+    caches (where the environment allows), as a deployed server would
+    have them. Returns ``{scenario: {"min", "median", "modules"}}``.
+    """
+    results = {}
+    for name, body in scenarios.items():
+        _, modules = _import_run(body)
+        timings = [_import_run(body)[0] for _ in range(repeat)]
+        results[name] = {"min": min(timings), "median": statistics.median(timings), "modules": modules}
+    return results
+
+
+def run(inputs, graph_names=GRAPH_TYPES, repeat=3, memory=True, progress=None, imports=False):
+    """Benchmark every ``(name, language, code)`` input, and cold imports if ``imports``."""
+    results = {}
+    for name, language, code in inputs:
+        if progress is not None:
+            progress(name)
+        results[name] = run_input(language, code, graph_names, repeat, memory)
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "recursion_limit": sys.getrecursionlimit(),
+        "repeat": repeat,
+        "inputs": results,
+    }
+    if imports:
+        if progress is not None:
+            progress('imports')
+        report["imports"] = measure_imports(max(repeat, 5))
+    return report
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Return the stages of ``current`` that got slower than ``baseline``.
+
+    Medians are compared; a stage regresses when it is more than
+    ``threshold`` (a fraction) and ``MIN_DIFFERENCE`` seconds slower, or
+    when its graph has a different number of nodes or edges. Cold
+    imports are compared the same way (as input ``import``) and also
+    regress when they load a heavy module they did not load before.
+    Returns a list of ``{"input", "stage", "baseline", "current",
+    "change"}`` dicts.
+    """
+    regressions = []
+    for name, result in current["inputs"].items():
+        before = baseline.get("inputs", {}).get(name)
+        if before is None:
+            continue
+        for stage, timing in result["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None:
+                continue
+            difference = timing["median"] - old["median"]
+            if difference > MIN_DIFFERENCE and difference > threshold * old["median"]:
+                regressions.append({
+                    "input": name, "stage": stage, "baseline": old["median"], "current": timing["median"],
+                    "change": difference / old["median"] if old["median"] else None,
+                })
+        for graph, counts in result["graphs"].items():
+            old = before["graphs"].get(graph)
+            if old is not None and old != counts:
+                regressions.append({
+                    "input": name, "stage": graph, "baseline": old, "current": counts, "change": None,
+                })
+    for scenario, timing in current.get("imports", {}).items():
+        old = baseline.get("imports", {}).get(scenario)
+        if old is None:
+            continue
+        difference = timing["median"] - old["median"]
+        if difference > MIN_DIFFERENCE and difference > threshold * old["median"]:
+            regressions.append({
+                "input": "import", "stage": scenario, "baseline": old["median"], "current": timing["median"],
+                "change": difference / old["median"] if old["median"] else None,
+            })
+        if set(timing["modules"]) - set(old["modules"]):
+            regressions.append({
+                "input": "import", "stage": scenario, "baseline": old["modules"], "current": timing["modules"],
+                "change": None,
+            })
+    return regressions
@@ -0,0 +1,237 @@
+"""Result cache for serialized visualization responses."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Bump whenever the graph builders change their output so stale cached
+# payloads are never served.
+ANALYSIS_VERSION = 8
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+DEFAULT_PARSE_TTL = 300
+DEFAULT_PARSE_MAX_ENTRIES = 32
+# Analyses kept as bases for incremental re-analysis.
+DEFAULT_INCREMENTAL_TTL = 600
+DEFAULT_INCREMENTAL_MAX_ENTRIES = 16
+
+
+class ParseTokenExpired(Exception):
+    """Raised when the tree for a parse token is no longer stored."""
+
+
+def code_digest(code):
+    """Return the content hash used to address ``code``."""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def make_cache_key(language, digest, *parts):
+    """Return the result cache key for code with ``digest`` in ``language``."""
+    return ':'.join(['code_visualizer', f'v{ANALYSIS_VERSION}', language, digest, *map(str, parts)])
+
+
+class LRUByteCache:
+    """In-process LRU of byte strings, bounded by their total size."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class ResultCache:
+    """Two-level cache: a local LRU in front of an optional Django cache.
+
+    The shared backend is any alias from ``settings.CACHES``; entries found
+    there are copied into the local LRU. The backend may be shared with
+    other apps, so ``clear`` leaves it alone: its entries are keyed by
+    ``ANALYSIS_VERSION`` and expire after ``timeout``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, shared_alias=None, timeout=DEFAULT_TIMEOUT):
+        self.local = LRUByteCache(max_bytes)
+        self.shared_alias = shared_alias
+        self.timeout = timeout
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self.local.set(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.timeout)
+
+    def clear(self):
+        """Empty the local LRU and reset the counters."""
+        self.local.clear()
+        with self._lock:
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "entries": len(self.local),
+            "bytes": self.local.size,
+        }
+
+
+class ParseStore:
+    """Short-lived in-process store of parsed trees keyed by parse token.
+
+    Lets follow-up requests for other graphs of the same code skip parsing.
+    Entries expire ``ttl`` seconds after they were stored.
+    """
+
+    def __init__(self, max_entries=DEFAULT_PARSE_MAX_ENTRIES, ttl=DEFAULT_PARSE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires, tree = entry
+            if expires < time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return tree
+
+    def put(self, token, tree):
+        with self._lock:
+            self._entries.pop(token, None)
+            self._entries[token] = (time.monotonic() + self.ttl, tree)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_result_cache = None
+_parse_store = None
+_incremental_store = None
+
+
+def get_result_cache():
+    """Return the process-wide result cache configured from settings.
+
+    ``CODE_VISUALIZER_CACHE`` may set ``MAX_BYTES``, ``BACKEND`` (a cache
+    alias) and ``TIMEOUT``.
+    """
+    global _result_cache
+    if _result_cache is None:
+        options = getattr(settings, 'CODE_VISUALIZER_CACHE', {})
+        _result_cache = ResultCache(
+            max_bytes=options.get('MAX_BYTES', DEFAULT_MAX_BYTES),
+            shared_alias=options.get('BACKEND'),
+            timeout=options.get('TIMEOUT', DEFAULT_TIMEOUT),
+        )
+    return _result_cache
+
+
+def get_parse_store():
+    """Return the process-wide parse store.
+
+    ``CODE_VISUALIZER_CACHE`` may set ``PARSE_TTL`` (seconds) and
+    ``PARSE_MAX_ENTRIES``.
+    """
+    global _parse_store
+    if _parse_store is None:
+        options = getattr(settings, 'CODE_VISUALIZER_CACHE', {})
+        _parse_store = ParseStore(
+            max_entries=options.get('PARSE_MAX_ENTRIES', DEFAULT_PARSE_MAX_ENTRIES),
+            ttl=options.get('PARSE_TTL', DEFAULT_PARSE_TTL),
+        )
+    return _parse_store
+
+
+def get_incremental_store():
+    """Return the process-wide store of analyses for incremental re-analysis.
+
+    ``CODE_VISUALIZER_CACHE`` may set ``INCREMENTAL_TTL`` (seconds) and
+    ``INCREMENTAL_MAX_ENTRIES``.
+    """
+    global _incremental_store
+    if _incremental_store is None:
+        options = getattr(settings, 'CODE_VISUALIZER_CACHE', {})
+        _incremental_store = ParseStore(
+            max_entries=options.get('INCREMENTAL_MAX_ENTRIES', DEFAULT_INCREMENTAL_MAX_ENTRIES),
+            ttl=options.get('INCREMENTAL_TTL', DEFAULT_INCREMENTAL_TTL),
+        )
+    return _incremental_store
+
+
+@receiver(setting_changed)
+def _reset_result_cache(setting, **kwargs):
+    global _result_cache, _parse_store, _incremental_store
+    if setting in ('CODE_VISUALIZER_CACHE', 'CACHES'):
+        _result_cache = None
+        _parse_store = None
+        _incremental_store = None
@@ -0,0 +1,656 @@
+"""Intraprocedural control-flow graphs made of basic blocks.
+
+Every function, method, class body and the module itself is a unit with
+an entry node, an exit node and the basic blocks in between. A block
+lists the statements that run one after the other; edges carry the
+reason control moves on (``true``/``false`` branches, ``loop``,
+``break``, ``continue``, ``return``, ``raise``, ``exception`` ...), or
+None when a block simply falls through to the next one.
+
+``return`` leaves the unit directly; ``finally`` blocks are entered on
+the way out of their ``try`` normally or by an exception only.
+
+Each unit is built in one pass over its statements. Nested definitions
+only add a ``def``/``class`` line to the enclosing block and are queued
+as units of their own, so no statement is visited twice.
+"""
+import ast
+from functools import cache
+
+from .engine import CompactGraph, TraversalLimitExceeded
+from .frontends import lazy_import
+
+javalang = lazy_import('javalang')
+
+# Longest statement text shown in a block, in characters.
+LABEL_WIDTH = 40
+
+
+class Unit:
+    """One function, method, class body or module in a control-flow graph.
+
+    ``node`` is the definition (or module) the unit was built from,
+    ``parent`` the unit it is nested in and ``types`` the enclosing Java
+    type declarations, innermost last. ``entry``, ``exit`` and ``blocks``
+    are node indexes in the builder's graph.
+    """
+
+    __slots__ = ('name', 'node', 'parent', 'types', 'entry', 'exit', 'blocks')
+
+    def __init__(self, name, node, parent, types=()):
+        self.name = name
+        self.node = node
+        self.parent = parent
+        self.types = types
+        self.entry = self.exit = None
+        self.blocks = []
+
+
+def _short(text):
+    line = text.split('\n', 1)[0]
+    return line if len(line) <= LABEL_WIDTH else line[:LABEL_WIDTH - 1] + '…'
+
+
+class ControlFlowBuilder:
+    """Build the units of one file into a single ``CompactGraph``.
+
+    Node ids are ``<unit>/entry``, ``<unit>/exit`` and ``<unit>/<n>`` for
+    the n-th block of a unit, where units are named by their dotted
+    qualified name (``Shape.area``; a second ``area`` in the same scope
+    is ``Shape.area#2``). Subclasses know the statements of a language.
+    """
+
+    def __init__(self, max_nodes=None, max_depth=None):
+        self.graph = CompactGraph()
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.statements = 0
+        self.queue = []
+        self.units = []
+        self.current = None
+        self.names = {}
+        self.lines = {}  # block node index -> statement texts
+        # Block node index -> the statements and expressions it evaluates,
+        # in order, for data-flow analyses.
+        self.items = {}
+        self.skip = set()  # id() of definitions that are built elsewhere
+
+    def add_unit(self, scope, name, body, node=None, types=()):
+        """Queue ``body`` as a unit called ``name`` in ``scope`` and return the ``Unit``."""
+        qualname = f"{scope}.{name}" if scope else name
+        count = self.names.get(qualname, 0) + 1
+        self.names[qualname] = count
+        if count > 1:
+            qualname = f"{qualname}#{count}"
+        unit = Unit(qualname, node, self.current, types)
+        self.queue.append((unit, body))
+        return unit
+
+    def build(self):
+        """Build every queued unit, including those queued on the way, and return the graph."""
+        position = 0
+        while position < len(self.queue):
+            self.unit(*self.queue[position])
+            position += 1
+        self.current = None
+        graph = self.graph
+        for index, lines in self.lines.items():
+            if lines:
+                graph.node_labels[index] = graph.intern('\n'.join(lines))
+        return graph
+
+    def unit(self, unit, body):
+        self.current = unit
+        self.units.append(unit)
+        name = self.name = unit.name
+        self.blocks = unit.blocks
+        self.loops = []  # (label, continue block, break block)
+        self.handlers = []  # blocks an exception raised here can go to
+        unit.entry = self.graph.add_node(f"{name}/entry", f"Entry: {name}")
+        unit.exit = self.exit = self.graph.add_node(f"{name}/exit", f"Exit: {name}")
+        first = self.block('start')
+        self.edge(unit.entry, first)
+        end = self.body(body, first, 0)
+        if end is not None:
+            self.edge(end, self.exit)
+
+    def block(self, role):
+        """Start a new block, labelled ``role`` until it gets statements."""
+        index = self.graph.add_node(f"{self.name}/{len(self.blocks)}", role)
+        self.blocks.append(index)
+        self.lines[index] = []
+        self.items[index] = []
+        return index
+
+    def edge(self, source, target, label=None):
+        if not self.graph.has_edge(source, target):
+            self.graph.add_edge(source, target, label)
+
+    def line(self, block, text, *items):
+        """Add a statement's text to ``block``, and the ``items`` it evaluates."""
+        self.lines[block].append(_short(text))
+        self.items[block].extend(items)
+
+    def body(self, statements, current, depth):
+        """Add ``statements`` starting in block ``current``.
+
+        Returns the block control is in afterwards, or None if it cannot
+        fall through (after ``return``, ``break`` and the like).
+
+        ``statement`` is a generator: it yields each nested body it needs
+        as ``(statements, block)`` and is sent the block that body ends
+        in. Nested bodies are driven from an explicit stack, so deeply
+        nested code never reaches the recursion limit.
+        """
+        stack = [(self.sequence(statements, current, depth), depth, True)]
+        value = None
+        while stack:
+            frame, depth, is_sequence = stack[-1]
+            try:
+                request = frame.send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            value = None
+            if is_sequence:
+                statement, current = request
+                stack.append((self.statement(statement, current, depth + 1), depth + 1, False))
+            else:
+                statements, current = request
+                stack.append((self.sequence(statements, current, depth), depth, True))
+        return value
+
+    def sequence(self, statements, current, depth):
+        """Yield each of ``statements`` with the block it starts in; return the block after them."""
+        if self.max_depth is not None and depth > self.max_depth:
+            raise TraversalLimitExceeded(f"Code is nested deeper than {self.max_depth} levels")
+        for statement in statements:
+            self.statements += 1
+            if self.max_nodes is not None and self.statements > self.max_nodes:
+                raise TraversalLimitExceeded(f"Code has more than {self.max_nodes} statements")
+            if current is None:
+                current = self.block('unreachable')
+            current = yield statement, current
+        return current
+
+    def join(self, ends, role):
+        """Return a new block that every block in ``ends`` falls through to, or None."""
+        ends = [end for end in ends if end is not None]
+        if not ends:
+            return None
+        after = self.block(role)
+        for end in ends:
+            self.edge(end, after)
+        return after
+
+    def protect(self, start, targets):
+        """Add ``exception`` edges to ``targets`` from the blocks created since ``start``."""
+        for index in self.blocks[start:]:
+            for target in targets:
+                if index != target:
+                    self.edge(index, target, 'exception')
+
+    def jump(self, current, label, kind):
+        """Add the edge of a ``break`` (kind 2) or ``continue`` (kind 1)."""
+        for loop in reversed(self.loops):
+            if loop[kind] is not None and (label is None or loop[0] == label):
+                self.edge(current, loop[kind], 'break' if kind == 2 else 'continue')
+                return
+
+    def raise_from(self, current):
+        for target in self.handlers[-1] if self.handlers else (self.exit,):
+            self.edge(current, target, 'raise')
+
+    def run_finally(self, statements, final, body, ends, handled):
+        """Add the ``finally`` block ``final`` of a try; a generator, see ``body``.
+
+        ``ends`` fall through into it; with ``handled`` set, exceptions
+        the handlers do not catch enter it from the try ``body`` too. An
+        exception leaves it for the enclosing handler, a normal end for
+        a new block after the try.
+        """
+        for end in ends:
+            if end is not None:
+                self.edge(end, final)
+        if handled:
+            self.edge(body, final, 'exception')
+        last = yield statements, final
+        if last is None:
+            return None
+        self.raise_from(last)
+        if all(end is None for end in ends):
+            return None
+        after = self.block('end try')
+        self.edge(last, after)
+        return after
+
+    def statement(self, statement, current, depth):
+        """Add one statement in block ``current``; a generator, see ``body``."""
+        raise NotImplementedError
+
+
+def _python_text(node):
+    try:
+        return ast.unparse(node)
+    except RecursionError:
+        return type(node).__name__
+
+
+class PythonControlFlow(ControlFlowBuilder):
+    """Basic blocks of Python modules, classes and functions."""
+
+    def module(self, tree):
+        self.add_unit('', '<module>', tree.body, tree)
+        return self.build()
+
+    def statement(self, statement, current, depth):
+        if isinstance(statement, ast.If):
+            self.line(current, f"if {_python_text(statement.test)}", statement.test)
+            then = self.block('then')
+            self.edge(current, then, 'true')
+            ends = [(yield statement.body, then)]
+            if statement.orelse:
+                otherwise = self.block('else')
+                self.edge(current, otherwise, 'false')
+                ends.append((yield statement.orelse, otherwise))
+                return self.join(ends, 'end if')
+            after = self.join(ends, 'end if') or self.block('end if')
+            self.edge(current, after, 'false')
+            return after
+
+        if isinstance(statement, (ast.While, ast.For, ast.AsyncFor)):
+            header = self.block('loop')
+            self.edge(current, header)
+            if isinstance(statement, ast.While):
+                self.line(header, f"while {_python_text(statement.test)}", statement.test)
+                enter, leave = 'true', 'false'
+            else:
+                prefix = 'async for' if isinstance(statement, ast.AsyncFor) else 'for'
+                self.line(header, f"{prefix} {_python_text(statement.target)} in {_python_text(statement.iter)}",
+                          statement.target)
+                # The iterable is evaluated once, before the loop.
+                self.items[current].append(statement.iter)
+                enter, leave = 'next', 'done'
+            after = self.block('end loop')
+            loop_body = self.block('loop body')
+            self.edge(header, loop_body, enter)
+            self.loops.append((None, header, after))
+            end = yield statement.body, loop_body
+            self.loops.pop()
+            if end is not None:
+                self.edge(end, header, 'loop')
+            if statement.orelse:
+                otherwise = self.block('else')
+                self.edge(header, otherwise, leave)
+                end = yield statement.orelse, otherwise
+                if end is not None:
+                    self.edge(end, after)
+            else:
+                self.edge(header, after, leave)
+            return after
+
+        if isinstance(statement, (ast.Try, getattr(ast, 'TryStar', ast.Try))):
+            handlers = []
+            for handler in statement.handlers:
+                block = self.block('except')
+                text = 'except'
+                if handler.type is not None:
+                    text += f" {_python_text(handler.type)}"
+                if handler.name:
+                    text += f" as {handler.name}"
+                self.line(block, text, handler)
+                handlers.append(block)
+            final = self.block('finally') if statement.finalbody else None
+            targets = handlers or [final]
+            body = self.block('try')
+            self.line(body, 'try')
+            self.edge(current, body)
+            start = len(self.blocks) - 1
+            self.handlers.append(targets)
+            end = yield statement.body, body
+            self.handlers.pop()
+            if final is not None and not statement.orelse and end is not None:
+                # Before the exception edges, which would otherwise label this one.
+                self.edge(end, final)
+            self.protect(start, targets)
+            if statement.orelse and end is not None:
+                otherwise = self.block('else')
+                self.edge(end, otherwise)
+                end = yield statement.orelse, otherwise
+            ends = [end]
+            for handler, block in zip(statement.handlers, handlers):
+                ends.append((yield handler.body, block))
+            if final is None:
+                return self.join(ends, 'end try')
+            return (yield from self.run_finally(statement.finalbody, final, body, ends, bool(handlers)))
+
+        if isinstance(statement, (ast.With, ast.AsyncWith)):
+            prefix = 'async with' if isinstance(statement, ast.AsyncWith) else 'with'
+            self.line(current, f"{prefix} {', '.join(_python_text(item) for item in statement.items)}",
+                      *statement.items)
+            return (yield statement.body, current)
+
+        if isinstance(statement, getattr(ast, 'Match', ())):
+            self.line(current, f"match {_python_text(statement.subject)}", statement.subject)
+            ends = []
+            for case in statement.cases:
+                block = self.block('case')
+                text = f"case {_python_text(case.pattern)}"
+                if case.guard is not None:
+                    text += f" if {_python_text(case.guard)}"
+                self.line(block, text, case.pattern, *([case.guard] if case.guard is not None else []))
+                self.edge(current, block, 'case')
+                ends.append((yield case.body, block))
+            after = self.join(ends, 'end match') or self.block('end match')
+            self.edge(current, after, 'no match')
+            return after
+
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            keyword = 'class' if isinstance(statement, ast.ClassDef) else 'def'
+            self.line(current, f"{keyword} {statement.name}", statement)
+            if id(statement) not in self.skip:
+                self.add_unit(self.name if self.name != '<module>' else '', statement.name, statement.body,
+                              statement)
+            return current
+
+        self.line(current, _python_text(statement), statement)
+        if isinstance(statement, ast.Return):
+            self.edge(current, self.exit, 'return')
+            return None
+        if isinstance(statement, ast.Raise):
+            self.raise_from(current)
+            return None
+        if isinstance(statement, ast.Break):
+            self.jump(current, None, 2)
+            return None
+        if isinstance(statement, ast.Continue):
+            self.jump(current, None, 1)
+            return None
+        return current
+
+
+@cache
+def java_types():
+    """Return the javalang classes of type declarations."""
+    return (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration, javalang.tree.EnumDeclaration)
+
+
+@cache
+def java_methods():
+    """Return the javalang classes of method and constructor declarations."""
+    return (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)
+
+
+def _java_expression(node, depth=0):
+    """Return a short rendering of a javalang expression."""
+    if node is None:
+        return ''
+    if isinstance(node, list):
+        return ', '.join(_java_expression(item, depth) for item in node)
+    if depth > 3:
+        return '…'
+    depth += 1
+    tree = javalang.tree
+    if isinstance(node, tree.MethodInvocation):
+        qualifier = f"{node.qualifier}." if node.qualifier else ''
+        text = f"{qualifier}{node.member}({'…' if node.arguments else ''})"
+    elif isinstance(node, tree.SuperMethodInvocation):
+        text = f"super.{node.member}({'…' if node.arguments else ''})"
+    elif isinstance(node, tree.ExplicitConstructorInvocation):
+        text = f"this({'…' if node.arguments else ''})"
+    elif isinstance(node, tree.SuperConstructorInvocation):
+        text = f"super({'…' if node.arguments else ''})"
+    elif isinstance(node, tree.MemberReference):
+        text = f"{node.qualifier}.{node.member}" if node.qualifier else node.member
+    elif isinstance(node, tree.Literal):
+        text = node.value
+    elif isinstance(node, tree.This):
+        text = 'this'
+    elif isinstance(node, tree.BinaryOperation):
+        text = f"{_java_expression(node.operandl, depth)} {node.operator} {_java_expression(node.operandr, depth)}"
+    elif isinstance(node, tree.Assignment):
+        text = f"{_java_expression(node.expressionl, depth)} {node.type} {_java_expression(node.value, depth)}"
+    elif isinstance(node, tree.TernaryExpression):
+        text = (f"{_java_expression(node.condition, depth)} ? {_java_expression(node.if_true, depth)}"
+                f" : {_java_expression(node.if_false, depth)}")
+    elif isinstance(node, tree.ClassCreator):
+        text = f"new {node.type.name}({'…' if node.arguments else ''})"
+    elif isinstance(node, tree.Cast):
+        text = f"({getattr(node.type, 'name', '')}) {_java_expression(node.expression, depth)}"
+    elif isinstance(node, tree.LambdaExpression):
+        text = '(…) -> …'
+    else:
+        text = type(node).__name__
+    for selector in getattr(node, 'selectors', None) or ():
+        if isinstance(selector, tree.MethodInvocation):
+            text += f".{selector.member}({'…' if selector.arguments else ''})"
+        elif isinstance(selector, tree.MemberReference):
+            text += f".{selector.member}"
+        elif isinstance(selector, tree.ArraySelector):
+            text += '[…]'
+    prefix = ''.join(getattr(node, 'prefix_operators', None) or ())
+    postfix = ''.join(getattr(node, 'postfix_operators', None) or ())
+    return f"{prefix}{text}{postfix}"
+
+
+def _java_declaration(node):
+    declarators = ', '.join(
+        f"{declarator.name} = {_java_expression(declarator.initializer)}" if declarator.initializer
+        else declarator.name
+        for declarator in node.declarators
+    )
+    return f"{getattr(node.type, 'name', '')} {declarators}"
+
+
+class JavaControlFlow(ControlFlowBuilder):
+    """Basic blocks of Java methods and constructors."""
+
+    def compilation_unit(self, tree):
+        for declaration in tree.types or ():
+            self.add_type('', declaration)
+        return self.build()
+
+    def add_type(self, scope, declaration, types=()):
+        """Queue the methods and constructors of a type and of the types nested in it."""
+        name = f"{scope}.{declaration.name}" if scope else declaration.name
+        types += (declaration,)
+        body = declaration.body
+        if isinstance(body, javalang.tree.EnumBody):
+            body = body.declarations
+        for member in body or ():
+            if isinstance(member, java_methods()):
+                if member.body is not None and id(member) not in self.skip:
+                    self.add_unit(name, member.name, member.body, member, types)
+            elif isinstance(member, java_types()):
+                self.add_type(name, member, types)
+
+    def statement(self, statement, current, depth):
+        tree = javalang.tree
+        label = getattr(statement, 'label', None)
+
+        if isinstance(statement, tree.BlockStatement):
+            if label is None:
+                return (yield statement.statements or (), current)
+            after = self.block('end block')
+            self.loops.append((label, None, after))
+            end = yield statement.statements or (), current
+            self.loops.pop()
+            if end is not None:
+                self.edge(end, after)
+            return after
+
+        if isinstance(statement, tree.IfStatement):
+            self.line(current, f"if ({_java_expression(statement.condition)})", statement.condition)
+            then = self.block('then')
+            self.edge(current, then, 'true')
+            ends = [(yield [statement.then_statement], then)]
+            if statement.else_statement is not None:
+                otherwise = self.block('else')
+                self.edge(current, otherwise, 'false')
+                ends.append((yield [statement.else_statement], otherwise))
+                return self.join(ends, 'end if')
+            after = self.join(ends, 'end if') or self.block('end if')
+            self.edge(current, after, 'false')
+            return after
+
+        if isinstance(statement, (tree.WhileStatement, tree.ForStatement)):
+            control = getattr(statement, 'control', None)
+            update = None
+            if isinstance(control, tree.ForControl):
+                if control.init is not None:
+                    init = control.init
+                    if isinstance(init, tree.VariableDeclaration):
+                        self.line(current, _java_declaration(init), init)
+                    else:
+                        self.line(current, _java_expression(init), *init)
+                header_text = f"for (; {_java_expression(control.condition)}; )"
+                header_items = [control.condition] if control.condition is not None else []
+                enter, leave = 'true', 'false'
+            elif isinstance(control, tree.EnhancedForControl):
+                header_text = (f"for ({_java_declaration(control.var)} : "
+                               f"{_java_expression(control.iterable)})")
+                header_items = [control.var]
+                # The iterable is evaluated once, before the loop.
+                self.items[current].append(control.iterable)
+                enter, leave = 'next', 'done'
+            else:
+                header_text = f"while ({_java_expression(statement.condition)})"
+                header_items = [statement.condition]
+                enter, leave = 'true', 'false'
+            header = self.block('loop')
+            self.line(header, header_text, *header_items)
+            self.edge(current, header)
+            after = self.block('end loop')
+            if isinstance(control, tree.ForControl) and control.update:
+                update = self.block('update')
+                self.line(update, _java_expression(control.update), *control.update)
+                self.edge(update, header, 'loop')
+            loop_body = self.block('loop body')
+            self.edge(header, loop_body, enter)
+            self.edge(header, after, leave)
+            self.loops.append((label, update or header, after))
+            end = yield [statement.body], loop_body
+            self.loops.pop()
+            if end is not None:
+                self.edge(end, update or header, None if update else 'loop')
+            return after
+
+        if isinstance(statement, tree.DoStatement):
+            loop_body = self.block('do')
+            self.edge(current, loop_body)
+            condition = self.block('loop')
+            self.line(condition, f"while ({_java_expression(statement.condition)})", statement.condition)
+            after = self.block('end loop')
+            self.loops.append((label, condition, after))
+            end = yield [statement.body], loop_body
+            self.loops.pop()
+            if end is not None:
+                self.edge(end, condition)
+            self.edge(condition, loop_body, 'true')
+            self.edge(condition, after, 'false')
+            return after
+
+        if isinstance(statement, tree.SwitchStatement):
+            self.line(current, f"switch ({_java_expression(statement.expression)})", statement.expression)
+            after = self.block('end switch')
+            self.loops.append((label, None, after))
+            end = None
+            has_default = False
+            for case in statement.cases:
+                block = self.block('case')
+                if case.case:
+                    self.line(block, f"case {_java_expression(case.case)}", *case.case)
+                else:
+                    has_default = True
+                    self.line(block, 'default')
+                self.edge(current, block, 'case')
+                if end is not None:
+                    # Falls through from the previous case.
+                    self.edge(end, block)
+                end = yield case.statements or (), block
+            self.loops.pop()
+            if end is not None:
+                self.edge(end, after)
+            if not has_default:
+                self.edge(current, after, 'no match')
+            return after
+
+        if isinstance(statement, tree.TryStatement):
+            handlers = []
+            for catch in statement.catches or ():
+                block = self.block('catch')
+                parameter = catch.parameter
+                self.line(block, f"catch ({' | '.join(parameter.types)} {parameter.name})", parameter)
+                handlers.append(block)
+            final = self.block('finally') if statement.finally_block is not None else None
+            targets = handlers or [final]
+            body = self.block('try')
+            if statement.resources:
+                resources = '; '.join(f"{resource.name} = {_java_expression(resource.value)}"
+                                      for resource in statement.resources)
+                self.line(body, f"try ({resources})", *statement.resources)
+            else:
+                self.line(body, 'try')
+            self.edge(current, body)
+            start = len(self.blocks) - 1
+            self.handlers.append(targets)
+            end = yield statement.block or (), body
+            self.handlers.pop()
+            if final is not None and end is not None:
+                # Before the exception edges, which would otherwise label this one.
+                self.edge(end, final)
+            self.protect(start, targets)
+            ends = [end]
+            for catch, block in zip(statement.catches or (), handlers):
+                ends.append((yield catch.block or (), block))
+            if final is None:
+                return self.join(ends, 'end try')
+            return (yield from self.run_finally(statement.finally_block, final, body, ends, bool(handlers)))
+
+        if isinstance(statement, tree.SynchronizedStatement):
+            self.line(current, f"synchronized ({_java_expression(statement.lock)})", statement.lock)
+            return (yield statement.block or (), current)
+
+        if isinstance(statement, java_types()):
+            self.line(current, f"class {statement.name}")
+            self.add_type(self.name, statement, self.current.types)
+            return current
+
+        if isinstance(statement, tree.ReturnStatement):
+            self.line(current, f"return {_java_expression(statement.expression)}".rstrip(), statement)
+            self.edge(current, self.exit, 'return')
+            return None
+        if isinstance(statement, tree.ThrowStatement):
+            self.line(current, f"throw {_java_expression(statement.expression)}", statement)
+            self.raise_from(current)
+            return None
+        if isinstance(statement, tree.BreakStatement):
+            self.line(current, f"break {statement.goto or ''}".rstrip())
+            self.jump(current, statement.goto, 2)
+            return None
+        if isinstance(statement, tree.ContinueStatement):
+            self.line(current, f"continue {statement.goto or ''}".rstrip())
+            self.jump(current, statement.goto, 1)
+            return None
+
+        if isinstance(statement, (tree.LocalVariableDeclaration, tree.VariableDeclaration)):
+            self.line(current, _java_declaration(statement), statement)
+        elif isinstance(statement, tree.StatementExpression):
+            self.line(current, _java_expression(statement.expression), statement)
+        elif isinstance(statement, tree.AssertStatement):
+            self.line(current, f"assert {_java_expression(statement.condition)}", statement)
+        elif type(statement) is not tree.Statement:
+            # The bare Statement is an empty ``;``.
+            self.line(current, type(statement).__name__)
+        return current
+
+
+def build_python_cfg(tree, max_nodes=None, max_depth=None):
+    """Build the basic-block control-flow graph of a Python module."""
+    return PythonControlFlow(max_nodes, max_depth).module(tree)
+
+
+def build_java_cfg(tree, max_nodes=None, max_depth=None):
+    """Build the basic-block control-flow graph of a Java compilation unit."""
+    return JavaControlFlow(max_nodes, max_depth).compilation_unit(tree)
@@ -0,0 +1,521 @@
+"""Reaching-definitions data dependency graphs.
+
+The data dependency graph links every definition of a variable to the
+uses it can reach. Definitions and uses are read off the statements and
+expressions each basic block of the control-flow graph evaluates, and
+which definitions reach which block is solved per function with the
+classic worklist iteration over bitsets: one bit per definition, with
+``out = gen | (in & ~kill)``. Only def -> use edges are emitted.
+
+Names are resolved the way the language scopes them. Python functions,
+classes and comprehensions are scopes of their own (class bodies are not
+visible to the functions nested in them), and ``global``/``nonlocal``
+names belong to the enclosing scope. In Java, names a method does not
+declare are fields of the enclosing types.
+"""
+import ast
+from collections import deque
+from functools import cache
+
+from .cfg import JavaControlFlow, PythonControlFlow
+from .engine import CompactGraph, NodeIds, java_child_nodes, walk
+from .frontends import lazy_import
+
+javalang = lazy_import('javalang')
+
+PYTHON_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+PYTHON_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+
+def _lookup(scope, name):
+    """Return the definitions of ``name`` in a chain of ``(names, parent)`` inline scopes."""
+    while scope is not None:
+        names, scope = scope
+        sites = names.get(name)
+        if sites:
+            return sites
+    return None
+
+
+def _bits(mask):
+    """Yield the positions of the set bits of ``mask``."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ReachingDefinitions:
+    """Def -> use edges of every unit in a built control-flow graph.
+
+    ``node_id(node)`` returns the graph id of a tree node. Uses that no
+    scope in the graph defines (builtins, or names of code that was not
+    built) are collected in ``free`` as ``(name, node)`` pairs.
+    """
+
+    def __init__(self, builder, node_id):
+        self.builder = builder
+        self.node_id = node_id
+        self.graph = CompactGraph()
+        self.scopes = {}  # id(unit) -> {name: [definitions]}
+        self.free = []
+        graph = builder.graph
+        self.predecessors = [[] for _ in range(len(graph))]
+        self.successors = [[] for _ in range(len(graph))]
+        for source, target in zip(graph.edge_src, graph.edge_dst):
+            self.predecessors[target].append(source)
+            self.successors[source].append(target)
+
+    def solve(self):
+        """Analyze the units outermost first and return the graph."""
+        for unit in self.builder.units:
+            self.unit(unit)
+        return self.graph
+
+    def link(self, definition, use, name):
+        source = self.graph.add_node(self.node_id(definition), self.label(definition, name))
+        target = self.graph.add_node(self.node_id(use), self.label(use, name))
+        if not self.graph.has_edge(source, target):
+            self.graph.add_edge(source, target)
+
+    def unit(self, unit):
+        items = self.builder.items
+        external = self.external_names(unit, items)
+        events = []
+        defined = []
+        for block in unit.blocks:
+            block_events = []
+            for item in items[block]:
+                uses, definitions, links = self.events(item)
+                for definition, use, name in links:
+                    self.link(definition, use, name)
+                block_events.extend((name, node, False) for name, node in uses)
+                for name, node in definitions:
+                    if name not in external:
+                        block_events.append((name, node, True))
+                        defined.append((name, node))
+            events.append(block_events)
+
+        sites = []  # definition nodes by bit; None stands for the enclosing scope
+        masks = {}
+        scope = {}
+
+        def allocate(name, node):
+            bit = len(sites)
+            masks[name] = masks.get(name, 0) | 1 << bit
+            sites.append(node)
+            if node is not None:
+                scope.setdefault(name, []).append(node)
+            return bit
+
+        entry = 0
+        for name, node in self.entry_definitions(unit, defined):
+            entry |= 1 << allocate(name, node)
+        for block_events in events:
+            for position, (name, node, is_definition) in enumerate(block_events):
+                block_events[position] = (name, node, allocate(name, node) if is_definition else None)
+        self.scopes[id(unit)] = scope
+
+        gen, kill = [], []
+        for block_events in events:
+            block_gen = block_kill = 0
+            for name, _, bit in block_events:
+                if bit is not None:
+                    block_gen = block_gen & ~masks[name] | 1 << bit
+                    block_kill |= masks[name]
+            gen.append(block_gen)
+            kill.append(block_kill)
+
+        position = {block: index for index, block in enumerate(unit.blocks)}
+        ins = [0] * len(unit.blocks)
+        outs = [0] * len(unit.blocks)
+        work = deque(range(len(unit.blocks)))
+        queued = [True] * len(unit.blocks)
+        while work:
+            index = work.popleft()
+            queued[index] = False
+            reaching = 0
+            for predecessor in self.predecessors[unit.blocks[index]]:
+                reaching |= entry if predecessor == unit.entry else outs[position[predecessor]]
+            ins[index] = reaching
+            out = gen[index] | reaching & ~kill[index]
+            if out != outs[index]:
+                outs[index] = out
+                for successor in self.successors[unit.blocks[index]]:
+                    following = position.get(successor)
+                    if following is not None and not queued[following]:
+                        queued[following] = True
+                        work.append(following)
+
+        for index, block_events in enumerate(events):
+            reaching = ins[index]
+            for name, node, bit in block_events:
+                if bit is not None:
+                    reaching = reaching & ~masks[name] | 1 << bit
+                elif name not in masks:
+                    self.resolve_outside(unit, name, node)
+                else:
+                    for definition in _bits(reaching & masks[name]):
+                        if sites[definition] is None:
+                            self.resolve_outside(unit, name, node)
+                        else:
+                            self.link(sites[definition], node, name)
+
+    def resolve_outside(self, unit, name, use):
+        definitions = self.resolve(unit, name)
+        if definitions is None:
+            self.free.append((name, use))
+            return
+        for definition in definitions:
+            self.link(definition, use, name)
+
+    def entry_definitions(self, unit, defined):
+        """Return the ``(name, node)`` definitions in effect when ``unit`` starts.
+
+        ``defined`` lists the unit's own definitions in order.
+        """
+        return []
+
+    def external_names(self, unit, items):
+        """Return the names that ``unit`` assigns but that belong to another scope."""
+        return ()
+
+
+# Python
+
+def python_parameters(node):
+    """Return the ``arg`` nodes of a function or lambda."""
+    arguments = node.args
+    parameters = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+    for special in (arguments.vararg, arguments.kwarg):
+        if special is not None:
+            parameters.append(special)
+    return parameters
+
+
+def python_header(node):
+    """Return the expressions a ``def``, ``class`` or ``lambda`` evaluates where it stands."""
+    if isinstance(node, ast.ClassDef):
+        return node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]
+    arguments = node.args
+    defaults = arguments.defaults + [default for default in arguments.kw_defaults if default]
+    if isinstance(node, ast.Lambda):
+        return defaults
+    return node.decorator_list + defaults
+
+
+def python_events(item, skip=()):
+    """Return ``(uses, definitions, links)`` of one statement or expression.
+
+    Uses and definitions are ``(name, node)`` pairs; the uses are
+    evaluated before the definitions. ``links`` are ``(definition, use,
+    name)`` triples resolved inside the item, in comprehensions and lambdas.
+    Definitions in ``skip`` (ids) are analyzed elsewhere, so only their
+    names are defined.
+    """
+    uses, definitions, links = [], [], []
+    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        definitions.append((item.name, item))
+        roots = [] if id(item) in skip else python_header(item)
+    elif isinstance(item, ast.ExceptHandler):
+        if item.name:
+            definitions.append((item.name, item))
+        roots = [item.type] if item.type is not None else []
+    elif isinstance(item, (ast.Import, ast.ImportFrom)):
+        for alias in item.names:
+            if alias.name != '*':
+                definitions.append(((alias.asname or alias.name).split('.')[0], alias))
+        roots = []
+    elif isinstance(item, (ast.Global, ast.Nonlocal)):
+        roots = []
+    else:
+        roots = [item]
+
+    stack = [(root, None) for root in reversed(roots)]
+    while stack:
+        node, scope = stack.pop()
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                definitions.append((node.id, node))
+                continue
+            sites = _lookup(scope, node.id)
+            if sites:
+                links.extend((site, node, node.id) for site in sites)
+            else:
+                uses.append((node.id, node))
+            continue
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            uses.append((node.target.id, node.target))
+            definitions.append((node.target.id, node.target))
+            stack.append((node.value, scope))
+            continue
+        if isinstance(node, ast.Lambda):
+            names = {}
+            for parameter in python_parameters(node):
+                names.setdefault(parameter.arg, []).append(parameter)
+            stack.append((node.body, (names, scope)))
+            stack.extend((default, scope) for default in python_header(node))
+            continue
+        if isinstance(node, PYTHON_COMPREHENSIONS):
+            # The first iterable is evaluated in the enclosing scope; the
+            # targets are local to the comprehension.
+            names = {}
+            for generator in node.generators:
+                for target in ast.walk(generator.target):
+                    if isinstance(target, ast.Name):
+                        names.setdefault(target.id, []).append(target)
+            inner = (names, scope)
+            first, *rest = node.generators
+            results = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+            stack.extend((child, inner) for child in results)
+            for generator in reversed(rest):
+                stack.extend((condition, inner) for condition in generator.ifs)
+                stack.append((generator.iter, inner))
+            stack.extend((condition, inner) for condition in first.ifs)
+            stack.append((first.iter, scope))
+            continue
+        name = getattr(node, 'name', None) if isinstance(node, (ast.MatchAs, ast.MatchStar)) else None
+        if isinstance(node, ast.MatchMapping):
+            name = node.rest
+        if name:
+            definitions.append((name, node))
+        children = list(ast.iter_child_nodes(node))
+        children.reverse()
+        stack.extend((child, scope) for child in children)
+    return uses, definitions, links
+
+
+class PythonReachingDefinitions(ReachingDefinitions):
+    """Reaching definitions of a module built by ``PythonControlFlow``."""
+
+    def __init__(self, builder, node_id):
+        super().__init__(builder, node_id)
+        self.globals = {}  # id(unit) -> names declared global
+
+    def events(self, item):
+        return python_events(item, self.builder.skip)
+
+    def entry_definitions(self, unit, defined):
+        if isinstance(unit.node, PYTHON_FUNCTIONS):
+            return [(parameter.arg, parameter) for parameter in python_parameters(unit.node)]
+        return []
+
+    def external_names(self, unit, items):
+        names = set()
+        for block in unit.blocks:
+            for item in items[block]:
+                if isinstance(item, ast.Global):
+                    self.globals.setdefault(id(unit), set()).update(item.names)
+                if isinstance(item, (ast.Global, ast.Nonlocal)):
+                    names.update(item.names)
+        return names
+
+    def resolve(self, unit, name):
+        """Return the definitions of a name ``unit`` does not bind, or None."""
+        if name in self.globals.get(id(unit), ()):
+            while unit.parent is not None:
+                unit = unit.parent
+            if not isinstance(unit.node, ast.Module):
+                return None
+            return self.scopes[id(unit)].get(name)
+        scope = unit.parent
+        while scope is not None:
+            if not isinstance(scope.node, ast.ClassDef):
+                definitions = self.scopes[id(scope)].get(name)
+                if definitions:
+                    return definitions
+            scope = scope.parent
+        return None
+
+    def label(self, node, name):
+        if isinstance(node, ast.Name):
+            return f"Name ({name})"
+        if isinstance(node, ast.arg):
+            return f"Parameter: {name}"
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return f"Function: {name}"
+        if isinstance(node, ast.ClassDef):
+            return f"Class: {name}"
+        if isinstance(node, ast.alias):
+            return f"Import: {name}"
+        if isinstance(node, ast.ExceptHandler):
+            return f"Exception: {name}"
+        return f"Pattern: {name}"
+
+
+# Java
+
+@cache
+def java_declarations():
+    """Return the javalang classes that declare a variable."""
+    return (
+        javalang.tree.VariableDeclarator, javalang.tree.FormalParameter, javalang.tree.InferredFormalParameter,
+        javalang.tree.CatchClauseParameter, javalang.tree.TryResource,
+    )
+
+
+def java_fields(declaration):
+    """Return ``{name: [declarator]}`` of the fields a type declares."""
+    fields = {}
+    body = declaration.body
+    if isinstance(body, javalang.tree.EnumBody):
+        body = body.declarations
+    for member in body or ():
+        if isinstance(member, javalang.tree.FieldDeclaration):
+            for declarator in member.declarators:
+                fields.setdefault(declarator.name, []).append(declarator)
+    return fields
+
+
+def _java_target(node):
+    """Return the reference an assignment or increment writes, if it is a plain variable or field."""
+    tree = javalang.tree
+    if isinstance(node, tree.MemberReference) and not node.qualifier and not node.selectors:
+        return node
+    if isinstance(node, tree.This) and len(node.selectors or ()) == 1 \
+            and isinstance(node.selectors[0], tree.MemberReference):
+        return node.selectors[0]
+    return None
+
+
+def java_events(item):
+    """Return ``(uses, definitions, links)`` of one Java statement or expression.
+
+    Works like ``python_events``; lambda parameters are the only inline
+    scope. Anonymous class bodies are not analyzed.
+    """
+    tree = javalang.tree
+    uses, definitions, links = [], [], []
+
+    def use(name, node, scope):
+        sites = _lookup(scope, name)
+        if sites:
+            links.extend((site, node, name) for site in sites)
+        else:
+            uses.append((name, node))
+
+    stack = [(item, None)]
+    while stack:
+        node, scope = stack.pop()
+        children = None
+        if isinstance(node, tree.Assignment):
+            target = _java_target(node.expressionl)
+            if target is not None:
+                if node.type != '=':
+                    use(target.member, target, scope)
+                definitions.append((target.member, target))
+                children = [node.value]
+        elif isinstance(node, tree.MemberReference):
+            if node.qualifier:
+                use(node.qualifier.split('.')[0], node, scope)
+            elif node.qualifier == '':
+                use(node.member, node, scope)
+                operators = (node.prefix_operators or []) + (node.postfix_operators or [])
+                if not node.selectors and ('++' in operators or '--' in operators):
+                    definitions.append((node.member, node))
+            # A qualifier of None marks a selector, e.g. ``.field`` in ``a().field``.
+        elif isinstance(node, tree.MethodInvocation):
+            if node.qualifier:
+                use(node.qualifier.split('.')[0], node, scope)
+        elif isinstance(node, tree.This):
+            selectors = node.selectors or []
+            if selectors and isinstance(selectors[0], tree.MemberReference):
+                field = selectors[0]
+                use(field.member, field, scope)
+                children = list(java_child_nodes(field)) + selectors[1:]
+        elif isinstance(node, tree.LambdaExpression):
+            names = {}
+            for parameter in node.parameters or ():
+                # ``(x) -> ...`` parses its parameter as a member reference.
+                name = parameter.member if isinstance(parameter, tree.MemberReference) else parameter.name
+                names.setdefault(name, []).append(parameter)
+            body = node.body if isinstance(node.body, list) else [node.body]
+            stack.extend((child, (names, scope)) for child in reversed(body))
+            continue
+        elif isinstance(node, tree.ClassCreator):
+            children = (node.arguments or []) + (node.selectors or [])
+        elif isinstance(node, java_declarations()):
+            definitions.append((node.name, node))
+            if isinstance(node, tree.FormalParameter):
+                continue
+        if children is None:
+            children = list(java_child_nodes(node))
+        children.reverse()
+        stack.extend((child, scope) for child in children)
+    return uses, definitions, links
+
+
+class JavaReachingDefinitions(ReachingDefinitions):
+    """Reaching definitions of the methods built by ``JavaControlFlow``."""
+
+    def __init__(self, builder, node_id):
+        super().__init__(builder, node_id)
+        self.fields = {}  # id(type declaration) -> {name: [declarator]}
+        self.field_ids = set()
+        self.assignments = set()  # ids of the references assignments write
+        self.parameters = set()  # ids of lambda parameters
+
+    def events(self, item):
+        uses, definitions, links = java_events(item)
+        self.assignments.update(id(node) for _, node in definitions if not isinstance(node, java_declarations()))
+        self.parameters.update(id(definition) for definition, _, _ in links)
+        return uses, definitions, links
+
+    def entry_definitions(self, unit, defined):
+        definitions = [(parameter.name, parameter) for parameter in getattr(unit.node, 'parameters', None) or ()]
+        # Names assigned but not declared are fields: their value on entry
+        # comes from the field, and the assignments flow from there.
+        declared = {name for name, _ in definitions}
+        declared.update(name for name, node in defined if isinstance(node, java_declarations()))
+        assigned = dict.fromkeys(name for name, _ in defined if name not in declared)
+        definitions.extend((name, None) for name in assigned)
+        return definitions
+
+    def type_fields(self, declaration):
+        fields = self.fields.get(id(declaration))
+        if fields is None:
+            fields = self.fields[id(declaration)] = java_fields(declaration)
+            self.field_ids.update(id(declarator) for declarators in fields.values() for declarator in declarators)
+        return fields
+
+    def resolve(self, unit, name):
+        """Return the declarators of the field ``name`` of the innermost enclosing type, or None."""
+        for declaration in reversed(unit.types):
+            declarators = self.type_fields(declaration).get(name)
+            if declarators:
+                return declarators
+        return None
+
+    def label(self, node, name):
+        tree = javalang.tree
+        if isinstance(node, tree.VariableDeclarator):
+            return f"Field: {name}" if id(node) in self.field_ids else f"Variable: {name}"
+        if isinstance(node, (tree.FormalParameter, tree.InferredFormalParameter)) or id(node) in self.parameters:
+            return f"Parameter: {name}"
+        if isinstance(node, tree.CatchClauseParameter):
+            return f"Exception: {name}"
+        if isinstance(node, tree.TryResource):
+            return f"Resource: {name}"
+        if id(node) in self.assignments:
+            return f"Assignment: {name}"
+        return f"Use: {name}"
+
+
+def build_python_ddg(tree, max_nodes=None, max_depth=None):
+    """Build the reaching-definitions data dependency graph of a Python module."""
+    ids = NodeIds()
+    for _, node, _, _ in walk(tree, ast.iter_child_nodes, max_nodes, max_depth):
+        ids(node)
+    builder = PythonControlFlow(max_nodes, max_depth)
+    builder.module(tree)
+    return PythonReachingDefinitions(builder, ids).solve()
+
+
+def build_java_ddg(tree, max_nodes=None, max_depth=None):
+    """Build the reaching-definitions data dependency graph of a Java compilation unit."""
+    ids = NodeIds()
+    for _, node, _, _ in walk(tree, java_child_nodes, max_nodes, max_depth):
+        ids(node)
+    builder = JavaControlFlow(max_nodes, max_depth)
+    builder.compilation_unit(tree)
+    return JavaReachingDefinitions(builder, ids).solve()
@@ -0,0 +1,362 @@
+"""Traversal core and single-pass graph engine for the visualizations."""
+import ast
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .frontends import lazy_import
+
+# Loaded on first use, so Python-only processes never import it.
+javalang = lazy_import('javalang')
+
+ENTER = 'enter'
+EXIT = 'exit'
+
+# Graph records: ``(NODE, key, label)`` and ``(EDGE, source key, target key, attr)``.
+# Keys of tree nodes are the ids handed out by NodeIds.
+NODE = 'node'
+EDGE = 'edge'
+
+
+# Traversals report the number of nodes they visit to this callback, in
+# batches of PROGRESS_BATCH, while one is installed with report_progress().
+PROGRESS_BATCH = 1024
+_progress = ContextVar('code_visualizer_progress', default=None)
+
+
+class TraversalLimitExceeded(Exception):
+    """Raised when a tree exceeds the configured node or depth cap."""
+
+
+def traversal_limits():
+    """Return the node and depth caps from ``CODE_VISUALIZER_LIMITS``."""
+    limits = getattr(settings, 'CODE_VISUALIZER_LIMITS', {})
+    return {"max_nodes": limits.get('MAX_NODES'), "max_depth": limits.get('MAX_DEPTH')}
+
+
+@contextmanager
+def report_progress(callback):
+    """Call ``callback(count)`` as traversals in this context visit nodes."""
+    token = _progress.set(callback)
+    try:
+        yield
+    finally:
+        _progress.reset(token)
+
+
+def walk(root, children, max_nodes=None, max_depth=None, exits=False):
+    """Traverse a tree depth-first using an explicit stack.
+
+    Yields ``(event, node, parent, depth)`` tuples in pre-order, where
+    ``event`` is ``ENTER``. With ``exits`` set an ``EXIT`` tuple follows
+    once all of a node's descendants have been yielded. ``children(node)``
+    is only called after the consumer has handled the ``ENTER`` tuple.
+
+    Raises TraversalLimitExceeded once more than ``max_nodes`` nodes have
+    been entered or a node is deeper than ``max_depth``. Entered nodes are
+    counted towards the ``report_progress`` callback, if one is installed.
+    """
+    stack = [(ENTER, root, None, 0)]
+    count = 0
+    report = _progress.get()
+    while stack:
+        entry = stack.pop()
+        if entry[0] is EXIT:
+            yield entry
+            continue
+        count += 1
+        if report is not None and not count % PROGRESS_BATCH:
+            report(PROGRESS_BATCH)
+        if max_nodes is not None and count > max_nodes:
+            raise TraversalLimitExceeded(f"Tree has more than {max_nodes} nodes")
+        _, node, _, depth = entry
+        if max_depth is not None and depth > max_depth:
+            raise TraversalLimitExceeded(f"Tree is nested deeper than {max_depth} levels")
+        yield entry
+        if exits:
+            stack.append((EXIT, node, entry[2], depth))
+        kids = list(children(node))
+        kids.reverse()
+        depth += 1
+        stack.extend([(ENTER, child, node, depth) for child in kids])
+    if report is not None:
+        report(count % PROGRESS_BATCH)
+
+
+class NodeIds(dict):
+    """Allocate deterministic ids for the nodes of one tree.
+
+    Call it with a node to get the node's id: its position in order of
+    first visit, so a pre-order ``walk`` numbers the tree the same way on
+    every run and every graph built from the same traversal agrees on the
+    ids. With a ``prefix`` ids are ``f"{prefix}{position}"`` strings.
+    Nodes are tracked by ``id()``, so the tree must stay alive while ids
+    are handed out.
+    """
+
+    __slots__ = ('prefix',)
+
+    def __init__(self, prefix=None):
+        super().__init__()
+        self.prefix = prefix
+
+    def __call__(self, node):
+        key = id(node)
+        node_id = self.get(key)
+        if node_id is None:
+            node_id = len(self) if self.prefix is None else f"{self.prefix}{len(self)}"
+            self[key] = node_id
+        return node_id
+
+
+class CompactGraph:
+    """Directed graph stored as parallel arrays.
+
+    Nodes get dense integer indexes in insertion order and are looked up by
+    a hashable key (a ``NodeIds`` id of a tree node, or a name). Node labels and
+    edge attributes are interned in a shared string table. As in
+    ``nx.DiGraph``, each (source, target) pair is stored once and adding an
+    existing node or edge again only updates its label or attribute.
+    """
+
+    __slots__ = ('keys', 'node_labels', 'index', 'edge_src', 'edge_dst', 'edge_attrs',
+                 'edge_index', 'strings', 'string_index')
+
+    def __init__(self):
+        self.keys = []
+        self.node_labels = array('i')
+        self.index = {}
+        self.edge_src = array('i')
+        self.edge_dst = array('i')
+        self.edge_attrs = array('i')
+        self.edge_index = {}
+        self.strings = []
+        self.string_index = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def intern(self, text):
+        """Return the string table index for ``text``."""
+        position = self.string_index.get(text)
+        if position is None:
+            position = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return position
+
+    def add_node(self, key, label=''):
+        """Add a node (or relabel an existing one) and return its index."""
+        label_id = self.intern(label)
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            self.node_labels.append(label_id)
+        else:
+            self.node_labels[index] = label_id
+        return index
+
+    def label(self, index):
+        return self.strings[self.node_labels[index]]
+
+    def has_edge(self, source, target):
+        return (source, target) in self.edge_index
+
+    def add_edge(self, source, target, attr=None):
+        """Add an edge between two node indexes, or update its attribute."""
+        attr_id = -1 if attr is None else self.intern(attr)
+        pair = (source, target)
+        position = self.edge_index.get(pair)
+        if position is not None:
+            self.edge_attrs[position] = attr_id
+            return
+        self.edge_index[pair] = len(self.edge_src)
+        self.edge_src.append(source)
+        self.edge_dst.append(target)
+        self.edge_attrs.append(attr_id)
+
+    def remove_isolated(self):
+        """Drop nodes without edges, keeping the order of everything else."""
+        connected = bytearray(len(self.keys))
+        for source in self.edge_src:
+            connected[source] = 1
+        for target in self.edge_dst:
+            connected[target] = 1
+        if all(connected):
+            return
+        remap = array('i', [-1]) * len(self.keys)
+        keys, labels = [], array('i')
+        for old, key in enumerate(self.keys):
+            if connected[old]:
+                remap[old] = len(keys)
+                keys.append(key)
+                labels.append(self.node_labels[old])
+        self.keys, self.node_labels = keys, labels
+        self.index = {key: position for position, key in enumerate(keys)}
+        self.edge_src = array('i', (remap[source] for source in self.edge_src))
+        self.edge_dst = array('i', (remap[target] for target in self.edge_dst))
+        self.edge_index = {pair: position for position, pair in enumerate(zip(self.edge_src, self.edge_dst))}
+
+    def edge_order(self):
+        """Return edge positions in NetworkX iteration order.
+
+        NetworkX lists edges grouped by source node in node order, and in
+        insertion order within a source; a stable sort on the source index
+        reproduces that.
+        """
+        return sorted(range(len(self.edge_src)), key=self.edge_src.__getitem__)
+
+    def to_dict(self, edge_attr=None, default=None):
+        """Serialize to the ``{"nodes": [...], "edges": [...]}`` schema.
+
+        With ``edge_attr`` set, every edge carries its attribute under that
+        name, falling back to ``default``.
+        """
+        strings = self.strings
+        ids = [str(key) for key in self.keys]
+        nodes = [{"id": node_id, "label": strings[label_id]}
+                 for node_id, label_id in zip(ids, self.node_labels)]
+        src, dst, attrs = self.edge_src, self.edge_dst, self.edge_attrs
+        if edge_attr is None:
+            edges = [{"source": ids[src[i]], "target": ids[dst[i]]} for i in self.edge_order()]
+        else:
+            edges = [{"source": ids[src[i]], "target": ids[dst[i]],
+                      edge_attr: default if attrs[i] < 0 else strings[attrs[i]]} for i in self.edge_order()]
+        return {"nodes": nodes, "edges": edges}
+
+    def records(self):
+        """Yield the graph as ``NODE`` records followed by ``EDGE`` records."""
+        keys, strings = self.keys, self.strings
+        for key, label_id in zip(keys, self.node_labels):
+            yield NODE, key, strings[label_id]
+        for i in self.edge_order():
+            attr_id = self.edge_attrs[i]
+            yield EDGE, keys[self.edge_src[i]], keys[self.edge_dst[i]], None if attr_id < 0 else strings[attr_id]
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a graph from ``NODE``/``EDGE`` records."""
+        graph = cls()
+        index = graph.index
+        for record in records:
+            if record[0] is NODE:
+                graph.add_node(record[1], record[2])
+            else:
+                graph.add_edge(index[record[1]], index[record[2]], record[3])
+        return graph
+
+    def to_networkx(self, edge_attr='label'):
+        """Return the graph as an ``nx.DiGraph`` keyed by string node ids."""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        ids = [str(key) for key in self.keys]
+        for node_id, label_id in zip(ids, self.node_labels):
+            graph.add_node(node_id, label=self.strings[label_id])
+        for i in self.edge_order():
+            attrs = {} if self.edge_attrs[i] < 0 else {edge_attr: self.strings[self.edge_attrs[i]]}
+            graph.add_edge(ids[self.edge_src[i]], ids[self.edge_dst[i]], **attrs)
+        return graph
+
+
+def python_node_label(node):
+    """Return the display label for a Python AST node."""
+    label = type(node).__name__
+    if isinstance(node, ast.Name):
+        label += f" ({node.id})"
+    elif isinstance(node, ast.Constant):
+        # Same values the deprecated ast.Num / ast.Str checks matched.
+        value = node.value
+        if isinstance(value, str) or (isinstance(value, (int, float, complex)) and not isinstance(value, bool)):
+            label += f" ({value})"
+    return label
+
+
+def java_node_label(node):
+    """Return the display label for a Java AST node."""
+    label = type(node).__name__
+
+    if getattr(node, 'name', None) is not None:
+        label += f" - {node.name}"
+
+    extends = getattr(node, 'extends', None)
+    if extends is not None and getattr(extends, 'name', None) is not None:
+        label += f" - extends {extends.name}"
+
+    implements = getattr(node, 'implements', None)
+    if implements is not None:
+        names = [i.name for i in implements if getattr(i, 'name', None) is not None]
+        if names:
+            label += f" - implements {', '.join(names)}"
+
+    return label
+
+
+def java_child_nodes(node):
+    """Yield the direct javalang child nodes of ``node`` in source order."""
+    for child in getattr(node, 'children', ()):
+        if isinstance(child, javalang.ast.Node):
+            yield child
+        elif isinstance(child, list):
+            for item in child:
+                if isinstance(item, javalang.ast.Node):
+                    yield item
+
+
+def iter_python_ast(tree, max_nodes=None, max_depth=None):
+    """Yield the AST graph of a Python module as records in one pre-order pass.
+
+    Every node and edge is yielded once, and an edge only after both of
+    its endpoints, so consumers can render records as they arrive.
+    """
+    ids = NodeIds()
+    shared = set()
+    for _, node, parent, _ in walk(tree, ast.iter_child_nodes, max_nodes, max_depth):
+        if not node._fields:
+            # Field-less nodes include the Load/Store and operator
+            # singletons, which are added once and linked from every parent.
+            if id(node) in ids:
+                pair = (ids(parent), ids(node))
+                if pair not in shared:
+                    shared.add(pair)
+                    yield EDGE, pair[0], pair[1], None
+                continue
+            if parent is not None:
+                shared.add((ids(parent), ids(node)))
+        key = ids(node)
+        yield NODE, key, python_node_label(node)
+        if parent is not None:
+            yield EDGE, ids(parent), key, None
+
+
+def iter_java_ast(tree, max_nodes=None, max_depth=None):
+    """Yield the AST graph of a Java compilation unit as records in one pre-order pass."""
+    ids = NodeIds()
+    for _, node, parent, _ in walk(tree, java_child_nodes, max_nodes, max_depth):
+        key = ids(node)
+        yield NODE, key, java_node_label(node)
+        if parent is None:
+            continue
+        if isinstance(node, javalang.tree.ClassDeclaration):
+            # Class declarations point back at their container.
+            if node.implements:
+                yield EDGE, key, ids(parent), 'implements'
+            elif node.extends is not None:
+                yield EDGE, key, ids(parent), 'extends'
+        else:
+            yield EDGE, ids(parent), key, 'contains'
+
+
+def build_python_ast_graph(tree, max_nodes=None, max_depth=None):
+    """Build the AST graph for a parsed Python module in one pre-order pass."""
+    return CompactGraph.from_records(iter_python_ast(tree, max_nodes, max_depth))
+
+
+def build_java_ast_graph(tree, max_nodes=None, max_depth=None):
+    """Build the AST graph for a parsed Java compilation unit in one pre-order pass."""
+    return CompactGraph.from_records(iter_java_ast(tree, max_nodes, max_depth))
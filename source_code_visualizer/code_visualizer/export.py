@@ -0,0 +1,265 @@
+"""Headless export of graphs to DOT, GraphML, JSON and SVG files.
+
+``export_tree`` walks a directory and writes the requested graphs of
+every Python and Java file next to each other under an output
+directory, e.g. ``pkg/mod.py.cfg.dot``. Files are exported in parallel
+and each graph is written as soon as it is built, so memory use is
+bounded by the largest file rather than the size of the tree. A
+manifest of the sizes, modification times and hashes of the exported
+files lets later runs skip the files that did not change.
+"""
+import json
+import os
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+from .batch import _init_worker, batch_options, language_for
+from .cache import ANALYSIS_VERSION, code_digest
+from .frontends import get_frontend, lazy_import
+from .layout import LAYOUT_ENGINES
+
+graphviz = lazy_import('graphviz')
+
+EXPORT_FORMATS = ('dot', 'graphml', 'json', 'svg')
+MANIFEST_NAME = 'manifest.json'
+
+# Directories that never hold sources worth visualizing.
+SKIPPED_DIRECTORIES = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.tox', '.venv', 'venv'}
+
+
+class ExportError(Exception):
+    """Raised when an export as a whole cannot run."""
+
+
+def source_paths(root):
+    """Yield the paths of the Python and Java files under ``root``, relative to it, in order."""
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(name for name in dirs if name not in SKIPPED_DIRECTORIES)
+        for name in sorted(names):
+            if language_for(name):
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+
+def to_graphviz(graph, graph_type):
+    """Return a labelled ``graphviz.Digraph`` of a ``{"nodes", "edges"}`` graph."""
+    dot = graphviz.Digraph(engine=LAYOUT_ENGINES.get(graph_type, 'dot'))
+    dot.attr('node', shape='box', style='rounded,filled', fillcolor='#F3E8FF', color='#8B5CF6',
+             fontname='Helvetica', fontsize='10')
+    dot.attr('edge', color='#9CA3AF', fontname='Helvetica', fontsize='9')
+    if dot.engine != 'dot':
+        dot.attr(overlap='false')
+    for node in graph["nodes"]:
+        dot.node(str(node["id"]), node["label"])
+    for edge in graph["edges"]:
+        attrs = {}
+        if edge.get("label"):
+            attrs["label"] = str(edge["label"])
+        if edge.get("relationship") in ('extends', 'implements'):
+            attrs.update(color='#4C1D95', label=edge["relationship"])
+            if edge["relationship"] == 'implements':
+                attrs["style"] = 'dashed'
+        dot.edge(str(edge["source"]), str(edge["target"]), **attrs)
+    return dot
+
+
+def write_dot(graph, graph_type, f):
+    f.write(to_graphviz(graph, graph_type).source.encode('utf-8'))
+
+
+def write_svg(graph, graph_type, f):
+    f.write(to_graphviz(graph, graph_type).pipe(format='svg'))
+
+
+def write_json(graph, graph_type, f):
+    f.write(json.dumps(graph).encode('utf-8'))
+
+
+def write_graphml(graph, graph_type, f):
+    """Write ``graph`` as GraphML, one element at a time."""
+    f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            b'  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+            b'  <key id="edge_label" for="edge" attr.name="label" attr.type="string"/>\n'
+            b'  <key id="relationship" for="edge" attr.name="relationship" attr.type="string"/>\n')
+    f.write(f'  <graph id={quoteattr(graph_type)} edgedefault="directed">\n'.encode('utf-8'))
+    for node in graph["nodes"]:
+        f.write(f'    <node id={quoteattr(str(node["id"]))}><data key="label">{escape(node["label"])}</data>'
+                f'</node>\n'.encode('utf-8'))
+    for edge in graph["edges"]:
+        data = ''
+        if edge.get("label"):
+            data += f'<data key="edge_label">{escape(str(edge["label"]))}</data>'
+        if edge.get("relationship"):
+            data += f'<data key="relationship">{escape(edge["relationship"])}</data>'
+        f.write(f'    <edge source={quoteattr(str(edge["source"]))} target={quoteattr(str(edge["target"]))}>'
+                f'{data}</edge>\n'.encode('utf-8'))
+    f.write(b'  </graph>\n</graphml>\n')
+
+
+WRITERS = {'dot': write_dot, 'graphml': write_graphml, 'json': write_json, 'svg': write_svg}
+
+
+def _write_atomic(path, write):
+    """Call ``write(file)`` on a temporary file and move it to ``path`` once complete."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _settings_key(graph_names, formats):
+    """Return what, besides the source, decides the exported files."""
+    return {"version": ANALYSIS_VERSION, "graphs": list(graph_names), "formats": list(formats)}
+
+
+def export_file(root, path, output, graph_names, formats, previous=None):
+    """Export the graphs of ``root/path``; the unit of work of ``export_tree``.
+
+    ``previous`` is the file's manifest entry from the last run. If the
+    file's hash did not change the graphs are not rebuilt. Returns the
+    new manifest entry with a ``status`` of ``exported``, ``skipped`` or
+    ``failed`` (with an ``error``).
+    """
+    source_path = os.path.join(root, path)
+    stat = os.stat(source_path)
+    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, **_settings_key(graph_names, formats)}
+    language = language_for(path)
+    try:
+        with open(source_path, 'rb') as f:
+            code = f.read().decode('utf-8')
+        entry["digest"] = code_digest(code)
+        if previous is not None and previous.get("digest") == entry["digest"] \
+                and previous.get("outputs") is not None:
+            return {**entry, "outputs": previous["outputs"], "status": "skipped"}
+        tree = get_frontend(language).parse(code)
+        del code
+        outputs = []
+        builders = get_frontend(language).builders
+        for graph_type in graph_names:
+            # One graph at a time, written out before the next is built.
+            graph = builders[graph_type](tree)
+            for export_format in formats:
+                name = f"{path}.{graph_type}.{export_format}"
+                _write_atomic(os.path.join(output, name),
+                              lambda f: WRITERS[export_format](graph, graph_type, f))
+                outputs.append(name)
+            del graph
+    except UnicodeDecodeError:
+        return {**entry, "status": "failed", "error": "File is not valid UTF-8"}
+    except SyntaxError as e:
+        return {**entry, "status": "failed", "error": f"Syntax error in {language} code: {e}"}
+    except Exception as e:
+        return {**entry, "status": "failed", "error": f"Error processing {language} code: {e}"}
+    return {**entry, "outputs": outputs, "status": "exported"}
+
+
+def read_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST_NAME)) as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(output, files):
+    _write_atomic(os.path.join(output, MANIFEST_NAME),
+                  lambda f: f.write(json.dumps({"files": files}, indent=1, sort_keys=True).encode('utf-8')))
+
+
+def _remove_outputs(output, names):
+    for name in names:
+        try:
+            os.unlink(os.path.join(output, name))
+        except OSError:
+            pass
+
+
+def _unchanged(entry, stat, key):
+    return (entry is not None and "error" not in entry
+            and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size
+            and all(entry.get(name) == value for name, value in key.items()))
+
+
+def export_tree(root, output, graph_names, formats, workers=None, force=False, progress=None):
+    """Export every Python and Java file under ``root`` into ``output``.
+
+    Files whose size and modification time match the manifest are
+    skipped without being read; files that were touched but hash the
+    same are skipped without being parsed; ``force`` exports every file.
+    Outputs that this run does not rewrite are removed: those of files
+    that no longer exist or fail, and of graphs and formats no longer
+    asked for. ``progress(path, entry)`` is called as each file finishes.
+    Returns the counts of exported, skipped and failed files.
+    """
+    unknown = [name for name in formats if name not in WRITERS]
+    if unknown:
+        raise ExportError(f"Unknown export format: {', '.join(unknown)}")
+    if not os.path.isdir(root):
+        raise ExportError(f"No such directory: {root}")
+    root = os.path.abspath(root)
+    output = os.path.abspath(output)
+
+    manifest = read_manifest(output)
+    key = _settings_key(graph_names, formats)
+    files = {}
+    counts = {"exported": 0, "skipped": 0, "failed": 0}
+
+    def finish(path, entry):
+        if entry["status"] == "failed" and path in manifest:
+            _remove_outputs(output, manifest[path].get("outputs") or ())
+        counts[entry.pop("status")] += 1
+        files[path] = entry
+        if progress is not None:
+            progress(path, entry)
+
+    work = []
+    for path in source_paths(root):
+        if os.path.join(root, path).startswith(output + os.sep):
+            continue
+        previous = manifest.get(path)
+        stat = os.stat(os.path.join(root, path))
+        if not force and _unchanged(previous, stat, key):
+            finish(path, {**previous, "status": "skipped"})
+            continue
+        if previous is not None:
+            rewritten = {f"{path}.{graph_type}.{export_format}"
+                         for graph_type in graph_names for export_format in formats}
+            _remove_outputs(output, [name for name in previous.get("outputs") or () if name not in rewritten])
+            if force or any(previous.get(name) != value for name, value in key.items()):
+                previous = None
+        work.append((path, previous))
+
+    if workers is None:
+        workers = batch_options()['WORKERS'] or os.cpu_count() or 1
+    workers = min(workers, len(work))
+    try:
+        if workers <= 1:
+            for path, previous in work:
+                finish(path, export_file(root, path, output, graph_names, formats, previous))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                futures = {executor.submit(export_file, root, path, output, graph_names, formats, previous): path
+                           for path, previous in work}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        entry = {"status": "failed", "error": f"Worker failed: {e}"}
+                    finish(path, entry)
+    finally:
+        # Keep what was exported even if the run is interrupted.
+        pending = {path: manifest[path] for path, _ in work if path not in files and path in manifest}
+        write_manifest(output, {**pending, **files})
+    for path, entry in manifest.items():
+        if path not in files:
+            # The source is gone.
+            _remove_outputs(output, entry.get("outputs") or ())
+    return counts
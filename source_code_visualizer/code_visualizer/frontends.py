@@ -0,0 +1,128 @@
+"""Registry of language front ends, each imported the first time it is used.
+
+A front end is a module that declares, for one language:
+
+- ``parse(code)``, returning the parsed tree;
+- ``BUILDERS``, a function building each graph type from that tree;
+- ``records(tree, graph)``, returning ``(records, edge attribute name)``
+  to stream one graph;
+- optionally ``preload()``, to import whatever it defers until first use.
+
+Only the module path and file extensions are registered up front, so
+handling Python code never imports javalang. Front ends for other
+languages are added with ``register``, e.g. from an ``AppConfig.ready``.
+With ``PRELOAD`` set in ``CODE_VISUALIZER_FRONTENDS`` every front end is
+imported at startup instead, so prefork servers load them once in the
+parent process.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+
+from django.conf import settings
+
+
+class UnsupportedLanguage(LookupError):
+    """Raised for a language no front end is registered for."""
+
+
+class Frontend:
+    """A registered language: its module is imported on first use."""
+
+    def __init__(self, language, module_name, extensions):
+        self.language = language
+        self.module_name = module_name
+        self.extensions = tuple(extensions)
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    @property
+    def module(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def parse(self, code):
+        return self.module.parse(code)
+
+    @property
+    def builders(self):
+        return self.module.BUILDERS
+
+    def records(self, tree, graph):
+        return self.module.records(tree, graph)
+
+    def preload(self):
+        preload = getattr(self.module, 'preload', None)
+        if preload is not None:
+            preload()
+
+
+_frontends = {}
+_extensions = {}
+
+
+def register(language, module_name, extensions=()):
+    """Register (or replace) the front end module for ``language``."""
+    frontend = Frontend(language, module_name, extensions)
+    _frontends[language] = frontend
+    for extension in frontend.extensions:
+        _extensions[extension.lower()] = language
+    return frontend
+
+
+def get_frontend(language):
+    """Return the front end for ``language``; raises ``UnsupportedLanguage``."""
+    try:
+        return _frontends[language]
+    except KeyError:
+        raise UnsupportedLanguage(language) from None
+
+
+def languages():
+    """Return the names of the registered languages."""
+    return tuple(_frontends)
+
+
+def language_for(filename):
+    """Return the language for ``filename`` from its extension, or None."""
+    return _extensions.get(os.path.splitext(filename)[1].lower())
+
+
+def frontend_options():
+    """Return ``CODE_VISUALIZER_FRONTENDS`` merged over the defaults."""
+    options = {'PRELOAD': False}
+    options.update(getattr(settings, 'CODE_VISUALIZER_FRONTENDS', {}))
+    return options
+
+
+def preload():
+    """Import every front end and what it defers now rather than on first use."""
+    for frontend in _frontends.values():
+        frontend.preload()
+
+
+def lazy_import(name):
+    """Return module ``name``, to be executed on its first attribute access."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+register('python', 'code_visualizer.python_frontend', ('.py',))
+register('java', 'code_visualizer.java_frontend', ('.java',))
@@ -0,0 +1,280 @@
+"""Graphs kept in the database and queried a page at a time.
+
+``store_graph`` writes the nodes and edges of a built graph as rows of
+``GraphNode`` and ``GraphEdge``. The queries below only ever read the
+rows they return (plus, for traversals, the ids on the frontier), so a
+client can explore a graph of 100k nodes without it being loaded whole.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+
+from .cache import ANALYSIS_VERSION
+from .models import GraphEdge, GraphNode, StoredGraph
+
+QUERIES = ('nodes', 'units', 'children', 'neighborhood', 'path')
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGE_SIZE = 1000
+DEFAULT_MAX_HOPS = 3
+DEFAULT_MAX_PATH_LENGTH = 64
+
+# Ids per ``IN (...)``, well below SQLite's parameter limit.
+BATCH_SIZE = 500
+INSERT_BATCH_SIZE = 5000
+
+
+def graph_store_options():
+    """Return ``CODE_VISUALIZER_GRAPH_STORE`` merged over the defaults."""
+    options = {
+        'PAGE_SIZE': DEFAULT_PAGE_SIZE,
+        'MAX_PAGE_SIZE': DEFAULT_MAX_PAGE_SIZE,
+        'MAX_HOPS': DEFAULT_MAX_HOPS,
+        'MAX_PATH_LENGTH': DEFAULT_MAX_PATH_LENGTH,
+    }
+    options.update(getattr(settings, 'CODE_VISUALIZER_GRAPH_STORE', {}))
+    return options
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def find_graph(language, digest, name):
+    """Return the graph stored for this code by the current builders, or None."""
+    return StoredGraph.objects.filter(language=language, digest=digest, graph=name,
+                                      analysis_version=ANALYSIS_VERSION).first()
+
+
+def _insert(model, fields, rows):
+    """Insert tuples of ``fields`` values with one ``executemany`` per batch.
+
+    Building a model instance per row costs more than the insert itself
+    for graphs of this size.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+    with connection.cursor() as cursor:
+        for batch in _batches(rows, INSERT_BATCH_SIZE):
+            cursor.executemany(sql, batch)
+
+
+def store_graph(language, digest, name, graph, unit_of):
+    """Write ``graph`` to the database; return ``(stored graph, created)``.
+
+    ``unit_of(node id)`` names the function or class a node belongs to.
+    A graph already stored for the same content hash by the same
+    ``ANALYSIS_VERSION`` is reused.
+    """
+    stored = find_graph(language, digest, name)
+    if stored is not None:
+        return stored, False
+    try:
+        with transaction.atomic():
+            stored = StoredGraph.objects.create(language=language, digest=digest, graph=name,
+                                                analysis_version=ANALYSIS_VERSION,
+                                                node_count=len(graph["nodes"]), edge_count=len(graph["edges"]))
+            graph_id = StoredGraph._meta.pk.get_db_prep_value(stored.pk, connection)
+            _insert(GraphNode, ('graph', 'node_id', 'label', 'unit', 'position'),
+                    ((graph_id, str(node["id"]), node["label"], unit_of(str(node["id"])), position)
+                     for position, node in enumerate(graph["nodes"])))
+            _insert(GraphEdge, ('graph', 'source', 'target', 'label', 'relationship', 'position'),
+                    ((graph_id, str(edge["source"]), str(edge["target"]), str(edge.get("label") or ''),
+                      edge.get("relationship") or '', position)
+                     for position, edge in enumerate(graph["edges"])))
+    except IntegrityError:
+        # Stored by a concurrent request in the meantime.
+        return find_graph(language, digest, name), False
+    return stored, True
+
+
+def _node(row):
+    node_id, label = row
+    return {"id": node_id, "label": label}
+
+
+def _edge(row):
+    source, target, label, relationship = row
+    edge = {"source": source, "target": target}
+    if label:
+        edge["label"] = label
+    if relationship:
+        edge["relationship"] = relationship
+    return edge
+
+
+def _page(queryset, offset, limit):
+    """Return the rows of one page and the offset of the next one (None at the end)."""
+    rows = list(queryset[offset:offset + limit + 1])
+    return rows[:limit], (offset + limit if len(rows) > limit else None)
+
+
+def _nodes(stored, node_ids):
+    """Return the nodes with the given ids, in the order of ``node_ids``."""
+    found = {}
+    for batch in _batches(node_ids):
+        found.update((row[0], _node(row)) for row in
+                     GraphNode.objects.filter(graph=stored, node_id__in=batch).values_list('node_id', 'label'))
+    return [found[node_id] for node_id in node_ids if node_id in found]
+
+
+def _edges_between(stored, node_ids):
+    """Return the edges whose ends are both in ``node_ids``."""
+    node_ids = set(node_ids)
+    edges = []
+    for batch in _batches(sorted(node_ids)):
+        rows = (GraphEdge.objects.filter(graph=stored, source__in=batch)
+                .values_list('source', 'target', 'label', 'relationship', 'position'))
+        edges.extend(row for row in rows if row[1] in node_ids)
+    edges.sort(key=lambda row: row[4])
+    return [_edge(row[:4]) for row in edges]
+
+
+def has_node(stored, node_id):
+    return GraphNode.objects.filter(graph=stored, node_id=node_id).exists()
+
+
+def nodes(stored, offset, limit, label=None, prefix=None, unit=None):
+    """Return a page of nodes, optionally those with a ``label``, a label ``prefix`` or in a ``unit``.
+
+    The page carries the edges between its nodes.
+    """
+    queryset = GraphNode.objects.filter(graph=stored)
+    if label is not None:
+        queryset = queryset.filter(label=label)
+    if prefix is not None:
+        queryset = queryset.filter(label__startswith=prefix)
+    if unit is not None:
+        queryset = queryset.filter(unit=unit)
+    rows, next_offset = _page(queryset.order_by('position').values_list('node_id', 'label'), offset, limit)
+    return {
+        "nodes": [_node(row) for row in rows],
+        "edges": _edges_between(stored, [row[0] for row in rows]),
+        "next": next_offset,
+    }
+
+
+def units(stored, offset, limit):
+    """Return a page of the functions and classes of a graph with their node counts."""
+    queryset = (GraphNode.objects.filter(graph=stored).values('unit')
+                .annotate(nodes=Count('id')).order_by('unit').values_list('unit', 'nodes'))
+    rows, next_offset = _page(queryset, offset, limit)
+    return {"units": [{"name": name, "nodes": count} for name, count in rows], "next": next_offset}
+
+
+def children(stored, node_id, offset, limit):
+    """Return a page of the successors of ``node_id`` and the edges to them."""
+    queryset = (GraphEdge.objects.filter(graph=stored, source=node_id).order_by('position')
+                .values_list('source', 'target', 'label', 'relationship'))
+    rows, next_offset = _page(queryset, offset, limit)
+    return {
+        "node": node_id,
+        "nodes": _nodes(stored, list(dict.fromkeys(row[1] for row in rows))),
+        "edges": [_edge(row) for row in rows],
+        "next": next_offset,
+    }
+
+
+def _neighbors(stored, node_ids, direction):
+    """Yield ``(node, neighbor)`` for the edges leaving (``out``), entering (``in``) or touching ``node_ids``."""
+    for batch in _batches(node_ids):
+        if direction in ('out', 'both'):
+            yield from (GraphEdge.objects.filter(graph=stored, source__in=batch)
+                        .order_by('position').values_list('source', 'target').iterator())
+        if direction in ('in', 'both'):
+            for source, target in (GraphEdge.objects.filter(graph=stored, target__in=batch)
+                                   .order_by('position').values_list('source', 'target').iterator()):
+                yield target, source
+
+
+def neighborhood(stored, node_id, hops, limit):
+    """Return the nodes at most ``hops`` edges away from ``node_id``, in either direction.
+
+    At most ``limit`` nodes are returned, nearest first, each with its
+    ``distance``; ``truncated`` says whether some were left out.
+    """
+    distances = {node_id: 0}
+    frontier = [node_id]
+    truncated = False
+    for distance in range(1, hops + 1):
+        next_frontier = []
+        for _, neighbor in _neighbors(stored, frontier, 'both'):
+            if neighbor in distances:
+                continue
+            if len(distances) >= limit:
+                truncated = True
+                break
+            distances[neighbor] = distance
+            next_frontier.append(neighbor)
+        if truncated or not next_frontier:
+            break
+        frontier = next_frontier
+    found = _nodes(stored, list(distances))
+    for node in found:
+        node["distance"] = distances[node["id"]]
+    return {"node": node_id, "nodes": found, "edges": _edges_between(stored, distances), "truncated": truncated}
+
+
+def _shortest_path(stored, source, target, max_length, directed):
+    """Return the node ids on a shortest path from ``source`` to ``target``, or None.
+
+    Searches from both ends at once, expanding the smaller frontier.
+    """
+    if source == target:
+        return [source]
+    forward, backward = {source: None}, {target: None}
+    forward_frontier, backward_frontier = [source], [target]
+    for _ in range(max_length):
+        if not forward_frontier or not backward_frontier:
+            return None
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            frontier, parents, others = forward_frontier, forward, backward
+        else:
+            frontier, parents, others = backward_frontier, backward, forward
+        direction = 'both' if not directed else ('out' if expand_forward else 'in')
+        next_frontier = []
+        for node, neighbor in _neighbors(stored, frontier, direction):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = node
+            if neighbor in others:
+                path = []
+                step = neighbor
+                while step is not None:
+                    path.append(step)
+                    step = forward[step]
+                path.reverse()
+                step = backward[neighbor]
+                while step is not None:
+                    path.append(step)
+                    step = backward[step]
+                return path
+            next_frontier.append(neighbor)
+        if expand_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+    return None
+
+
+def path(stored, source, target, max_length, directed=True):
+    """Return a shortest path of at most ``max_length`` edges from ``source`` to ``target``.
+
+    ``nodes`` and ``edges`` are in path order and empty if there is none.
+    With ``directed`` false edges may be followed backwards.
+    """
+    node_ids = _shortest_path(stored, source, target, max_length, directed)
+    if node_ids is None:
+        return {"source": source, "target": target, "nodes": [], "edges": []}
+    found = {}
+    for edge in _edges_between(stored, node_ids):
+        found.setdefault((edge["source"], edge["target"]), edge)
+    # Every step was taken along an edge, backwards only if undirected.
+    edges = [found.get((a, b)) or found[(b, a)] for a, b in zip(node_ids, node_ids[1:])]
+    return {"source": source, "target": target, "nodes": _nodes(stored, node_ids), "edges": edges}
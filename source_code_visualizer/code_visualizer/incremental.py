@@ -0,0 +1,682 @@
+"""Incremental re-analysis: rebuild only the definitions that changed.
+
+The tree is split into regions: the module (or compilation unit) node,
+each top-level statement or type declaration, and each method of a
+top-level class. A region is identified by a stable key (e.g.
+``class:Shape.def:area``) and hashed from its own source. Node ids are
+``<region key>/<pre-order index>``, so they stay the same as long as the
+region does. Re-analyzing code against a stored base result only walks
+the regions whose hash changed and returns the difference.
+"""
+import ast
+import hashlib
+import uuid
+
+from .cfg import JavaControlFlow, PythonControlFlow, java_methods
+from .dataflow import JavaReachingDefinitions, PythonReachingDefinitions, java_fields, python_events
+from .engine import NodeIds, TraversalLimitExceeded, java_child_nodes, java_node_label, python_node_label, walk
+from .frontends import lazy_import
+from .java_frontend import parse_java_tokens
+from .symbols import FileSymbols, SymbolIndex, build_call_graph, java_file_symbols, python_file_symbols
+
+javalang = lazy_import('javalang')
+
+# Languages whose definitions can be re-analyzed one at a time.
+LANGUAGES = ('python', 'java')
+
+# The Load/Store and operator nodes are shared singletons in CPython's
+# AST; each gets one id for the whole graph.
+PYTHON_SHARED_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+PYTHON_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class RegionSpec:
+    """A region found in a freshly parsed tree, before it is built."""
+
+    __slots__ = ('key', 'digest', 'root', 'container', 'depth', 'nested', 'symbol_tree')
+
+    def __init__(self, key, digest, root, container, depth, nested, symbol_tree):
+        self.key = key
+        self.digest = digest
+        self.root = root
+        self.container = container  # id of the node the root hangs off, if any
+        self.depth = depth
+        self.nested = nested  # id(root node) -> key of the regions nested in this one
+        self.symbol_tree = symbol_tree  # stand-alone tree for symbol extraction
+
+
+class Region:
+    """The built graphs of one region."""
+
+    __slots__ = ('key', 'digest', 'ast_nodes', 'ast_edges', 'shared', 'children', 'symbols', 'cfg',
+                 'ddg', 'free', 'scope')
+
+    def __init__(self, key, digest):
+        self.key = key
+        self.digest = digest
+        self.ast_nodes = {}  # id -> label
+        self.ast_edges = {}  # (source, target) -> attr
+        self.shared = {}  # ids of shared nodes -> label
+        self.children = []  # keys of the regions nested in this one, in order
+        self.symbols = None
+        self.cfg = None  # control flow of the functions defined in the region
+        self.ddg = None  # def -> use edges resolved inside the region
+        # (name, use id, label, in the definition's header) of the uses
+        # the region does not define.
+        self.free = []
+        # name -> [(id, label)] of a class's attributes (Python) or fields
+        # (Java), for the uses in its method regions.
+        self.scope = {}
+
+
+class AnalysisState:
+    """Everything needed to diff a later version of the code against this one."""
+
+    def __init__(self, language, root, regions, module=None):
+        self.id = uuid.uuid4().hex
+        self.language = language
+        self.root = root
+        self.regions = regions
+        module = module or {}
+        self.cfg = _control_flow(self, module.get("cfg"))
+        self.ddg = _data_flow(self, module.get("ddg"), module.get("scope", {}))
+        self.calls = _call_graph(self)
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part.encode('utf-8') if isinstance(part, str) else part)
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def _unique_key(key, seen):
+    count = seen.get(key, 0) + 1
+    seen[key] = count
+    return key if count == 1 else f"{key}#{count}"
+
+
+# Python regions
+
+class _PythonSource:
+    """Byte offsets of a module's lines, for slicing out node sources."""
+
+    def __init__(self, code):
+        self.data = code.encode('utf-8')
+        self.line_starts = [0]
+        for line in self.data.splitlines(keepends=True):
+            self.line_starts.append(self.line_starts[-1] + len(line))
+
+    def span(self, node):
+        """Return the byte span of ``node``, including its decorators."""
+        first = min([node, *getattr(node, 'decorator_list', ())], key=lambda n: (n.lineno, n.col_offset))
+        return (self.line_starts[first.lineno - 1] + first.col_offset,
+                self.line_starts[node.end_lineno - 1] + node.end_col_offset)
+
+    def text(self, span, holes=()):
+        """Return the source in ``span`` without the ``holes`` spans."""
+        start, end = span
+        parts = []
+        for hole_start, hole_end in holes:
+            parts.append(self.data[start:hole_start])
+            start = hole_end
+        parts.append(self.data[start:end])
+        return b''.join(parts)
+
+
+def _python_key(node, seen, digest):
+    if isinstance(node, PYTHON_DEFINITIONS):
+        return _unique_key(f"def:{node.name}", seen)
+    if isinstance(node, ast.ClassDef):
+        return _unique_key(f"class:{node.name}", seen)
+    return _unique_key(f"stmt:{digest[:12]}", seen)
+
+
+def python_regions(tree, code):
+    """Split a Python module into regions."""
+    source = _PythonSource(code)
+    specs = []
+    nested = {}
+    seen = {}
+    for statement in tree.body:
+        span = source.span(statement)
+        if not isinstance(statement, ast.ClassDef):
+            digest = _digest(source.text(span))
+            key = _python_key(statement, seen, digest)
+            symbol_tree = ast.Module(body=[statement], type_ignores=[])
+            specs.append(RegionSpec(key, digest, statement, 'module/0', 1, {}, symbol_tree))
+            nested[id(statement)] = key
+            continue
+
+        key = _python_key(statement, seen, '')
+        methods = [child for child in statement.body if isinstance(child, PYTHON_DEFINITIONS)]
+        method_seen = {}
+        method_specs = []
+        for method in methods:
+            method_key = _unique_key(f"{key}.def:{method.name}", method_seen)
+            wrapper = ast.ClassDef(name=statement.name, bases=[], keywords=[], body=[method], decorator_list=[])
+            method_specs.append(RegionSpec(
+                method_key, _digest(source.text(source.span(method))), method, f"{key}/0", 2, {},
+                ast.Module(body=[wrapper], type_ignores=[]),
+            ))
+        shell = ast.ClassDef(
+            name=statement.name, bases=statement.bases, keywords=statement.keywords,
+            body=[child for child in statement.body if not isinstance(child, PYTHON_DEFINITIONS)],
+            decorator_list=statement.decorator_list,
+        )
+        shell_text = source.text(span, [source.span(method) for method in methods])
+        specs.append(RegionSpec(
+            key, _digest(shell_text, *(spec.key for spec in method_specs)), statement, 'module/0', 1,
+            {id(spec.root): spec.key for spec in method_specs}, ast.Module(body=[shell], type_ignores=[]),
+        ))
+        specs.extend(method_specs)
+        nested[id(statement)] = key
+
+    root = RegionSpec('module', _digest(*nested.values()), tree, None, 0, nested, None)
+    return [root] + specs
+
+
+# Java regions
+
+def _split_tokens(tokens, start, end):
+    """Split ``tokens[start:end]`` into top-level declarations.
+
+    A declaration ends at a ``;`` or at the ``}`` that closes its braces.
+    """
+    segments = []
+    depth = 0
+    first = start
+    for i in range(start, end):
+        value = tokens[i].value
+        if value == '{':
+            depth += 1
+        elif value == '}':
+            depth -= 1
+            if depth == 0:
+                segments.append((first, i + 1))
+                first = i + 1
+        elif value == ';' and depth == 0:
+            segments.append((first, i + 1))
+            first = i + 1
+    if first < end:
+        segments.append((first, end))
+    return segments
+
+
+def _assign_segments(tokens, segments, nodes):
+    """Return one ``(start, end)`` token span per node, in order.
+
+    Node positions point past modifiers and annotations, so each node gets
+    the segment containing its position plus any segments before it that
+    hold no node (its modifiers, stray semicolons). Returns None if a node
+    has no position (initializer blocks, for one).
+    """
+    spans = []
+    position = 0
+    for node in nodes:
+        if getattr(node, 'position', None) is None:
+            return None
+        start = segments[position][0] if position < len(segments) else None
+        while position < len(segments) and tokens[segments[position][1] - 1].position < node.position:
+            position += 1
+        if position == len(segments):
+            return None
+        spans.append((start, segments[position][1]))
+        position += 1
+    return spans
+
+
+def _token_text(tokens, spans):
+    return '\0'.join(tokens[i].value for start, end in spans for i in range(start, end))
+
+
+def _copy_java_node(node, **changes):
+    attrs = {attr: getattr(node, attr) for attr in node.attrs}
+    attrs.update(changes)
+    return type(node)(**attrs)
+
+
+# By class name, so javalang is not needed until Java code is seen.
+JAVA_TYPE_KINDS = {
+    'ClassDeclaration': 'class',
+    'InterfaceDeclaration': 'interface',
+    'EnumDeclaration': 'enum',
+}
+
+
+def java_regions(tree, tokens):
+    """Split a Java compilation unit into regions.
+
+    Regions are hashed from their tokens, so whitespace and comments do
+    not count as changes. Every hash includes the package and imports,
+    which change how every call resolves.
+    """
+    types = list(tree.types or ())
+    segments = _split_tokens(tokens, 0, len(tokens))
+    spans = _assign_segments(tokens, segments, types)
+    if spans is None:
+        return None
+    type_tokens = {i for start, end in spans for i in range(start, end)}
+    unit_digest = _digest('\0'.join(token.value for i, token in enumerate(tokens) if i not in type_tokens))
+
+    def unit(*types):
+        return javalang.tree.CompilationUnit(package=tree.package, imports=tree.imports, types=list(types))
+
+    specs = []
+    nested = {}
+    seen = {}
+    for declaration, span in zip(types, spans):
+        kind = JAVA_TYPE_KINDS.get(type(declaration).__name__, 'type')
+        key = _unique_key(f"{kind}:{declaration.name}", seen)
+        nested[id(declaration)] = key
+        members = declaration.body if kind in ('class', 'interface') else []
+        methods = [member for member in members if isinstance(member, java_methods())]
+
+        member_spans = None
+        if methods:
+            open_brace = next(i for i in range(*span)
+                              if tokens[i].value == '{' and tokens[i].position >= declaration.position)
+            member_segments = _split_tokens(tokens, open_brace + 1, span[1] - 1)
+            member_spans = _assign_segments(tokens, member_segments, members)
+        if not member_spans:
+            specs.append(RegionSpec(key, _digest(unit_digest, _token_text(tokens, [span])), declaration,
+                                    'unit/0', 1, {}, unit(declaration)))
+            continue
+
+        method_spans = [member_span for member, member_span in zip(members, member_spans)
+                        if isinstance(member, java_methods())]
+        holes = []
+        start = span[0]
+        for hole_start, hole_end in method_spans:
+            holes.append((start, hole_start))
+            start = hole_end
+        holes.append((start, span[1]))
+        shell_digest = _digest(unit_digest, _token_text(tokens, holes))
+
+        method_seen = {}
+        method_specs = []
+        for position, (member, member_span) in enumerate(zip(members, member_spans)):
+            if not isinstance(member, java_methods()):
+                continue
+            label = 'ctor' if isinstance(member, javalang.tree.ConstructorDeclaration) else 'method'
+            method_key = _unique_key(f"{key}.{label}:{member.name}", method_seen)
+            # Fields declared before the method give its receivers their types.
+            fields = [field for field in members[:position] if isinstance(field, javalang.tree.FieldDeclaration)]
+            method_specs.append(RegionSpec(
+                method_key, _digest(shell_digest, _token_text(tokens, [member_span])), member, f"{key}/0", 2, {},
+                unit(_copy_java_node(declaration, body=fields + [member])),
+            ))
+        shell = _copy_java_node(declaration, body=[member for member in members if not isinstance(member, java_methods())])
+        specs.append(RegionSpec(
+            key, _digest(shell_digest, *(spec.key for spec in method_specs)), declaration, 'unit/0', 1,
+            {id(spec.root): spec.key for spec in method_specs}, unit(shell),
+        ))
+        specs.extend(method_specs)
+
+    root = RegionSpec('unit', _digest(unit_digest, *nested.values()), tree, None, 0, nested, None)
+    return [root] + specs
+
+
+# Building regions
+
+def build_region(spec, language, max_depth=None):
+    """Walk one region and build its graphs."""
+    region = Region(spec.key, spec.digest)
+    ids = NodeIds(f"{spec.key}/")
+    pruned = set()
+    nested = spec.nested
+    children = ast.iter_child_nodes if language == 'python' else java_child_nodes
+    if max_depth is not None:
+        max_depth -= spec.depth
+
+    def region_children(node):
+        return () if id(node) in pruned else children(node)
+
+    for _, node, parent, _ in walk(spec.root, region_children, max_depth=max_depth):
+        nested_key = nested.get(id(node))
+        if nested_key is not None:
+            pruned.add(id(node))
+            region.children.append(nested_key)
+            continue
+        parent_id = ids(parent) if parent is not None else spec.container
+
+        if language == 'python':
+            if isinstance(node, PYTHON_SHARED_TYPES):
+                node_id = f"~{type(node).__name__}"
+                region.shared[node_id] = python_node_label(node)
+                region.ast_edges[(parent_id, node_id)] = None
+                continue
+            node_id = ids(node)
+            region.ast_nodes[node_id] = python_node_label(node)
+            if parent_id is not None:
+                region.ast_edges[(parent_id, node_id)] = None
+        else:
+            node_id = ids(node)
+            region.ast_nodes[node_id] = java_node_label(node)
+            if parent_id is None:
+                pass
+            elif isinstance(node, javalang.tree.ClassDeclaration):
+                # Class declarations point back at their container.
+                if node.implements:
+                    region.ast_edges[(node_id, parent_id)] = 'implements'
+                elif node.extends is not None:
+                    region.ast_edges[(node_id, parent_id)] = 'extends'
+            else:
+                region.ast_edges[(parent_id, node_id)] = 'contains'
+
+    unit = _unit_name(spec.key)
+    if unit is not None:
+        builder = _region_control_flow(spec, language, unit, max_depth)
+        region.cfg = builder.graph.to_dict(edge_attr='label')
+        _region_data_flow(region, spec, language, builder, ids)
+    if spec.symbol_tree is not None:
+        if language == 'python':
+            region.symbols = python_file_symbols(spec.symbol_tree)
+        else:
+            region.symbols = java_file_symbols(spec.symbol_tree)
+    return region
+
+
+def _unit_name(key):
+    """Return the control-flow unit name of a definition's region, e.g. ``Shape.area``."""
+    if key.startswith('stmt:') or ':' not in key:
+        return None
+    return '.'.join(part.split(':', 1)[1] for part in key.split('.'))
+
+
+def _region_control_flow(spec, language, unit, max_depth):
+    """Build the control flow of a region's definition and whatever it nests, except other regions."""
+    if language == 'python':
+        builder = PythonControlFlow(max_depth=max_depth)
+        builder.skip.update(spec.nested)
+        builder.add_unit('', unit, spec.root.body, spec.root)
+    else:
+        builder = JavaControlFlow(max_depth=max_depth)
+        builder.skip.update(spec.nested)
+        if not isinstance(spec.root, java_methods()):
+            builder.add_type('', spec.root)
+        elif spec.root.body is not None:
+            builder.add_unit('', unit, spec.root.body, spec.root)
+    builder.build()
+    return builder
+
+
+def _region_data_flow(region, spec, language, builder, ids):
+    """Solve reaching definitions inside a definition's region.
+
+    Uses of names the region does not define are kept in ``region.free``
+    and linked when the state is assembled: to the module's top-level
+    definitions, or to the attributes or fields of the class a method
+    region belongs to.
+    """
+    roots = {node: f"{key}/0" for node, key in spec.nested.items()}
+
+    def node_id(node):
+        return ids.get(id(node)) or roots[id(node)]
+
+    if language == 'python':
+        flow = PythonReachingDefinitions(builder, node_id)
+        flow.solve()
+        # The header (decorators, defaults, bases) is evaluated where the
+        # definition stands, outside the region's own scope.
+        uses, _, links = python_events(spec.root)
+        for definition, use, name in links:
+            flow.link(definition, use, name)
+        head = [(name, node_id(node), flow.label(node, name), True) for name, node in uses]
+        if isinstance(spec.root, ast.ClassDef):
+            scope = flow.scopes[id(builder.units[0])]
+            region.scope = {name: [(node_id(node), flow.label(node, name)) for node in nodes]
+                            for name, nodes in scope.items()}
+    else:
+        flow = JavaReachingDefinitions(builder, node_id)
+        flow.solve()
+        head = []
+        if not isinstance(spec.root, java_methods()):
+            region.scope = {name: [(node_id(node), f"Field: {name}") for node in nodes]
+                            for name, nodes in java_fields(spec.root).items()}
+    region.ddg = flow.graph.to_dict()
+    region.free = [(name, node_id(node), flow.label(node, name), False) for name, node in flow.free] + head
+
+
+def _region_ids(spec):
+    """Return the ids ``build_region`` gives the nodes of a Python statement region."""
+    ids = NodeIds(f"{spec.key}/")
+    for _, node, _, _ in walk(spec.root, ast.iter_child_nodes):
+        if not isinstance(node, PYTHON_SHARED_TYPES):
+            ids(node)
+    return ids
+
+
+def module_flow(specs, max_depth=None):
+    """Build the control flow and data flow of a Python module's top-level code.
+
+    Top-level code spans many regions, so it is rebuilt on every run; it
+    does not descend into the definitions that are regions of their own.
+    Returns the ``cfg`` and ``ddg`` graphs and the ``scope`` of top-level
+    names.
+    """
+    builder = PythonControlFlow(max_depth=max_depth)
+    builder.skip.update(id(spec.root) for spec in specs[1:])
+    builder.module(specs[0].root)
+    ids = {}
+    for spec in specs[1:]:
+        if spec.key.startswith('stmt:'):
+            ids.update(_region_ids(spec))
+        else:
+            ids[id(spec.root)] = f"{spec.key}/0"
+    flow = PythonReachingDefinitions(builder, lambda node: ids[id(node)])
+    flow.solve()
+    scope = flow.scopes[id(builder.units[0])]
+    return {
+        "cfg": builder.graph.to_dict(edge_attr='label'),
+        "ddg": flow.graph.to_dict(),
+        "scope": {name: [(ids[id(node)], flow.label(node, name)) for node in nodes] for name, nodes in scope.items()},
+    }
+
+
+def _ordered(state):
+    """Yield the state's regions in source order."""
+    stack = [state.root]
+    while stack:
+        region = state.regions[stack.pop()]
+        yield region
+        stack.extend(reversed(region.children))
+
+
+def _data_flow(state, module_ddg, module_scope):
+    """Assemble the DDG from the regions', linking the uses they left free."""
+    nodes, edges = {}, {}
+    for ddg in [module_ddg] + [region.ddg for region in _ordered(state)]:
+        if ddg is not None:
+            nodes.update((node["id"], node["label"]) for node in ddg["nodes"])
+            edges.update(((edge["source"], edge["target"]), None) for edge in ddg["edges"])
+    for region in _ordered(state):
+        container = state.regions.get(region.key.rsplit('.', 1)[0]) if '.' in region.key else None
+        for name, use, label, head in region.free:
+            definitions = None
+            # Java methods see their class's fields; Python methods only
+            # see class attributes in their decorators and defaults.
+            if container is not None and (head or state.language == 'java'):
+                definitions = container.scope.get(name)
+            if not definitions:
+                definitions = module_scope.get(name)
+            for definition, definition_label in definitions or ():
+                nodes[definition] = definition_label
+                nodes[use] = label
+                edges[(definition, use)] = None
+    return {
+        "nodes": [{"id": node_id, "label": label} for node_id, label in nodes.items()],
+        "edges": [{"source": source, "target": target} for source, target in edges],
+    }
+
+
+def _control_flow(state, module_cfg):
+    nodes, edges = [], []
+    for cfg in [module_cfg] + [region.cfg for region in _ordered(state)]:
+        if cfg is not None:
+            nodes.extend(cfg["nodes"])
+            edges.extend(cfg["edges"])
+    return {"nodes": nodes, "edges": edges}
+
+
+def _call_graph(state):
+    """Build the call graph from the regions' symbols."""
+    definitions, calls, imports, relations = [], [], {}, []
+    seen_definitions, seen_relations = set(), set()
+    scope = ''
+    for region in _ordered(state):
+        symbols = region.symbols
+        if symbols is None:
+            continue
+        scope = symbols.scope
+        for symbol in symbols.definitions:
+            if (symbol.qualname, symbol.kind) not in seen_definitions:
+                seen_definitions.add((symbol.qualname, symbol.kind))
+                definitions.append(symbol)
+        calls.extend(symbols.calls)
+        imports.update(symbols.imports)
+        for relation in symbols.relations:
+            if relation not in seen_relations:
+                seen_relations.add(relation)
+                relations.append(relation)
+    file_symbols = FileSymbols('', state.language, scope, definitions, calls, imports, relations)
+    index = SymbolIndex()
+    index.update(file_symbols)
+    return build_call_graph(index, [file_symbols]).to_dict(edge_attr='label')
+
+
+def _graph(state, nodes_attr, edges_attr, edge_attr=None):
+    nodes, edges = [], []
+    shared = {}
+    for region in _ordered(state):
+        nodes.extend({"id": node_id, "label": label} for node_id, label in getattr(region, nodes_attr).items())
+        for (source, target), attr in getattr(region, edges_attr).items():
+            edge = {"source": source, "target": target}
+            if edge_attr is not None:
+                edge[edge_attr] = attr or 'contains'
+            edges.append(edge)
+        shared.update(region.shared)
+    nodes.extend({"id": node_id, "label": label} for node_id, label in shared.items())
+    return {"nodes": nodes, "edges": edges}
+
+
+def graphs(state):
+    """Return the full ``ast``, ``cfg``, ``ddg`` and ``calls`` graphs of a state."""
+    edge_attr = 'relationship' if state.language == 'java' else None
+    return {
+        "ast": _graph(state, 'ast_nodes', 'ast_edges', edge_attr),
+        "cfg": state.cfg,
+        "ddg": state.ddg,
+        "calls": state.calls,
+    }
+
+
+# Diffing
+
+def _diff(old_nodes, new_nodes, old_edges, new_edges, edge_attr=None, default=None):
+    """Return the delta between two ``{id: label}`` / ``{(source, target): attr}`` views.
+
+    Nodes and edges whose label or attribute changed are listed as added;
+    clients replace them in place.
+    """
+    added_edges = []
+    for (source, target), attr in new_edges.items():
+        if (source, target) not in old_edges or old_edges[(source, target)] != attr:
+            edge = {"source": source, "target": target}
+            if edge_attr is not None:
+                edge[edge_attr] = default if attr is None else attr
+            added_edges.append(edge)
+    return {
+        "added_nodes": [{"id": node_id, "label": label} for node_id, label in new_nodes.items()
+                        if old_nodes.get(node_id) != label],
+        "removed_nodes": [node_id for node_id in old_nodes if node_id not in new_nodes],
+        "added_edges": added_edges,
+        "removed_edges": [{"source": source, "target": target} for source, target in old_edges
+                          if (source, target) not in new_edges],
+    }
+
+
+def _graph_diff(old, new, edge_attr='label'):
+    """Return the delta between two whole graph dicts whose edges carry ``edge_attr``."""
+    return _diff(
+        {node["id"]: node["label"] for node in old["nodes"]},
+        {node["id"]: node["label"] for node in new["nodes"]},
+        {(edge["source"], edge["target"]): edge.get(edge_attr) for edge in old["edges"]},
+        {(edge["source"], edge["target"]): edge.get(edge_attr) for edge in new["edges"]},
+        edge_attr,
+    )
+
+
+def _region_view(state, keys, nodes_attr, edges_attr):
+    nodes, edges = {}, {}
+    for key in keys:
+        region = state.regions.get(key)
+        if region is not None:
+            nodes.update(getattr(region, nodes_attr))
+            edges.update(getattr(region, edges_attr))
+    return nodes, edges
+
+
+def _shared(state):
+    shared = {}
+    for region in state.regions.values():
+        shared.update(region.shared)
+    return shared
+
+
+def diff(base, state, affected):
+    """Return the per-graph delta from ``base`` to ``state`` over the ``affected`` regions."""
+    old_shared, new_shared = _shared(base), _shared(state)
+    edge_attr = 'relationship' if state.language == 'java' else None
+    delta = {}
+
+    old_nodes, old_edges = _region_view(base, affected, 'ast_nodes', 'ast_edges')
+    new_nodes, new_edges = _region_view(state, affected, 'ast_nodes', 'ast_edges')
+    old_nodes.update(old_shared)
+    new_nodes.update(new_shared)
+    delta["ast"] = _diff(old_nodes, new_nodes, old_edges, new_edges, edge_attr, 'contains')
+    delta["cfg"] = _graph_diff(base.cfg, state.cfg)
+    delta["ddg"] = _graph_diff(base.ddg, state.ddg, None)
+    delta["calls"] = _graph_diff(base.calls, state.calls)
+    return delta
+
+
+def parse(code, language):
+    """Parse ``code`` and split it into region specs."""
+    if language == 'python':
+        tree = ast.parse(code)
+        return python_regions(tree, code)
+    tokens, tree = parse_java_tokens(code)
+    specs = java_regions(tree, tokens)
+    if specs is None:
+        raise ValueError("Cannot split this compilation unit into declarations")
+    return specs
+
+
+def analyze(code, language, base=None, max_nodes=None, max_depth=None):
+    """Analyze ``code``, reusing the unchanged regions of ``base``.
+
+    Returns ``(state, summary)`` where ``summary`` lists the ``changed``,
+    ``added`` and ``removed`` region keys and the number ``unchanged``.
+    """
+    specs = parse(code, language)
+    if base is not None and base.language != language:
+        base = None
+    regions = {}
+    summary = {"changed": [], "added": [], "removed": [], "unchanged": 0}
+    for spec in specs:
+        previous = base.regions.get(spec.key) if base is not None else None
+        if previous is not None and previous.digest == spec.digest:
+            regions[spec.key] = previous
+            summary["unchanged"] += 1
+            continue
+        regions[spec.key] = build_region(spec, language, max_depth)
+        summary["changed" if previous is not None else "added"].append(spec.key)
+    if base is not None:
+        summary["removed"] = [key for key in base.regions if key not in regions]
+
+    if max_nodes is not None and sum(len(region.ast_nodes) for region in regions.values()) > max_nodes:
+        raise TraversalLimitExceeded(f"Tree has more than {max_nodes} nodes")
+    module = module_flow(specs, max_depth) if language == 'python' else None
+    return AnalysisState(language, specs[0].key, regions, module), summary
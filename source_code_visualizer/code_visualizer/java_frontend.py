@@ -0,0 +1,289 @@
+"""Java front end: tokenizing and parsing with a parse cache, and the graph builders.
+
+javalang is pure Python and slow to import and to run. It is imported on
+the first Java request, and every caller parses through ``parse_java``,
+which memoizes token streams and trees by the source's content hash.
+Trees can also be pickled to a directory shared by restarts and worker
+processes. When a file does not parse as a whole, each top-level type is
+parsed on its own so one broken class does not lose the rest of the
+file; the types that failed are listed in the tree's ``errors``.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .cache import code_digest
+from .cfg import build_java_cfg
+from .dataflow import build_java_ddg
+from .engine import build_java_ast_graph, iter_java_ast, traversal_limits
+from .frontends import lazy_import
+from .metrics import span
+from .symbols import file_call_graph
+
+javalang = lazy_import('javalang')
+
+DEFAULT_MAX_ENTRIES = 64
+
+
+@cache
+def disk_format():
+    """Return the name of the pickle directory for this javalang and Python."""
+    # Pickles are only read back by the same javalang and Python versions.
+    return f"javalang-{getattr(javalang, '__version__', '0')}-py{sys.version_info[0]}{sys.version_info[1]}"
+
+
+class JavaParseCache:
+    """LRU of ``(tokens, tree)`` by source digest, backed by an optional directory.
+
+    Only point ``directory`` at a location no one else can write to:
+    entries are unpickled.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, disk_format(), digest[:2], f"{digest}.pickle")
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+        entry = self._load(digest) if self.directory else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(digest, entry)
+        return entry
+
+    def put(self, digest, entry):
+        self._remember(digest, entry)
+        if self.directory:
+            self._store(digest, entry)
+
+    def _remember(self, digest, entry):
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._entries[digest] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, digest):
+        try:
+            with open(self._path(digest), 'rb') as f:
+                with span('parse_cache', 'java'):
+                    return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def _store(self, digest, entry):
+        path = self._path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, RecursionError, pickle.PicklingError):
+            return
+        # Write then rename, so other workers never read half a file.
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self)}
+
+
+_java_cache = None
+
+
+def get_java_cache():
+    """Return the process-wide Java parse cache.
+
+    ``CODE_VISUALIZER_CACHE`` may set ``JAVA_PARSE_MAX_ENTRIES`` and
+    ``JAVA_PARSE_DIR``, a directory to keep pickled trees in.
+    """
+    global _java_cache
+    if _java_cache is None:
+        options = getattr(settings, 'CODE_VISUALIZER_CACHE', {})
+        _java_cache = JavaParseCache(
+            max_entries=options.get('JAVA_PARSE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            directory=options.get('JAVA_PARSE_DIR'),
+        )
+    return _java_cache
+
+
+@receiver(setting_changed)
+def _reset_java_cache(setting, **kwargs):
+    global _java_cache
+    if setting == 'CODE_VISUALIZER_CACHE':
+        _java_cache = None
+
+
+def _segments(tokens):
+    """Split tokens into top-level statements and declarations.
+
+    A segment ends at a ``;`` or at the ``}`` that closes its braces.
+    """
+    segments = []
+    depth = 0
+    first = 0
+    for i, token in enumerate(tokens):
+        if token.value == '{':
+            depth += 1
+        elif token.value == '}':
+            depth -= 1
+            if depth == 0:
+                segments.append(tokens[first:i + 1])
+                first = i + 1
+        elif token.value == ';' and depth == 0:
+            segments.append(tokens[first:i + 1])
+            first = i + 1
+    if first < len(tokens):
+        segments.append(tokens[first:])
+    return segments
+
+
+def _error_text(error):
+    description = getattr(error, 'description', '') or type(error).__name__
+    at = getattr(error, 'at', None)
+    return f"{description} at {at}" if at is not None else description
+
+
+def _parse_types(tokens, error):
+    """Parse each top-level type of a file that failed to parse as a whole.
+
+    Returns a compilation unit of the types that parse, with the others
+    in its ``errors``. Re-raises ``error`` if the package and imports do
+    not parse or no type does.
+    """
+    header = []
+    types = []
+    errors = []
+    for segment in _segments(tokens):
+        if segment[0].value in ('package', 'import'):
+            if types or errors:
+                raise error
+            header.extend(segment)
+            continue
+        if all(token.value == ';' for token in segment):
+            continue
+        try:
+            types.extend(javalang.parser.Parser(segment).parse().types)
+        except (javalang.parser.JavaParserBaseException, StopIteration) as e:
+            errors.append({"line": segment[0].position.line, "error": _error_text(e)})
+    if not types:
+        raise error
+    try:
+        unit = javalang.parser.Parser(header).parse()
+    except (javalang.parser.JavaParserBaseException, StopIteration):
+        raise error
+    unit.types = types
+    unit.errors = errors
+    return unit
+
+
+def parse_java_tokens(code):
+    """Return the tokens and the parsed compilation unit of ``code``.
+
+    Both are cached by content, so callers must not modify them.
+    """
+    cache = get_java_cache()
+    digest = code_digest(code)
+    entry = cache.get(digest)
+    if entry is not None:
+        return entry
+    with span('tokenize', 'java'):
+        tokens = list(javalang.tokenizer.tokenize(code))
+    with span('parse', 'java'):
+        try:
+            tree = javalang.parser.Parser(tokens).parse()
+        except javalang.parser.JavaParserBaseException as e:
+            tree = _parse_types(tokens, e)
+    entry = (tokens, tree)
+    cache.put(digest, entry)
+    return entry
+
+
+def parse_java(code):
+    """Return the parsed compilation unit of ``code`` (see ``parse_java_tokens``)."""
+    return parse_java_tokens(code)[1]
+
+
+parse = parse_java
+
+
+def build_ast(tree):
+    """Build the AST graph for Java code with enhanced OOP visualization."""
+    return build_java_ast_graph(tree, **traversal_limits()).to_dict(edge_attr='relationship', default='contains')
+
+
+def build_cfg(tree):
+    """Build Control Flow Graph for Java code: basic blocks of every method and constructor."""
+    return build_java_cfg(tree, **traversal_limits()).to_dict(edge_attr='label')
+
+
+def build_ddg(tree):
+    """Build Data Dependency Graph for Java code: reaching definitions linked to their uses."""
+    return build_java_ddg(tree, **traversal_limits()).to_dict()
+
+
+def build_calls(tree):
+    """Build the call graph for Java code focusing on class and method-level calls."""
+    return file_call_graph(tree, 'java', **traversal_limits()).to_dict(edge_attr='label')
+
+
+BUILDERS = {'ast': build_ast, 'cfg': build_cfg, 'ddg': build_ddg, 'calls': build_calls}
+
+
+def records(tree, graph):
+    """Return ``(records, edge attribute name)`` for streaming one graph.
+
+    AST records come straight from the traversal; the other graphs need
+    the whole tree before their first edge is known and are built first.
+    """
+    limits = traversal_limits()
+    if graph == 'ast':
+        return iter_java_ast(tree, **limits), 'relationship'
+    if graph == 'cfg':
+        return build_java_cfg(tree, **limits).records(), 'label'
+    if graph == 'calls':
+        return file_call_graph(tree, 'java', **limits).records(), 'label'
+    return build_java_ddg(tree, **limits).records(), None
+
+
+def preload():
+    """Import javalang now instead of on the first Java request."""
+    # Any attribute access runs the lazily imported module.
+    return javalang.__version__
@@ -0,0 +1,156 @@
+"""Background analysis jobs run on local worker processes."""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import ANALYSIS_VERSION, code_digest
+from .engine import TraversalLimitExceeded, report_progress
+from .frontends import get_frontend
+from .models import AnalysisJob
+
+DEFAULT_WORKERS = 2
+DEFAULT_PROGRESS_INTERVAL = 0.5
+DEFAULT_STALE_AFTER = 600
+
+
+def job_options():
+    """Return ``CODE_VISUALIZER_JOBS`` merged over the defaults."""
+    options = {
+        'WORKERS': DEFAULT_WORKERS,
+        'PROGRESS_INTERVAL': DEFAULT_PROGRESS_INTERVAL,
+        'STALE_AFTER': DEFAULT_STALE_AFTER,
+    }
+    options.update(getattr(settings, 'CODE_VISUALIZER_JOBS', {}))
+    return options
+
+
+def submit_job(code, language, graph_names):
+    """Return ``(job, created)`` for analyzing ``code``.
+
+    A queued, running or finished job for the same content hash, language,
+    graphs and ``ANALYSIS_VERSION`` is reused; failed jobs are retried with a new job. New jobs
+    are handed to a worker once the surrounding transaction commits.
+
+    A reused queued job is dispatched again, in case the process that
+    queued it went away (only one worker can claim it). A job that has been
+    running for longer than ``STALE_AFTER`` seconds is assumed to have lost
+    its worker and is marked failed.
+    """
+    digest = code_digest(code)
+    graphs = ','.join(graph_names)
+    stale_before = timezone.now() - timedelta(seconds=job_options()['STALE_AFTER'])
+    (AnalysisJob.objects
+     .filter(digest=digest, language=language, graphs=graphs, analysis_version=ANALYSIS_VERSION,
+             status=AnalysisJob.RUNNING, started__lt=stale_before)
+     .update(status=AnalysisJob.FAILED, error="Job was abandoned by its worker", finished=timezone.now()))
+    job = (AnalysisJob.objects
+           .filter(digest=digest, language=language, graphs=graphs, analysis_version=ANALYSIS_VERSION)
+           .exclude(status=AnalysisJob.FAILED)
+           .first())
+    if job is not None:
+        if job.status == AnalysisJob.QUEUED:
+            transaction.on_commit(lambda: dispatch(job.pk))
+        return job, False
+    job = AnalysisJob.objects.create(code=code, language=language, digest=digest, graphs=graphs,
+                                     analysis_version=ANALYSIS_VERSION)
+    transaction.on_commit(lambda: dispatch(job.pk))
+    return job, True
+
+
+def dispatch(job_id):
+    """Run a job on the worker pool, or inline when ``WORKERS`` is 0."""
+    executor = get_job_executor()
+    if executor is None:
+        run_job(job_id)
+    else:
+        executor.submit(run_job, job_id)
+
+
+def run_job(job_id):
+    """Claim a queued job, build its graphs and store the result.
+
+    Progress (tree nodes visited so far) is written back at most every
+    ``PROGRESS_INTERVAL`` seconds. Returns False if the job was already
+    claimed by another worker (or finished).
+    """
+    from .views import _encode_json
+
+    claimed = (AnalysisJob.objects
+               .filter(pk=job_id, status=AnalysisJob.QUEUED)
+               .update(status=AnalysisJob.RUNNING, started=timezone.now()))
+    if not claimed:
+        return False
+    job = AnalysisJob.objects.get(pk=job_id)
+    interval = job_options()['PROGRESS_INTERVAL']
+    processed = 0
+    last_saved = time.monotonic()
+
+    def advance(count):
+        nonlocal processed, last_saved
+        processed += count
+        now = time.monotonic()
+        if now - last_saved >= interval:
+            AnalysisJob.objects.filter(pk=job_id).update(progress=processed)
+            last_saved = now
+
+    language = job.language
+    try:
+        with report_progress(advance):
+            frontend = get_frontend(language)
+            tree = frontend.parse(job.code)
+            builders = frontend.builders
+            result = {name: builders[name](tree) for name in job.graph_names}
+        job.result = _encode_json(result).decode('utf-8')
+        job.status = AnalysisJob.DONE
+    except TraversalLimitExceeded as e:
+        job.error = f"{language} code is too large to visualize: {e}"
+        job.status = AnalysisJob.FAILED
+    except SyntaxError as e:
+        job.error = f"Syntax error in {language} code: {e}"
+        job.status = AnalysisJob.FAILED
+    except Exception as e:
+        job.error = f"Error processing {language} code: {e}"
+        job.status = AnalysisJob.FAILED
+    job.progress = processed
+    job.finished = timezone.now()
+    job.save(update_fields=['result', 'status', 'error', 'progress', 'finished'])
+    return True
+
+
+_job_executor = None
+
+
+def get_job_executor():
+    """Return the process pool that runs jobs, or None to run them inline.
+
+    Workers are spawned rather than forked so they never share the web
+    process's database connections.
+    """
+    global _job_executor
+    workers = job_options()['WORKERS']
+    if not workers:
+        return None
+    if _job_executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        from .batch import _init_worker
+        _job_executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _job_executor
+
+
+@receiver(setting_changed)
+def _reset_job_executor(setting, **kwargs):
+    global _job_executor
+    if setting == 'CODE_VISUALIZER_JOBS' and _job_executor is not None:
+        _job_executor.shutdown(wait=False)
+        _job_executor = None
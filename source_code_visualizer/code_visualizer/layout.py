@@ -0,0 +1,82 @@
+"""Server-side graph layout using Graphviz."""
+import json
+
+from .frontends import lazy_import
+
+graphviz = lazy_import('graphviz')
+
+# Hierarchical layout suits the trees, control flow and call graphs; the
+# dependency graph has no natural direction, so it gets a force-directed engine.
+LAYOUT_ENGINES = {
+    'ast': 'dot',
+    'cfg': 'dot',
+    'calls': 'dot',
+    'ddg': 'sfdp',
+}
+
+# Matches the 100x50px boxes drawn by upload.html (Graphviz sizes are inches).
+NODE_WIDTH = '1.4'
+NODE_HEIGHT = '0.7'
+
+
+class LayoutError(Exception):
+    """Raised when Graphviz cannot lay out a graph."""
+
+
+def _to_dot(graph, engine):
+    """Build a Graphviz source for ``graph`` using node positions as names."""
+    dot = graphviz.Digraph(engine=engine)
+    dot.attr('node', shape='box', label='', fixedsize='true', width=NODE_WIDTH, height=NODE_HEIGHT)
+    if engine != 'dot':
+        dot.attr(overlap='false')
+    index = {}
+    for position, node in enumerate(graph["nodes"]):
+        index[node["id"]] = str(position)
+        dot.node(str(position))
+    for edge in graph["edges"]:
+        dot.edge(index[edge["source"]], index[edge["target"]])
+    return dot
+
+
+def _parse_positions(output, count):
+    """Return top-left-origin ``(x, y)`` pairs from Graphviz ``json0`` output."""
+    data = json.loads(output)
+    height = float(data["bb"].split(',')[3])
+    positions = [None] * count
+    for obj in data.get("objects", ()):
+        if "pos" not in obj:
+            continue
+        x, y = obj["pos"].split(',')
+        positions[int(obj["name"])] = (round(float(x), 2), round(height - float(y), 2))
+    return positions
+
+
+def compute_layout(graph, engine):
+    """Return node coordinates for ``graph`` in points, one per node."""
+    if not graph["nodes"]:
+        return []
+    try:
+        output = _to_dot(graph, engine).pipe(format='json0')
+    except graphviz.ExecutableNotFound as e:
+        raise LayoutError(f"Graphviz '{engine}' is not installed") from e
+    except graphviz.CalledProcessError as e:
+        raise LayoutError(f"Graphviz '{engine}' failed: {e.stderr.decode(errors='replace').strip()}") from e
+    return _parse_positions(output, len(graph["nodes"]))
+
+
+def apply_layout(graph, graph_type):
+    """Add ``x``/``y`` coordinates to the nodes of ``graph`` in place.
+
+    If Graphviz is unavailable the graph is left unpositioned and a
+    ``layout_error`` is recorded so the client falls back to simulating.
+    """
+    engine = LAYOUT_ENGINES.get(graph_type, 'dot')
+    try:
+        positions = compute_layout(graph, engine)
+    except LayoutError as e:
+        graph["layout_error"] = str(e)
+        return graph
+    for node, position in zip(graph["nodes"], positions):
+        if position is not None:
+            node["x"], node["y"] = position
+    return graph
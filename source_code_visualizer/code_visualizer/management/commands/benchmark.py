@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from code_visualizer.benchmark import CORPUS_LANGUAGES, CORPUS_SIZES, DEFAULT_THRESHOLD, compare, corpus, run
+from code_visualizer.views import GRAPH_TYPES, _parse_graph_selector
+
+
+class Command(BaseCommand):
+    help = ("Time parsing, each graph builder and serialization on a generated corpus, "
+            "optionally comparing the results with an earlier run.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=CORPUS_SIZES, default=list(CORPUS_SIZES),
+                            help="Corpus sizes to run (default: all).")
+        parser.add_argument('--languages', nargs='+', choices=CORPUS_LANGUAGES, default=list(CORPUS_LANGUAGES))
+        parser.add_argument('--graphs', default='', help="Comma-separated graph types (default: all).")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs of each stage.")
+        parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory runs.")
+        parser.add_argument('--imports', action='store_true',
+                            help="Also time cold imports of the views in fresh interpreters.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Results file of an earlier run to check for regressions.")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="Slowdown (as a fraction) reported as a regression.")
+
+    def handle(self, *args, **options):
+        graph_names, unknown = _parse_graph_selector(options['graphs'])
+        if unknown:
+            raise CommandError(f"Unknown graph type: {', '.join(unknown)}")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        inputs = corpus(options['sizes'], options['languages'])
+        results = run(inputs, graph_names or GRAPH_TYPES, options['repeat'], not options['no_memory'],
+                      progress=lambda name: self.stderr.write(f"Running {name}..."), imports=options['imports'])
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if baseline is not None:
+            regressions = compare(baseline, results, options['threshold'])
+            for regression in regressions:
+                if regression["change"] is None:
+                    self.stdout.write(f"CHANGED {regression['input']} {regression['stage']}: "
+                                      f"{regression['baseline']} -> {regression['current']}")
+                else:
+                    self.stdout.write(f"SLOWER {regression['input']} {regression['stage']}: "
+                                      f"{regression['baseline']:.4f}s -> {regression['current']:.4f}s "
+                                      f"(+{regression['change']:.0%})")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+
+    def report(self, results):
+        """Print one row per input and stage."""
+        self.stdout.write(f"{'input':<16}{'stage':<10}{'median s':>10}{'min s':>10}{'peak MiB':>10}"
+                          f"{'nodes':>9}{'edges':>9}")
+        for name, result in results["inputs"].items():
+            for stage, timing in result["stages"].items():
+                counts = result["graphs"].get(stage, {})
+                peak = f"{timing['peak_bytes'] / 2**20:.1f}" if "peak_bytes" in timing else '-'
+                self.stdout.write(
+                    f"{name:<16}{stage:<10}{timing['median']:>10.4f}{timing['min']:>10.4f}{peak:>10}"
+                    f"{counts.get('nodes', ''):>9}{counts.get('edges', ''):>9}"
+                )
+        for scenario, timing in results.get("imports", {}).items():
+            self.stdout.write(f"{'import':<16}{scenario:<10}{timing['median']:>10.4f}{timing['min']:>10.4f}"
+                              f"{'-':>10}  {', '.join(timing['modules']) or '-'}")
@@ -0,0 +1,95 @@
+import ast
+import gc
+import time
+import tracemalloc
+
+import javalang
+import networkx as nx
+from django.core.management.base import BaseCommand
+
+from code_visualizer.engine import (
+    build_java_ast_graph, build_python_ast_graph, java_child_nodes, java_node_label, python_node_label, walk,
+)
+
+
+def python_source(functions):
+    """Generate a Python module with ``functions`` small functions."""
+    lines = []
+    for i in range(functions):
+        lines.append(f"def func_{i}(a, b=1.5):")
+        lines.append(f"    x = a + b * {i} - 'text_{i}'[0]")
+        lines.append("    if x < a < b and not None:")
+        lines.append(f"        return [func_{i}(y) for y in range(x)]")
+        lines.append("    return {'k': (x, a), 'j': b}")
+    return "\n".join(lines)
+
+
+def java_source(methods):
+    """Generate a Java class with ``methods`` small methods."""
+    parts = ["package demo;", "public class Shape extends Base implements Drawable {", "    private int size = 3;"]
+    for m in range(methods):
+        parts.append(f"    public int area{m}(int w, int h) {{")
+        parts.append(f"        int total = w * h + size + {m};")
+        parts.append("        if (total > 10) { return helper(total); }")
+        parts.append("        return total;")
+        parts.append("    }")
+    parts.append("}")
+    return "\n".join(parts)
+
+
+def networkx_ast_graph(tree, children, label):
+    """Build and serialize an AST graph through ``nx.DiGraph`` (the old path)."""
+    graph = nx.DiGraph()
+    for _, node, parent, _ in walk(tree, children):
+        node_id = str(id(node))
+        graph.add_node(node_id, label=label(node))
+        if parent is not None:
+            graph.add_edge(str(id(parent)), node_id)
+    return {
+        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
+        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
+    }
+
+
+def measure(build):
+    """Return (seconds, peak bytes) for one call of ``build``."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+class Command(BaseCommand):
+    help = "Compare memory and time of the compact graph builders with the NetworkX path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 4000],
+                            help="Number of functions/methods in each generated input.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'input':<14}{'nodes':>9}{'compact MiB':>13}{'networkx MiB':>14}"
+                          f"{'compact s':>11}{'networkx s':>12}")
+        for size in options['sizes']:
+            python_tree = ast.parse(python_source(size))
+            java_tree = javalang.parse.parse(java_source(size))
+            cases = [
+                (f"python/{size}", python_tree,
+                 lambda: build_python_ast_graph(python_tree).to_dict(),
+                 lambda: networkx_ast_graph(python_tree, ast.iter_child_nodes, python_node_label)),
+                (f"java/{size}", java_tree,
+                 lambda: build_java_ast_graph(java_tree).to_dict(),
+                 lambda: networkx_ast_graph(java_tree, java_child_nodes, java_node_label)),
+            ]
+            for name, tree, compact, legacy in cases:
+                nodes = len(compact()["nodes"])
+                compact_time, compact_peak = measure(compact)
+                legacy_time, legacy_peak = measure(legacy)
+                self.stdout.write(
+                    f"{name:<14}{nodes:>9}{compact_peak / 2**20:>13.1f}{legacy_peak / 2**20:>14.1f}"
+                    f"{compact_time:>11.3f}{legacy_time:>12.3f}"
+                )
@@ -0,0 +1,329 @@
+"""Timing spans, an in-process histogram registry and a sampling profiler.
+
+Each stage of an analysis (tokenizing, parsing, every graph builder,
+layout, serialization) runs inside ``span``, which records its duration
+in a histogram labelled by stage and language. The registry is rendered
+in the Prometheus text format by the ``/metrics`` view. ``metrics_middleware``
+times whole requests, collects the spans of each request for its
+``Server-Timing`` header and, for staff users asking for ``?profile=``,
+returns a profile of the request instead of its response.
+"""
+import bisect
+import cProfile
+import marshal
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_PROFILE_INTERVAL = 0.005
+
+STAGE_SECONDS = 'code_visualizer_stage_seconds'
+REQUEST_SECONDS = 'code_visualizer_request_seconds'
+HELP = {
+    STAGE_SECONDS: "Time spent in each analysis stage.",
+    REQUEST_SECONDS: "Time spent serving each request.",
+}
+
+# Spans recorded while serving the current request, for Server-Timing.
+_request_spans = ContextVar('code_visualizer_request_spans', default=None)
+
+
+def metrics_options():
+    """Return ``CODE_VISUALIZER_METRICS`` merged over the defaults."""
+    options = {
+        'ENABLED': True,
+        'SERVER_TIMING': False,
+        'PROFILE': True,
+        'PROFILE_INTERVAL': DEFAULT_PROFILE_INTERVAL,
+        'BUCKETS': DEFAULT_BUCKETS,
+    }
+    options.update(getattr(settings, 'CODE_VISUALIZER_METRICS', {}))
+    return options
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum."""
+
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # The last count is for values above every bucket (le="+Inf").
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+def _label_text(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Thread-safe set of histograms keyed by metric name and labels."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def get(self, name, **labels):
+        """Return the histogram of ``name`` with exactly ``labels``, or None."""
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Return every histogram in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            snapshot = [(key, list(histogram.counts), histogram.sum) for key, histogram in histograms]
+        previous = None
+        for (name, labels), counts, total in snapshot:
+            if name != previous:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                previous = name
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(float(bound))
+                lines.append(f"{name}_bucket{{{_label_text(labels + (('le', le),))}}} {cumulative}")
+            label_text = f"{{{_label_text(labels)}}}" if labels else ''
+            lines.append(f"{name}_sum{label_text} {total!r}")
+            lines.append(f"{name}_count{label_text} {cumulative}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def render_counters(name, help_text, samples):
+    """Return Prometheus text for one counter with ``{labels tuple: value}`` samples."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for labels, value in samples.items():
+        label_text = f"{{{_label_text(labels)}}}" if labels else ''
+        lines.append(f"{name}{label_text} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+_registry = None
+
+
+def get_registry():
+    """Return the process-wide metrics registry.
+
+    ``CODE_VISUALIZER_METRICS`` may set the histogram ``BUCKETS`` (seconds).
+    """
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry(metrics_options()['BUCKETS'])
+    return _registry
+
+
+@receiver(setting_changed)
+def _reset_registry(setting, **kwargs):
+    global _registry
+    if setting == 'CODE_VISUALIZER_METRICS':
+        _registry = None
+
+
+@contextmanager
+def span(stage, language=''):
+    """Time the enclosed block as ``stage`` of analyzing ``language`` code."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if metrics_options()['ENABLED']:
+            get_registry().observe(STAGE_SECONDS, elapsed, stage=stage, language=language)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+@contextmanager
+def collect_spans():
+    """Collect the ``(stage, seconds)`` spans recorded in the enclosed block into a list.
+
+    Used in worker processes, whose registry nobody reads, to send the
+    spans back to the web process.
+    """
+    spans = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def record_spans(spans, language=''):
+    """Record spans collected in another process as if they had run here."""
+    enabled = metrics_options()['ENABLED']
+    request_spans = _request_spans.get()
+    for stage, elapsed in spans:
+        if enabled:
+            get_registry().observe(STAGE_SECONDS, elapsed, stage=stage, language=language)
+        if request_spans is not None:
+            request_spans.append((stage, elapsed))
+
+
+def server_timing(spans, total=None):
+    """Return a ``Server-Timing`` header value for ``(stage, seconds)`` spans."""
+    entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in spans]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.3f}")
+    return ', '.join(entries)
+
+
+class SamplingProfiler:
+    """Sample the call stack of one thread every ``interval`` seconds.
+
+    The samples are returned as collapsed stacks (``frame;frame;frame
+    count`` lines), the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=DEFAULT_PROFILE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='code-visualizer-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+
+def _profile_response(request, get_response, kind, interval):
+    """Serve ``request`` under a profiler and return the profile as the response."""
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.runcall(get_response, request)
+        profiler.create_stats()
+        # The format of ``pstats.Stats.dump_stats``: load with pstats or snakeviz.
+        response = HttpResponse(marshal.dumps(profiler.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = 'attachment; filename="profile.prof"'
+        return response
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        get_response(request)
+    finally:
+        profiler.stop()
+    return HttpResponse(profiler.collapsed(), content_type='text/plain; charset=utf-8')
+
+
+def _profile_kind(request, options):
+    """Return the profile asked for by a staff user's ``?profile=``, if any."""
+    kind = request.GET.get('profile', '')
+    if not kind or not options['PROFILE']:
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return None
+    return 'cprofile' if kind == 'cprofile' else 'collapsed'
+
+
+def _finish(request, response, spans, start, options):
+    elapsed = time.perf_counter() - start
+    match = request.resolver_match
+    get_registry().observe(REQUEST_SECONDS, elapsed, view=match.view_name if match else '',
+                           method=request.method, status=str(response.status_code))
+    if options['SERVER_TIMING']:
+        response['Server-Timing'] = server_timing(spans, elapsed)
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Time requests and their stages; serve ``?profile=`` for staff.
+
+    ``?profile=1`` answers with the collapsed stacks of a sampling
+    profiler and ``?profile=cprofile`` with a cProfile dump. Profiling
+    is only available on the synchronous views.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            options = metrics_options()
+            if not options['ENABLED']:
+                return await get_response(request)
+            spans = []
+            token = _request_spans.set(spans)
+            start = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _request_spans.reset(token)
+            return _finish(request, response, spans, start, options)
+        return middleware
+
+    def middleware(request):
+        options = metrics_options()
+        if not options['ENABLED']:
+            return get_response(request)
+        kind = _profile_kind(request, options)
+        if kind is not None:
+            return _profile_response(request, get_response, kind, options['PROFILE_INTERVAL'])
+        spans = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            _request_spans.reset(token)
+        return _finish(request, response, spans, start, options)
+    return middleware
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:15
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('language', models.CharField(max_length=16)),
+                ('digest', models.CharField(max_length=64)),
+                ('graphs', models.CharField(help_text='Comma-separated graph types.', max_length=64)),
+                ('code', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('progress', models.PositiveBigIntegerField(default=0, help_text='Tree nodes processed so far.')),
+                ('result', models.TextField(blank=True, help_text='The serialized graphs once done.')),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'indexes': [models.Index(fields=['digest', 'language', 'graphs'], name='code_visual_digest_e829db_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:58
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('code_visualizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredGraph',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('language', models.CharField(max_length=16)),
+                ('digest', models.CharField(max_length=64)),
+                ('graph', models.CharField(help_text='Graph type, e.g. ast or cfg.', max_length=16)),
+                ('node_count', models.PositiveIntegerField(default=0)),
+                ('edge_count', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'constraints': [models.UniqueConstraint(fields=('digest', 'language', 'graph'), name='unique_stored_graph')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=255)),
+                ('label', models.TextField()),
+                ('unit', models.CharField(max_length=255)),
+                ('position', models.PositiveIntegerField()),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='code_visualizer.storedgraph')),
+            ],
+            options={
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['graph', 'node_id'], name='code_visual_graph_i_63af38_idx'), models.Index(fields=['graph', 'label'], name='code_visual_graph_i_12aad8_idx'), models.Index(fields=['graph', 'unit', 'position'], name='code_visual_graph_i_cbb887_idx'), models.Index(fields=['graph', 'position'], name='code_visual_graph_i_ef7342_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('target', models.CharField(max_length=255)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('relationship', models.CharField(blank=True, max_length=16)),
+                ('position', models.PositiveIntegerField()),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='code_visualizer.storedgraph')),
+            ],
+            options={
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['graph', 'source', 'position'], name='code_visual_graph_i_82b125_idx'), models.Index(fields=['graph', 'target', 'position'], name='code_visual_graph_i_562899_idx')],
+            },
+        ),
+    ]
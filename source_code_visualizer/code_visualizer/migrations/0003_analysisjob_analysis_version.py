@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('code_visualizer', '0002_graph_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='analysis_version',
+            field=models.PositiveIntegerField(default=0, help_text='ANALYSIS_VERSION the job was built with.'),
+        ),
+    ]
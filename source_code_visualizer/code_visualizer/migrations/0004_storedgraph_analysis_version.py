@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('code_visualizer', '0003_analysisjob_analysis_version'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='storedgraph',
+            name='unique_stored_graph',
+        ),
+        migrations.AddField(
+            model_name='storedgraph',
+            name='analysis_version',
+            field=models.PositiveIntegerField(default=0, help_text='ANALYSIS_VERSION the graph was built with.'),
+        ),
+        migrations.AddConstraint(
+            model_name='storedgraph',
+            constraint=models.UniqueConstraint(fields=('digest', 'language', 'graph', 'analysis_version'), name='unique_stored_graph_version'),
+        ),
+    ]
@@ -1,3 +1,119 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class AnalysisJob(models.Model):
+    """A visualization built in the background, and its result.
+
+    Jobs are addressed by a random UUID. ``digest`` (the code's content
+    hash), ``language``, ``graphs`` and the ``analysis_version`` of the
+    builders identify the work, so a finished job can serve every later
+    submission of the same code until the builders change.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    language = models.CharField(max_length=16)
+    digest = models.CharField(max_length=64)
+    graphs = models.CharField(max_length=64, help_text="Comma-separated graph types.")
+    analysis_version = models.PositiveIntegerField(default=0, help_text="ANALYSIS_VERSION the job was built with.")
+    code = models.TextField()
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveBigIntegerField(default=0, help_text="Tree nodes processed so far.")
+    result = models.TextField(blank=True, help_text="The serialized graphs once done.")
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [models.Index(fields=['digest', 'language', 'graphs'])]
+
+    def __str__(self):
+        return f"{self.language} {self.graphs} ({self.status})"
+
+    @property
+    def graph_names(self):
+        return tuple(self.graphs.split(','))
+
+
+class StoredGraph(models.Model):
+    """One graph of one source, kept in the database for paged queries.
+
+    The nodes and edges are rows of ``GraphNode`` and ``GraphEdge`` so
+    clients can explore a large graph a piece at a time without it ever
+    being loaded whole. A graph is reused for the same code until the
+    builders' ``analysis_version`` changes.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    language = models.CharField(max_length=16)
+    digest = models.CharField(max_length=64)
+    graph = models.CharField(max_length=16, help_text="Graph type, e.g. ast or cfg.")
+    analysis_version = models.PositiveIntegerField(default=0, help_text="ANALYSIS_VERSION the graph was built with.")
+    node_count = models.PositiveIntegerField(default=0)
+    edge_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created']
+        constraints = [
+            models.UniqueConstraint(fields=['digest', 'language', 'graph', 'analysis_version'],
+                                    name='unique_stored_graph_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.language} {self.graph} ({self.node_count} nodes)"
+
+
+class GraphNode(models.Model):
+    """A node of a stored graph.
+
+    ``position`` is the node's index in the built graph and orders pages;
+    ``unit`` is the qualified name of the function or class it belongs to.
+    """
+
+    graph = models.ForeignKey(StoredGraph, on_delete=models.CASCADE, related_name='nodes')
+    node_id = models.CharField(max_length=255)
+    label = models.TextField()
+    unit = models.CharField(max_length=255)
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        indexes = [
+            models.Index(fields=['graph', 'node_id']),
+            models.Index(fields=['graph', 'label']),
+            models.Index(fields=['graph', 'unit', 'position']),
+            models.Index(fields=['graph', 'position']),
+        ]
+
+
+class GraphEdge(models.Model):
+    """An edge of a stored graph, between two ``GraphNode.node_id`` values."""
+
+    graph = models.ForeignKey(StoredGraph, on_delete=models.CASCADE, related_name='edges')
+    source = models.CharField(max_length=255)
+    target = models.CharField(max_length=255)
+    label = models.CharField(max_length=255, blank=True)
+    relationship = models.CharField(max_length=16, blank=True)
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        indexes = [
+            models.Index(fields=['graph', 'source', 'position']),
+            models.Index(fields=['graph', 'target', 'position']),
+        ]
@@ -0,0 +1,120 @@
+"""Bounded worker pool that keeps analysis off the ASGI event loop."""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_TIMEOUT = 30
+
+
+class PoolBusy(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+
+class AnalysisPool:
+    """Run blocking analysis calls on a thread or process pool from async code.
+
+    At most ``workers`` calls run at once and at most ``max_queue`` more
+    wait for a worker; beyond that ``run`` raises PoolBusy straight away.
+    A call that times out or whose caller is cancelled is dropped if it
+    has not started yet. One that is already running cannot be
+    interrupted and keeps its slot until it finishes, so the pool never
+    takes on more work than it can do.
+    """
+
+    def __init__(self, kind='thread', workers=None, max_queue=DEFAULT_MAX_QUEUE):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers + max_queue
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    from .batch import _init_worker
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='code-visualizer')
+            return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool and return its result.
+
+        Raises PoolBusy when the pool is saturated and TimeoutError when
+        the call takes longer than ``timeout`` seconds.
+        """
+        executor = self.executor()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise PoolBusy(f"{self.pending} analyses are already running or queued")
+            self.pending += 1
+        if self.kind == 'thread':
+            # Lets timing spans reach the request that queued the call.
+            fn, args = contextvars.copy_context().run, (fn, *args)
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Drops the call if it is still queued.
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_analysis_pool = None
+
+
+def pool_options():
+    """Return ``CODE_VISUALIZER_WORKERS`` merged over the defaults."""
+    options = {'KIND': 'thread', 'WORKERS': None, 'MAX_QUEUE': DEFAULT_MAX_QUEUE, 'TIMEOUT': DEFAULT_TIMEOUT}
+    options.update(getattr(settings, 'CODE_VISUALIZER_WORKERS', {}))
+    return options
+
+
+def get_analysis_pool():
+    """Return the process-wide analysis pool.
+
+    ``CODE_VISUALIZER_WORKERS`` may set ``KIND`` (``'thread'`` or
+    ``'process'``), ``WORKERS`` and ``MAX_QUEUE``.
+    """
+    global _analysis_pool
+    if _analysis_pool is None:
+        options = pool_options()
+        _analysis_pool = AnalysisPool(options['KIND'], options['WORKERS'], options['MAX_QUEUE'])
+    return _analysis_pool
+
+
+@receiver(setting_changed)
+def _reset_analysis_pool(setting, **kwargs):
+    global _analysis_pool
+    if setting == 'CODE_VISUALIZER_WORKERS' and _analysis_pool is not None:
+        _analysis_pool.shutdown()
+        _analysis_pool = None
@@ -0,0 +1,53 @@
+"""Python front end: parsing with the standard library and the graph builders."""
+import ast
+
+from .cfg import build_python_cfg
+from .dataflow import build_python_ddg
+from .engine import build_python_ast_graph, iter_python_ast, traversal_limits
+from .metrics import span
+from .symbols import file_call_graph
+
+
+def parse(code):
+    """Parse Python source into an ``ast.Module``; raises ``SyntaxError``."""
+    with span('parse', 'python'):
+        return ast.parse(code)
+
+
+def build_ast(tree):
+    """Convert Python AST to graph dictionary."""
+    return build_python_ast_graph(tree, **traversal_limits()).to_dict()
+
+
+def build_cfg(tree):
+    """Build Control Flow Graph for Python code: basic blocks of the module, classes and functions."""
+    return build_python_cfg(tree, **traversal_limits()).to_dict(edge_attr='label')
+
+
+def build_ddg(tree):
+    """Build Data Dependency Graph for Python code: reaching definitions linked to their uses."""
+    return build_python_ddg(tree, **traversal_limits()).to_dict()
+
+
+def build_calls(tree):
+    """Build the call graph for Python code focusing on function-level calls."""
+    return file_call_graph(tree, 'python', **traversal_limits()).to_dict(edge_attr='label')
+
+
+BUILDERS = {'ast': build_ast, 'cfg': build_cfg, 'ddg': build_ddg, 'calls': build_calls}
+
+
+def records(tree, graph):
+    """Return ``(records, edge attribute name)`` for streaming one graph.
+
+    AST records come straight from the traversal; the other graphs need
+    the whole tree before their first edge is known and are built first.
+    """
+    limits = traversal_limits()
+    if graph == 'ast':
+        return iter_python_ast(tree, **limits), None
+    if graph == 'cfg':
+        return build_python_cfg(tree, **limits).records(), 'label'
+    if graph == 'calls':
+        return file_call_graph(tree, 'python', **limits).records(), 'label'
+    return build_python_ddg(tree, **limits).records(), None
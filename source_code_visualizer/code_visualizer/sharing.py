@@ -0,0 +1,110 @@
+"""Hash-consing of repeated AST subtrees.
+
+Generated and boilerplate-heavy code repeats the same subtrees over and
+over (getters and setters, literal tables). ``share_subtrees`` gives
+every subtree of an AST graph a structural class in one bottom-up pass
+and keeps a single copy of each repeated subtree: every parent links to
+that copy, whose root carries the number of times it occurs (``count``)
+and its size in nodes (``size``). The result is a DAG rather than a tree.
+"""
+from .summary import BACK_EDGES, _tree
+
+DEFAULT_MIN_SIZE = 3
+
+
+def share_subtrees(graph, min_size=DEFAULT_MIN_SIZE):
+    """Return ``(graph, stats)`` with repeated subtrees of at least ``min_size`` nodes stored once.
+
+    Two subtrees are the same when their roots have the same label and
+    the same edges, in order, to the same subtrees. Edges from one parent
+    to several copies of a subtree become one edge with a ``count``.
+    ``stats`` compares the sizes of the tree and of the shared graph.
+    """
+    index, parent, _ = _tree(graph)
+    nodes = graph["nodes"]
+    size = len(nodes)
+
+    # Out edges in tree direction, as (target, label, relationship).
+    out = [[] for _ in range(size)]
+    for edge in graph["edges"]:
+        source, target = index[edge["source"]], index[edge["target"]]
+        if edge.get("relationship") in BACK_EDGES:
+            source, target = target, source
+        out[source].append((target, edge.get("label"), edge.get("relationship")))
+
+    # Leaves first: Python's Load/Store singletons are leaves linked from
+    # everywhere, so they need a class before their first parent.
+    table = {}
+    classes = [None] * size
+    for position in range(size):
+        if not out[position]:
+            classes[position] = table.setdefault((nodes[position]["label"], ()), len(table))
+    sizes = [1] * size
+    # Nodes are listed in pre-order, so a node's subtree is classed before it.
+    for position in range(size - 1, -1, -1):
+        if parent[position] >= 0:
+            sizes[parent[position]] += sizes[position]
+        if classes[position] is None:
+            key = (nodes[position]["label"], tuple(
+                (label, relationship, classes[target] if classes[target] is not None else ('node', target))
+                for target, label, relationship in out[position]
+            ))
+            classes[position] = table.setdefault(key, len(table))
+
+    counts = [0] * len(table)
+    first = [-1] * len(table)
+    for position, node_class in enumerate(classes):
+        counts[node_class] += 1
+        if first[node_class] < 0:
+            first[node_class] = position
+
+    def shared(position):
+        node_class = classes[position]
+        return counts[node_class] > 1 and sizes[first[node_class]] >= min_size
+
+    # Map every node of a later copy onto the same node of the first copy,
+    # which comes earlier in pre-order and is already mapped itself.
+    mapped = [-1] * size
+    for position in range(size):
+        if mapped[position] >= 0:
+            continue
+        original = first[classes[position]]
+        if original == position or not shared(position):
+            mapped[position] = position
+            continue
+        stack = [(position, original)]
+        while stack:
+            copy, kept = stack.pop()
+            mapped[copy] = mapped[kept]
+            for (target, _, _), (kept_target, _, _) in zip(out[copy], out[kept]):
+                if parent[target] == copy:
+                    stack.append((target, kept_target))
+
+    shared_nodes = []
+    for position, node in enumerate(nodes):
+        if mapped[position] == position:
+            if shared(position):
+                node = {**node, "count": counts[classes[position]], "size": sizes[position]}
+            shared_nodes.append(node)
+    shared_edges = {}
+    for edge in graph["edges"]:
+        source, target = index[edge["source"]], index[edge["target"]]
+        owner = target if edge.get("relationship") in BACK_EDGES else source
+        if mapped[owner] != owner:
+            # Inside a copy; the same edge of the kept copy is already there.
+            continue
+        source, target = nodes[mapped[source]]["id"], nodes[mapped[target]]["id"]
+        key = (source, target, edge.get("label"), edge.get("relationship"))
+        if key in shared_edges:
+            shared_edges[key]["count"] = shared_edges[key].get("count", 1) + 1
+        else:
+            shared_edges[key] = {**edge, "source": source, "target": target}
+
+    stats = {
+        "nodes": size,
+        "edges": len(graph["edges"]),
+        "shared_nodes": len(shared_nodes),
+        "shared_edges": len(shared_edges),
+        "ratio": round(size / len(shared_nodes), 2) if shared_nodes else 1.0,
+    }
+    return {"nodes": shared_nodes, "edges": list(shared_edges.values())}, stats
@@ -0,0 +1,58 @@
+"""NDJSON streaming of graphs while they are being built."""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .engine import NODE
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+DEFAULT_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    """Return True if the client asked for an NDJSON stream.
+
+    ``format=ndjson`` (POST or query string) or an ``Accept`` header that
+    names the NDJSON media type opts in.
+    """
+    requested = request.POST.get('format') or request.GET.get('format')
+    if requested:
+        return requested == 'ndjson'
+    return NDJSON_MEDIA_TYPE in request.headers.get('Accept', '')
+
+
+def ndjson_line(data):
+    """Serialize one NDJSON line."""
+    return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8') + b'\n'
+
+
+def graph_chunks(name, records, edge_attr=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Group graph records into ``{"graph", "nodes"}`` and ``{"graph", "edges"}`` chunks.
+
+    Chunks are yielded as soon as they fill up. Pending nodes are always
+    flushed before an edge chunk, so every edge arrives after both of its
+    endpoints. With ``edge_attr`` set, edges carry their attribute under
+    that name.
+    """
+    nodes, edges = [], []
+    for record in records:
+        if record[0] is NODE:
+            nodes.append({"id": str(record[1]), "label": record[2]})
+            if len(nodes) >= chunk_size:
+                yield {"graph": name, "nodes": nodes}
+                nodes = []
+            continue
+        edge = {"source": str(record[1]), "target": str(record[2])}
+        if edge_attr is not None:
+            edge[edge_attr] = record[3]
+        edges.append(edge)
+        if len(edges) >= chunk_size:
+            if nodes:
+                yield {"graph": name, "nodes": nodes}
+                nodes = []
+            yield {"graph": name, "edges": edges}
+            edges = []
+    if nodes:
+        yield {"graph": name, "nodes": nodes}
+    if edges:
+        yield {"graph": name, "edges": edges}
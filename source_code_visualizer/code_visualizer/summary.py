@@ -0,0 +1,380 @@
+"""Level-of-detail summaries of graphs too large to draw.
+
+A summary keeps a graph under a node budget. The AST is shown breadth
+first down to a depth limit; a node whose children do not fit stays
+visible with a ``collapsed`` count of the nodes hidden below it, and the
+children of a node with too many of them are paged behind a ``more``
+node. The other graphs are clustered by function, class and module:
+each cluster becomes a single node with a ``collapsed`` count, and the
+edges between two clusters are merged into one with a ``count``.
+``expand`` returns the part of the full graph behind one collapsed node.
+"""
+import ast
+from collections import deque
+
+from django.conf import settings
+
+from .cfg import java_methods, java_types
+from .engine import EXIT, NodeIds, java_child_nodes, walk
+
+DEFAULT_MAX_NODES = 500
+DEFAULT_MAX_DEPTH = 8
+
+# Java AST edges that point from a class declaration back at its container.
+BACK_EDGES = ('implements', 'extends')
+
+TOP_LEVEL = {'python': '<module>', 'java': '<unit>'}
+
+
+def summary_options():
+    """Return ``CODE_VISUALIZER_SUMMARY`` merged over the defaults."""
+    options = {'MAX_NODES': DEFAULT_MAX_NODES, 'MAX_DEPTH': DEFAULT_MAX_DEPTH}
+    options.update(getattr(settings, 'CODE_VISUALIZER_SUMMARY', {}))
+    return options
+
+
+def _tree(graph):
+    """Return ``(index, parent, children)`` of a tree-shaped graph dict.
+
+    Shared nodes (Python's Load/Store singletons) hang off the first
+    parent that links to them.
+    """
+    index = {node["id"]: position for position, node in enumerate(graph["nodes"])}
+    parent = [-1] * len(index)
+    children = [[] for _ in index]
+    for edge in graph["edges"]:
+        source, target = index[edge["source"]], index[edge["target"]]
+        if edge.get("relationship") in BACK_EDGES:
+            source, target = target, source
+        if parent[target] < 0 and source != target:
+            parent[target] = source
+            children[source].append(target)
+    return index, parent, children
+
+
+def summarize_tree(graph, max_nodes, max_depth, root=None):
+    """Return the top of a tree graph that fits in ``max_nodes`` nodes.
+
+    Nodes are expanded breadth first, from ``root`` (by default, from the
+    tree's roots), while they are less than ``max_depth`` levels down.
+    A node with more children than fit shows the first ones and a
+    ``more`` node (id ``<parent>+<position>``) standing for the rest;
+    expanding it pages through the remaining children. Nodes left
+    unexpanded get a ``collapsed`` count of their descendants. Returns
+    None if ``root`` is not in the graph.
+    """
+    index, parent, children = _tree(graph)
+    start = 0
+    if root is not None and root not in index:
+        parent_id, _, position = root.rpartition('+')
+        if parent_id not in index or not position.isdigit():
+            return None
+        start = int(position)
+        if start >= len(children[index[parent_id]]):
+            return None
+    sizes = [1] * len(index)
+    # Nodes are listed in pre-order, so children come after their parent.
+    for position in range(len(index) - 1, -1, -1):
+        if parent[position] >= 0:
+            sizes[parent[position]] += sizes[position]
+
+    nodes = graph["nodes"]
+    visible = bytearray(len(index))
+    collapsed = {}
+    more_nodes = []
+    more_edges = []
+
+    def show(position, kids, room):
+        """Make ``kids`` of ``position`` visible, paging them to fit ``room``; return those shown."""
+        shown = kids if len(kids) <= room else kids[:room - 1]
+        for kid in shown:
+            visible[kid] = 1
+        if len(shown) < len(kids):
+            rest = kids[len(shown):]
+            offset = len(children[position]) - len(rest)
+            more_id = f"{nodes[position]['id']}+{offset}"
+            more_nodes.append({"id": more_id, "label": f"\u2026 {len(rest)} more", "more": len(rest),
+                               "collapsed": sum(sizes[kid] for kid in rest)})
+            more_edges.append({"source": nodes[position]["id"], "target": more_id})
+        return shown
+
+    if root is None:
+        roots = [position for position in range(len(index)) if parent[position] < 0]
+    elif start:
+        # A ``more`` node: page through the rest of its parent's children.
+        owner = index[parent_id]
+        roots = show(owner, children[owner][start:], max(max_nodes, 2))
+    else:
+        roots = [index[root]]
+    for position in roots:
+        visible[position] = 1
+    count = len(roots) + len(more_nodes)
+    queue = deque((position, 0) for position in roots)
+    while queue:
+        position, depth = queue.popleft()
+        kids = children[position]
+        if not kids:
+            continue
+        room = max_nodes - count
+        # Paging a node takes one place for the ``more`` node and needs one child to make progress.
+        if depth < max_depth and (len(kids) <= room or room >= 2):
+            shown = show(position, kids, room)
+            queue.extend((kid, depth + 1) for kid in shown)
+            count += len(shown) + (len(shown) < len(kids))
+        else:
+            collapsed[position] = sizes[position] - 1
+
+    summary = []
+    for position, node in enumerate(nodes):
+        if visible[position]:
+            summary.append({**node, "collapsed": collapsed[position]} if position in collapsed else node)
+    edges = [edge for edge in graph["edges"] if visible[index[edge["source"]]] and visible[index[edge["target"]]]]
+    if start:
+        # Link the page to its parent, which the client already shows.
+        edges += [edge for edge in graph["edges"]
+                  if edge["source"] == parent_id and visible[index[edge["target"]]]
+                  or edge["target"] == parent_id and visible[index[edge["source"]]]]
+    return {"nodes": summary + more_nodes, "edges": edges + more_edges}
+
+
+def cluster_graph(graph, group_of, names=None, groups=None):
+    """Merge the nodes of each group (``group_of(node id)``) into one node.
+
+    ``names`` gives the label of a group (by default, the group itself).
+    With a ``groups`` set only the nodes of those groups are returned,
+    with the edges touching them.
+    """
+    names = names or {}
+    sizes = {}
+    node_groups = {}
+    for node in graph["nodes"]:
+        group = node_groups[node["id"]] = group_of(node["id"])
+        sizes[group] = sizes.get(group, 0) + 1
+    counts = {}
+    for edge in graph["edges"]:
+        pair = (node_groups[edge["source"]], node_groups[edge["target"]])
+        if pair[0] != pair[1] and (groups is None or pair[0] in groups or pair[1] in groups):
+            counts[pair] = counts.get(pair, 0) + 1
+    return {
+        "nodes": [{"id": group, "label": f"{names.get(group, group)} ({count} nodes)", "collapsed": count}
+                  for group, count in sizes.items() if groups is None or group in groups],
+        "edges": [{"source": source, "target": target, "count": count}
+                  for (source, target), count in counts.items()],
+    }
+
+
+def expand_cluster(graph, group_of, group):
+    """Return the nodes of one cluster and the edges touching them, or None.
+
+    Edge endpoints outside the cluster are replaced by their cluster's id.
+    """
+    node_groups = {node["id"]: group_of(node["id"]) for node in graph["nodes"]}
+    nodes = [node for node in graph["nodes"] if node_groups[node["id"]] == group]
+    if not nodes:
+        return None
+    edges = {}
+    for edge in graph["edges"]:
+        source, target = edge["source"], edge["target"]
+        if node_groups[source] != group and node_groups[target] != group:
+            continue
+        if node_groups[source] != group:
+            edge = {**edge, "source": node_groups[source]}
+        elif node_groups[target] != group:
+            edge = {**edge, "target": node_groups[target]}
+        edges.setdefault((edge["source"], edge["target"]), edge)
+    return {"nodes": nodes, "edges": list(edges.values())}
+
+
+class UnitClusters:
+    """Hierarchical clusters of a graph's nodes by function, class and module.
+
+    A graph's units (the groups of ``graph_groups``) nest by their dotted
+    names. A cluster is a unit's own nodes (id ``A.m``), a unit and
+    everything nested in it (``A.*``) or the nested units of a unit from
+    a position on (``A.*+<position>``). ``clusters`` opens clusters
+    breadth first, down from the whole graph or from one cluster, while
+    their parts fit in the node budget, showing only the first nested
+    units of a unit with too many of them.
+    """
+
+    def __init__(self, graph, unit_of, top):
+        self.top = top
+        self.node_units = {}
+        self.own = {}
+        self.nested = {top: []}
+        order = []
+        for node in graph["nodes"]:
+            unit = self.node_units[node["id"]] = unit_of(node["id"])
+            self.own[unit] = self.own.get(unit, 0) + 1
+            missing = []
+            while unit not in self.nested:
+                missing.append(unit)
+                unit = self._parent(unit)
+            for unit in reversed(missing):
+                self.nested[unit] = []
+                self.nested[self._parent(unit)].append(unit)
+                order.append(unit)
+        self.sizes = dict(self.own)
+        for unit in reversed(order):
+            parent = self._parent(unit)
+            self.sizes[parent] = self.sizes.get(parent, 0) + self.sizes.get(unit, 0)
+
+    def _parent(self, unit):
+        return unit.rsplit('.', 1)[0] if '.' in unit else self.top
+
+    @staticmethod
+    def cluster_id(cluster):
+        kind, unit = cluster[0], cluster[1]
+        if kind == 'own':
+            return unit
+        return f"{unit}.*" if kind == 'tree' else f"{unit}.*+{cluster[2]}"
+
+    def parse(self, cluster_id):
+        """Return the cluster with id ``cluster_id``, or None if there is none."""
+        if cluster_id in self.own:
+            return ('own', cluster_id)
+        unit, _, position = cluster_id.rpartition('.*+')
+        if unit in self.nested and position.isdigit() and int(position) < len(self.nested[unit]):
+            return ('more', unit, int(position))
+        if cluster_id.endswith('.*') and self.nested.get(cluster_id[:-2]):
+            return ('tree', cluster_id[:-2])
+        return None
+
+    def _child(self, unit):
+        return ('tree', unit) if self.nested[unit] else ('own', unit)
+
+    def _open(self, cluster, room):
+        """Return the clusters ``cluster`` splits into within ``room`` places, or None."""
+        kind, unit = cluster[0], cluster[1]
+        parts = [('own', unit)] if kind == 'tree' and self.own.get(unit) else []
+        start = cluster[2] if kind == 'more' else 0
+        nested = self.nested[unit][start:]
+        if len(parts) + len(nested) <= room:
+            return parts + [self._child(child) for child in nested]
+        shown = room - len(parts) - 1
+        if shown < 0 or not parts and shown < 1:
+            return None
+        return parts + [self._child(child) for child in nested[:shown]] + [('more', unit, start + shown)]
+
+    def clusters(self, max_nodes, start=None):
+        """Return ``{unit: cluster}`` for the units inside ``start`` (by default, the whole graph)."""
+        start = start or ('tree', self.top)
+        count = 1
+        opened = {}
+        queue = deque([start])
+        while queue:
+            cluster = queue.popleft()
+            if cluster[0] == 'own':
+                continue
+            parts = self._open(cluster, max_nodes - count + 1)
+            if parts is None:
+                continue
+            opened[cluster] = parts
+            count += len(parts) - 1
+            queue.extend(parts)
+
+        units = {}
+        stack = [start]
+        while stack:
+            cluster = stack.pop()
+            if cluster in opened:
+                stack.extend(opened[cluster])
+            elif cluster[0] == 'own':
+                units[cluster[1]] = cluster
+            else:
+                kind, unit = cluster[0], cluster[1]
+                pending = [unit] if kind == 'tree' else list(self.nested[unit][cluster[2]:])
+                while pending:
+                    inner = pending.pop()
+                    units[inner] = cluster
+                    pending.extend(self.nested[inner])
+        return units
+
+    def name(self, cluster):
+        kind, unit = cluster[0], cluster[1]
+        if kind == 'more':
+            return f"\u2026 {len(self.nested[unit]) - cluster[2]} more in {unit}"
+        return self.cluster_id(cluster)
+
+
+def _cluster_summary(graph, clusters, max_nodes, start=None):
+    """Cluster ``graph`` to fit ``max_nodes``, or only the nodes inside the ``start`` cluster."""
+    outer = clusters.clusters(max_nodes)
+    inner = clusters.clusters(max_nodes, start) if start is not None else outer
+    node_units = clusters.node_units
+
+    def group_of(node_id):
+        unit = node_units[node_id]
+        return clusters.cluster_id(inner.get(unit) or outer[unit])
+
+    names = {clusters.cluster_id(cluster): clusters.name(cluster) for cluster in inner.values()}
+    groups = set(names) if start is not None else None
+    return cluster_graph(graph, group_of, names, groups)
+
+
+def tree_units(tree, language, max_nodes=None, max_depth=None):
+    """Return ``{node id: qualified name of the enclosing function or class}``.
+
+    Ids are the pre-order ids of the AST and DDG; names are those of the
+    control-flow units, with top-level code in ``TOP_LEVEL[language]``.
+    """
+    if language == 'python':
+        children = ast.iter_child_nodes
+        definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    else:
+        children = java_child_nodes
+        definitions = java_types() + java_methods()
+    ids = NodeIds()
+    units = {}
+    scopes = []
+    for event, node, _, _ in walk(tree, children, max_nodes, max_depth, exits=True):
+        if event is EXIT:
+            if isinstance(node, definitions):
+                scopes.pop()
+            continue
+        units[str(ids(node))] = scopes[-1] if scopes else TOP_LEVEL[language]
+        if isinstance(node, definitions):
+            scopes.append(f"{scopes[-1]}.{node.name}" if scopes else node.name)
+    return units
+
+
+def graph_groups(name, tree, language, max_nodes=None, max_depth=None):
+    """Return the function that maps a node id of graph ``name`` to its cluster."""
+    if name == 'cfg':
+        return lambda node_id: node_id.rsplit('/', 1)[0]
+    if name == 'calls':
+        return lambda node_id: node_id.rsplit('.', 1)[0]
+    units = tree_units(tree, language, max_nodes, max_depth)
+    top = TOP_LEVEL[language]
+    return lambda node_id: units.get(node_id, top)
+
+
+def summarize(graph, name, tree, language, max_nodes, max_depth, limits=None):
+    """Return ``graph`` itself if it fits in ``max_nodes`` nodes, else its summary."""
+    if len(graph["nodes"]) <= max_nodes:
+        return graph
+    if name == 'ast':
+        return summarize_tree(graph, max_nodes, max_depth)
+    clusters = UnitClusters(graph, graph_groups(name, tree, language, **(limits or {})), TOP_LEVEL[language])
+    return _cluster_summary(graph, clusters, max_nodes)
+
+
+def expand(graph, name, node_id, tree, language, max_nodes, max_depth, limits=None):
+    """Return the part of ``graph`` behind the collapsed node ``node_id``, or None if there is none.
+
+    A unit's own nodes are returned as they are; a cluster of nested
+    units is split into smaller clusters.
+    """
+    if name == 'ast':
+        return summarize_tree(graph, max_nodes, max_depth, root=node_id)
+    clusters = UnitClusters(graph, graph_groups(name, tree, language, **(limits or {})), TOP_LEVEL[language])
+    cluster = clusters.parse(node_id)
+    if cluster is None:
+        return None
+    if cluster[0] != 'own':
+        return _cluster_summary(graph, clusters, max_nodes, cluster)
+    outer = clusters.clusters(max_nodes)
+    node_units = clusters.node_units
+    return expand_cluster(graph, lambda node_id: (
+        node_units[node_id] if node_units[node_id] == cluster[1] else clusters.cluster_id(outer[node_units[node_id]])
+    ), node_id)
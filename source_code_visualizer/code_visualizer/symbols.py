@@ -0,0 +1,397 @@
+"""Cross-file symbol index and call resolution for the call graphs."""
+import ast
+import os
+from collections import namedtuple
+
+from .engine import EXIT, CompactGraph, java_child_nodes, walk
+from .frontends import lazy_import
+
+javalang = lazy_import('javalang')
+
+# A definition: ``qualname`` is dotted (module/package, classes, name).
+Symbol = namedtuple('Symbol', 'qualname name kind path')
+
+# A call made from ``caller`` (None at module level). ``qualifier`` is the
+# receiver text for ``x.name()`` calls and ``qualifier_type`` its declared
+# type when known; ``enclosing_class`` is the class the call appears in.
+CallSite = namedtuple('CallSite', 'caller name qualifier qualifier_type enclosing_class')
+
+# What one file contributes to the index. ``scope`` is the Python module or
+# Java package name; ``relations`` are (class, base name, kind) triples.
+FileSymbols = namedtuple('FileSymbols', 'path language scope definitions calls imports relations')
+
+CALLABLE_KINDS = ('function', 'method')
+CLASS_KINDS = ('class', 'interface', 'enum')
+
+
+def module_name(path):
+    """Return the dotted Python module name for a file path."""
+    path = os.path.splitext(path.replace('\\', '/'))[0]
+    parts = [part for part in path.split('/') if part not in ('', '.')]
+    if parts and parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def _qualify(scope, name):
+    return f"{scope}.{name}" if scope else name
+
+
+def _relative_module(module, level, target):
+    """Resolve ``from ..target import`` relative to ``module``."""
+    parts = module.split('.') if module else []
+    base = parts[:max(len(parts) - level, 0)]
+    if target:
+        base.append(target)
+    return '.'.join(base)
+
+
+def python_file_symbols(tree, path='', module='', max_nodes=None, max_depth=None):
+    """Collect definitions, imports and call sites from a Python module."""
+    definitions, calls, imports = [], [], {}
+    scopes = []  # (kind, qualname) of the enclosing classes and functions
+
+    for event, node, _, _ in walk(tree, ast.iter_child_nodes, max_nodes, max_depth, exits=True):
+        if event is EXIT:
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                scopes.pop()
+            continue
+
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            qualname = _qualify(scopes[-1][1] if scopes else module, node.name)
+            if isinstance(node, ast.ClassDef):
+                kind = 'class'
+            else:
+                kind = 'method' if scopes and scopes[-1][0] == 'class' else 'function'
+            definitions.append(Symbol(qualname, node.name, kind, path))
+            scopes.append(('class' if kind == 'class' else 'function', qualname))
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    imports[alias.asname] = alias.name
+                else:
+                    top = alias.name.split('.')[0]
+                    imports[top] = top
+
+        elif isinstance(node, ast.ImportFrom):
+            source = _relative_module(module, node.level, node.module) if node.level else node.module
+            for alias in node.names:
+                if alias.name != '*':
+                    imports[alias.asname or alias.name] = _qualify(source, alias.name)
+
+        elif isinstance(node, ast.Call):
+            caller = next((qualname for kind, qualname in reversed(scopes) if kind == 'function'), None)
+            enclosing_class = next((qualname for kind, qualname in reversed(scopes) if kind == 'class'), None)
+            func = node.func
+            if isinstance(func, ast.Name):
+                calls.append(CallSite(caller, func.id, None, None, enclosing_class))
+            elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+                calls.append(CallSite(caller, func.attr, func.value.id, None, enclosing_class))
+
+    return FileSymbols(path, 'python', module, definitions, calls, imports, [])
+
+
+def _java_type_name(type_node):
+    return getattr(type_node, 'name', None)
+
+
+def java_file_symbols(tree, path='', max_nodes=None, max_depth=None):
+    """Collect types, methods, imports and call sites from a Java compilation unit."""
+    package = tree.package.name if getattr(tree, 'package', None) else ''
+    imports = {}
+    for declaration in getattr(tree, 'imports', None) or ():
+        if not declaration.wildcard and not declaration.static:
+            imports[declaration.path.rsplit('.', 1)[-1]] = declaration.path
+
+    definitions, calls, relations = [], [], []
+    classes = []  # qualnames of the enclosing types
+    fields = {}  # class qualname -> {field name: type name}
+    methods = []  # (qualname, {local name: type name})
+
+    def declared_type(name):
+        for _, local_types in reversed(methods):
+            if name in local_types:
+                return local_types[name]
+        for cls in reversed(classes):
+            if name in fields.get(cls, {}):
+                return fields[cls][name]
+        return None
+
+    type_kinds = {
+        javalang.tree.ClassDeclaration: 'class',
+        javalang.tree.InterfaceDeclaration: 'interface',
+        javalang.tree.EnumDeclaration: 'enum',
+    }
+
+    for event, node, _, _ in walk(tree, java_child_nodes, max_nodes, max_depth, exits=True):
+        kind = type_kinds.get(type(node))
+        if event is EXIT:
+            if kind:
+                classes.pop()
+            elif isinstance(node, (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)):
+                methods.pop()
+            elif isinstance(node, javalang.tree.FieldDeclaration) and classes:
+                methods.pop()
+            continue
+
+        if kind:
+            qualname = _qualify(classes[-1] if classes else package, node.name)
+            definitions.append(Symbol(qualname, node.name, kind, path))
+            classes.append(qualname)
+            if isinstance(node, javalang.tree.ClassDeclaration):
+                if node.extends:
+                    relations.append((qualname, node.extends.name, 'extends'))
+                for interface in node.implements or ():
+                    relations.append((qualname, interface.name, 'implements'))
+
+        elif isinstance(node, javalang.tree.MethodDeclaration):
+            qualname = _qualify(classes[-1] if classes else package, node.name)
+            definitions.append(Symbol(qualname, node.name, 'method', path))
+            methods.append((qualname, {}))
+
+        elif isinstance(node, javalang.tree.ConstructorDeclaration):
+            # Named as in the JVM; ``new`` expressions are not calls here.
+            qualname = _qualify(classes[-1] if classes else package, '<init>')
+            definitions.append(Symbol(qualname, '<init>', 'constructor', path))
+            methods.append((qualname, {}))
+
+        elif isinstance(node, javalang.tree.FieldDeclaration) and classes:
+            class_fields = fields.setdefault(classes[-1], {})
+            for declarator in node.declarators:
+                class_fields[declarator.name] = _java_type_name(node.type)
+            # Field initializers run in the constructor, or the static
+            # initializer for static fields.
+            initializer = '<clinit>' if 'static' in (node.modifiers or ()) else '<init>'
+            methods.append((_qualify(classes[-1], initializer), {}))
+
+        elif isinstance(node, javalang.tree.LocalVariableDeclaration) and methods:
+            for declarator in node.declarators:
+                methods[-1][1][declarator.name] = _java_type_name(node.type)
+
+        elif isinstance(node, javalang.tree.FormalParameter) and methods:
+            methods[-1][1][node.name] = _java_type_name(node.type)
+
+        elif isinstance(node, javalang.tree.MethodInvocation) and methods:
+            qualifier = node.qualifier or None
+            qualifier_type = declared_type(qualifier) if qualifier and '.' not in qualifier else None
+            calls.append(CallSite(methods[-1][0], node.member, qualifier, qualifier_type,
+                                  classes[-1] if classes else None))
+
+    return FileSymbols(path, 'java', package, definitions, calls, imports, relations)
+
+
+class SymbolIndex:
+    """Definitions of a whole project, keyed for O(1) lookups.
+
+    Files are added, replaced or removed one at a time; ``update`` is a
+    no-op when a file's content digest is unchanged, so re-indexing a
+    project after an edit only touches the edited file.
+    """
+
+    def __init__(self):
+        self.files = {}  # path -> (digest, FileSymbols)
+        self.symbols = {}  # qualname -> {path: Symbol}
+        self.by_name = {}  # short name -> {qualname: count}
+        self.superclasses = {}  # Java class qualname -> (path, base name)
+
+    def __contains__(self, qualname):
+        return qualname in self.symbols
+
+    def update(self, file_symbols, digest=None):
+        """Add or replace a file; return False if it was already current."""
+        path = file_symbols.path
+        current = self.files.get(path)
+        if current is not None and digest is not None and current[0] == digest:
+            return False
+        self.remove(path)
+        self.files[path] = (digest, file_symbols)
+        for symbol in file_symbols.definitions:
+            self.symbols.setdefault(symbol.qualname, {})[path] = symbol
+            names = self.by_name.setdefault(symbol.name, {})
+            names[symbol.qualname] = names.get(symbol.qualname, 0) + 1
+        for cls, base, kind in file_symbols.relations:
+            if kind == 'extends':
+                self.superclasses[cls] = (path, base)
+        return True
+
+    def remove(self, path):
+        """Drop everything a file contributed."""
+        current = self.files.pop(path, None)
+        if current is None:
+            return
+        for cls, _, kind in current[1].relations:
+            if kind == 'extends' and self.superclasses.get(cls, (None,))[0] == path:
+                del self.superclasses[cls]
+        for symbol in current[1].definitions:
+            defined = self.symbols.get(symbol.qualname)
+            if defined is not None and defined.pop(path, None) is not None and not defined:
+                del self.symbols[symbol.qualname]
+            names = self.by_name.get(symbol.name)
+            if names is not None and symbol.qualname in names:
+                names[symbol.qualname] -= 1
+                if not names[symbol.qualname]:
+                    del names[symbol.qualname]
+                if not names:
+                    del self.by_name[symbol.name]
+
+    def kind(self, qualname):
+        defined = self.symbols.get(qualname)
+        return next(iter(defined.values())).kind if defined else None
+
+    def unique(self, name, kinds):
+        """Return the only symbol called ``name`` of one of ``kinds``, if unambiguous."""
+        matches = [qualname for qualname in self.by_name.get(name, ()) if self.kind(qualname) in kinds]
+        return matches[0] if len(matches) == 1 else None
+
+    def callable(self, qualname):
+        """Return ``qualname`` if it is a function or method (or a class's __init__)."""
+        kind = self.kind(qualname)
+        if kind in CALLABLE_KINDS:
+            return qualname
+        if kind in CLASS_KINDS and self.kind(f"{qualname}.__init__") == 'method':
+            return f"{qualname}.__init__"
+        return None
+
+    # Call resolution
+
+    def resolve_python(self, file_symbols, site):
+        """Return the qualname a Python call refers to, or None if unknown."""
+        module = file_symbols.scope
+        imports = file_symbols.imports
+        if site.qualifier is None:
+            candidates = [_qualify(module, site.name)]
+            if site.caller:
+                candidates.insert(0, f"{site.caller}.{site.name}")
+            if site.name in imports:
+                candidates.append(imports[site.name])
+            for candidate in candidates:
+                target = self.callable(candidate)
+                if target:
+                    return target
+            target = self.unique(site.name, CALLABLE_KINDS + CLASS_KINDS)
+            return target and self.callable(target)
+        if site.qualifier in ('self', 'cls') and site.enclosing_class:
+            return self.callable(f"{site.enclosing_class}.{site.name}")
+        base = imports.get(site.qualifier) or _qualify(module, site.qualifier)
+        return self.callable(f"{base}.{site.name}")
+
+    def resolve_java_class(self, file_symbols, name, enclosing_class=None):
+        """Return the qualified name of a Java type referenced as ``name``, or None."""
+        if name in file_symbols.imports:
+            return file_symbols.imports[name]
+        cls = enclosing_class
+        while cls:
+            if self.kind(f"{cls}.{name}") in CLASS_KINDS:
+                return f"{cls}.{name}"
+            cls = cls.rpartition('.')[0] if self.kind(cls.rpartition('.')[0]) in CLASS_KINDS else None
+        candidate = _qualify(file_symbols.scope, name)
+        if self.kind(candidate) in CLASS_KINDS:
+            return candidate
+        return self.unique(name, CLASS_KINDS)
+
+    def _java_inherited_method(self, cls, name):
+        """Look ``name`` up in ``cls`` and then up its indexed superclasses."""
+        seen = set()
+        while cls and cls not in seen:
+            seen.add(cls)
+            if self.kind(f"{cls}.{name}") == 'method':
+                return f"{cls}.{name}"
+            superclass = self.superclasses.get(cls)
+            if superclass is None:
+                return None
+            path, base = superclass
+            cls = self.resolve_java_class(self.files[path][1], base, cls)
+        return None
+
+    def resolve_java(self, file_symbols, site):
+        """Return the qualname a Java call refers to.
+
+        Calls that cannot be resolved fall back to ``qualifier.member`` (or
+        ``EnclosingClass.member``) so library calls still show up.
+        """
+        if site.qualifier in (None, 'this'):
+            cls = site.enclosing_class
+            while cls:
+                target = self._java_inherited_method(cls, site.name)
+                if target:
+                    return target
+                cls = cls.rpartition('.')[0] if self.kind(cls.rpartition('.')[0]) in CLASS_KINDS else None
+            return _qualify(site.enclosing_class, site.name)
+        cls = self.resolve_java_class(file_symbols, site.qualifier_type or site.qualifier, site.enclosing_class)
+        return f"{cls or site.qualifier}.{site.name}"
+
+
+def _display_name(qualname, scope):
+    """Strip the Java package from a qualname for display."""
+    if scope and qualname.startswith(scope + '.'):
+        return qualname[len(scope) + 1:]
+    return qualname
+
+
+def build_call_graph(index, files):
+    """Build the call graph of ``files`` with calls resolved against ``index``."""
+    graph = CompactGraph()
+
+    def add_edge_if_new(source, target, label):
+        source, target = graph.index[source], graph.index[target]
+        if not graph.has_edge(source, target):
+            graph.add_edge(source, target, label)
+
+    for file_symbols in files:
+        if file_symbols.language == 'python':
+            for symbol in file_symbols.definitions:
+                if symbol.kind in CALLABLE_KINDS:
+                    graph.add_node(symbol.qualname, f"Function: {symbol.qualname}")
+            entry = file_symbols.scope or "Global"
+            for site in file_symbols.calls:
+                target = index.resolve_python(file_symbols, site)
+                if target is None:
+                    continue
+                if target not in graph:
+                    graph.add_node(target, f"Function: {target}")
+                caller = site.caller or entry
+                if caller not in graph:
+                    graph.add_node(caller, "Program Entry" if caller == "Global" else f"Module: {caller}")
+                add_edge_if_new(caller, target, "calls")
+        else:
+            scope = file_symbols.scope
+            for cls, base, kind in file_symbols.relations:
+                graph.add_node(cls, f"Class: {_display_name(cls, scope)}")
+                target = index.resolve_java_class(file_symbols, base, cls) or base
+                label = "Class" if kind == 'extends' else "Interface"
+                graph.add_node(target, f"{label}: {_display_name(target, scope)}")
+                add_edge_if_new(cls, target, kind)
+            for symbol in file_symbols.definitions:
+                if symbol.kind == 'method':
+                    graph.add_node(symbol.qualname, f"Method: {_display_name(symbol.qualname, scope)}")
+                elif symbol.kind == 'constructor':
+                    graph.add_node(symbol.qualname, f"Constructor: {_display_name(symbol.qualname, scope)}")
+            for site in file_symbols.calls:
+                target = index.resolve_java(file_symbols, site)
+                if target == site.caller:  # Avoid self-loops
+                    continue
+                if site.caller not in graph:
+                    graph.add_node(site.caller, f"Initializer: {_display_name(site.caller, scope)}")
+                if target not in graph:
+                    graph.add_node(target, f"Method: {_display_name(target, scope)}")
+                add_edge_if_new(site.caller, target, "calls")
+
+    # Remove isolated nodes
+    graph.remove_isolated()
+    return graph
+
+
+def file_symbols_for(tree, language, path='', **limits):
+    """Extract the symbols of a parsed file."""
+    if language == 'python':
+        return python_file_symbols(tree, path, module_name(path) if path else '', **limits)
+    return java_file_symbols(tree, path, **limits)
+
+
+def file_call_graph(tree, language, **limits):
+    """Build the call graph of one file, resolving calls through a symbol index."""
+    file_symbols = file_symbols_for(tree, language, **limits)
+    index = SymbolIndex()
+    index.update(file_symbols)
+    return build_call_graph(index, [file_symbols])
@@ -1,3 +1,1711 @@
-from django.test import TestCase
+import ast
+import asyncio
+import gzip
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
+import shutil
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import graphviz
+import javalang
+import networkx as nx
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import incremental, java_frontend, python_frontend, views
+from .batch import analyze_files, project_index
+from .benchmark import IMPORT_SCENARIOS, compare as compare_benchmarks, measure_imports
+from .cfg import PythonControlFlow, build_java_cfg, build_python_cfg
+from .dataflow import build_java_ddg, build_python_ddg
+from .cache import (
+    ANALYSIS_VERSION, LRUByteCache, ParseStore, ResultCache, code_digest, get_incremental_store, get_parse_store,
+    get_result_cache, make_cache_key,
+)
+from .export import export_tree
+from .frontends import UnsupportedLanguage, get_frontend, language_for, languages, register
+from .engine import (
+    EDGE, EXIT, NODE, CompactGraph, NodeIds, TraversalLimitExceeded, build_python_ast_graph, report_progress, walk,
+)
+from .java_frontend import JavaParseCache, get_java_cache, parse_java
+from .jobs import run_job
+from .layout import apply_layout, compute_layout
+from .metrics import STAGE_SECONDS, MetricsRegistry, get_registry
+from .models import AnalysisJob, GraphNode, StoredGraph
+from .pool import AnalysisPool, PoolBusy
+from .stream import NDJSON_MEDIA_TYPE, graph_chunks
+from .sharing import share_subtrees
+from .summary import expand, summarize, summarize_tree
+from .symbols import SymbolIndex, build_call_graph, file_symbols_for
+from .wire import COMPACT_MEDIA_TYPE, compact_graph
+
+
+def _parse_java(code):
+    tokens = list(javalang.tokenizer.tokenize(code))
+    return javalang.parser.Parser(tokens).parse()
+
+
+def _reference_python_ast(tree):
+    """NetworkX-based AST conversion the engine has to reproduce."""
+    graph = nx.DiGraph()
+    ids = {}
+
+    def visit(node, parent=None):
+        # Ids are pre-order positions; shared nodes keep their first one.
+        node_id = ids.setdefault(id(node), str(len(ids)))
+        node_label = type(node).__name__
+        if isinstance(node, ast.Name):
+            node_label += f" ({node.id})"
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)) \
+                and not isinstance(node.value, bool):
+            node_label += f" ({node.value})"
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            node_label += f" ({node.value})"
+        graph.add_node(node_id, label=node_label)
+        if parent is not None:
+            graph.add_edge(ids[id(parent)], node_id)
+        for child in ast.iter_child_nodes(node):
+            visit(child, node)
+
+    visit(tree)
+    return {
+        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
+        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
+    }
+
+
+def _reference_java_ast(tree):
+    """NetworkX-based Java AST conversion the engine has to reproduce."""
+    graph = nx.DiGraph()
+    ids = {}
+
+    def visit(node, parent=None):
+        node_id = ids.setdefault(id(node), str(len(ids)))
+        node_label = type(node).__name__
+        if hasattr(node, 'name') and node.name is not None:
+            node_label += f"\n{node.name}"
+        if hasattr(node, 'extends') and node.extends is not None:
+            if hasattr(node.extends, 'name') and node.extends.name is not None:
+                node_label += f"\nextends {node.extends.name}"
+        if hasattr(node, 'implements') and node.implements is not None:
+            implements = [i.name for i in node.implements if hasattr(i, 'name') and i.name is not None]
+            if implements:
+                node_label += f"\nimplements {', '.join(implements)}"
+        graph.add_node(node_id, label=node_label)
+        if parent is not None:
+            parent_id = ids[id(parent)]
+            if isinstance(node, javalang.tree.ClassDeclaration):
+                if hasattr(node, 'extends') and node.extends is not None:
+                    graph.add_edge(node_id, parent_id, relationship='extends')
+                if hasattr(node, 'implements') and node.implements:
+                    graph.add_edge(node_id, parent_id, relationship='implements')
+            else:
+                graph.add_edge(parent_id, node_id, relationship='contains')
+        for child in node.children:
+            if isinstance(child, javalang.ast.Node):
+                visit(child, node)
+            elif isinstance(child, list):
+                for item in child:
+                    if isinstance(item, javalang.ast.Node):
+                        visit(item, node)
+
+    visit(tree)
+    return {
+        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', '')).replace('\n', ' - ')} for n in graph.nodes],
+        "edges": [{"source": str(e[0]), "target": str(e[1]),
+                   "relationship": graph.edges[e].get('relationship', 'contains')} for e in graph.edges]
+    }
+
+
+def _large_python_source(functions=400):
+    lines = []
+    for i in range(functions):
+        lines.append(f"def func_{i}(a, b=1.5):")
+        lines.append(f"    x = a + b * {i} - 'text_{i}'[0]")
+        lines.append("    if x < a < b and not None:")
+        lines.append(f"        return [func_{i}(y) for y in range(x)]")
+        lines.append("    return {'k': (x, a), 'j': b}")
+    lines.append("if __name__ == '__main__':")
+    lines.append("    func_0(1)")
+    return "\n".join(lines)
+
+
+def _large_java_source(classes=40, methods=10):
+    parts = ["package demo;", "import java.util.List;"]
+    for c in range(classes):
+        parts.append(f"public class Shape{c} extends Base implements Drawable, Comparable {{")
+        parts.append("    private int size = 3;")
+        for m in range(methods):
+            parts.append(f"    public int area{m}(int w, int h) {{")
+            parts.append(f"        int total = w * h + size + {m};")
+            parts.append("        if (total > 10) { return helper(total); }")
+            parts.append("        return total;")
+            parts.append("    }")
+        parts.append("    class Inner extends Base { }")
+        parts.append("}")
+    return "\n".join(parts)
+
+
+class AstGraphEngineTests(TestCase):
+    def test_python_ast_matches_networkx_on_large_input(self):
+        tree = ast.parse(_large_python_source())
+        result = python_frontend.build_ast(tree)
+        self.assertGreater(len(result["nodes"]), 5000)
+        self.assertEqual(result, _reference_python_ast(tree))
+
+    def test_java_ast_matches_networkx_on_large_input(self):
+        tree = _parse_java(_large_java_source())
+        result = java_frontend.build_ast(tree)
+        self.assertGreater(len(result["nodes"]), 5000)
+        self.assertEqual(result, _reference_java_ast(tree))
+
+
+    def test_ids_are_deterministic(self):
+        code = _large_python_source(5)
+        first = python_frontend.build_ast(ast.parse(code))
+        second = python_frontend.build_ast(ast.parse(code))
+        self.assertEqual(first, second)
+        self.assertEqual([node["id"] for node in first["nodes"]][:3], ["0", "1", "2"])
+        # The AST and the DDG number the same tree the same way.
+        ddg = python_frontend.build_ddg(ast.parse(code))
+        labels = {node["id"]: node["label"] for node in first["nodes"]}
+        self.assertTrue(ddg["nodes"])
+        for node in ddg["nodes"]:
+            self.assertIn(node["id"], labels)
+            if node["label"].startswith("Name ("):
+                self.assertEqual(node["label"], labels[node["id"]])
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_lru_evicts_least_recently_used_by_size(self):
+        cache = LRUByteCache(max_bytes=10)
+        cache.set('a', b'1234')
+        cache.set('b', b'1234')
+        cache.get('a')
+        cache.set('c', b'1234')
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size, 8)
+
+    def test_lru_skips_oversized_entries(self):
+        cache = LRUByteCache(max_bytes=4)
+        cache.set('a', b'12345')
+        self.assertEqual(len(cache), 0)
+
+    def test_key_depends_on_language_and_code(self):
+        digest = code_digest('x = 1')
+        self.assertNotEqual(make_cache_key('python', digest), make_cache_key('java', digest))
+        self.assertNotEqual(make_cache_key('python', digest), make_cache_key('python', code_digest('x = 2')))
+        self.assertNotEqual(make_cache_key('python', digest), make_cache_key('python', digest, 'ast'))
+
+    @override_settings(CACHES={'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_shared_backend_fills_local_cache(self):
+        writer = ResultCache(shared_alias='shared')
+        reader = ResultCache(shared_alias='shared')
+        writer.set('k', b'payload')
+        self.assertEqual(reader.get('k'), b'payload')
+        self.assertEqual(reader.stats()["shared_hits"], 1)
+        self.assertEqual(reader.local.get('k'), b'payload')
+
+    @override_settings(CACHES={'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_clear_keeps_other_keys_of_shared_backend(self):
+        caches['shared'].set('other_app:key', 'value')
+        cache = ResultCache(shared_alias='shared')
+        cache.set('k', b'payload')
+        cache.clear()
+        self.assertEqual(len(cache.local), 0)
+        self.assertEqual(caches['shared'].get('other_app:key'), 'value')
+
+    def test_repeated_upload_is_served_from_cache(self):
+        data = {'code': 'x = 1\ny = x', 'language': 'python'}
+        first = self.client.post('/visualize/', data)
+        second = self.client.post('/visualize/', data)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(get_result_cache().stats()["hits"], 1)
+        self.assertEqual(get_result_cache().stats()["misses"], 1)
+
+
+    def test_etag_and_if_none_match(self):
+        data = {'code': 'x = 1\ny = x', 'language': 'python'}
+        first = self.client.post('/visualize/', data)
+        get_result_cache().clear()
+        # A rebuild gives the same bytes and the same tag.
+        second = self.client.post('/visualize/', data)
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        response = self.client.post('/visualize/', data, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        response = self.client.post('/visualize/', dict(data, code='x = 2'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        compact = self.client.post('/visualize/', dict(data, format='compact'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(compact.status_code, 200)
+        self.assertNotEqual(compact['ETag'], first['ETag'])
+
+
+class LazyGraphEndpointTests(TestCase):
+    code = "def f(a):\n    return a\n\nif __name__ == '__main__':\n    f(1)\n"
+
+    def setUp(self):
+        get_result_cache().clear()
+        get_parse_store().clear()
+
+    def test_single_graph_endpoint_returns_only_that_graph(self):
+        response = self.client.post('/visualize/cfg/', {'code': self.code, 'language': 'python'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'cfg', 'token'})
+        self.assertEqual(data['cfg'], python_frontend.build_cfg(ast.parse(self.code)))
+
+    def test_token_reuses_parsed_tree(self):
+        first = self.client.post('/visualize/ast/', {'code': self.code, 'language': 'python'}).json()
+        with mock.patch('code_visualizer.frontends.Frontend.parse') as parse:
+            second = self.client.post('/visualize/ddg/', {'token': first['token']})
+        parse.assert_not_called()
+        self.assertEqual(second.status_code, 200)
+        self.assertIn('ddg', second.json())
+
+    def test_expired_token_asks_for_code(self):
+        token = views._make_parse_token('python', code_digest(self.code))
+        response = self.client.post('/visualize/ast/', {'token': token})
+        self.assertEqual(response.status_code, 410)
+
+    def test_graphs_selector(self):
+        response = self.client.post('/visualize/', {'code': self.code, 'language': 'python', 'graphs': 'ast,ddg'})
+        self.assertEqual(set(response.json()), {'ast', 'ddg', 'token'})
+        response = self.client.post('/visualize/', {'code': self.code, 'language': 'python', 'graphs': 'ast,foo'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_default_payload_is_unchanged(self):
+        response = self.client.post('/visualize/', {'code': self.code, 'language': 'python'})
+        self.assertEqual(set(response.json()), {'ast', 'cfg', 'ddg'})
+
+    def test_unknown_graph_endpoint(self):
+        response = self.client.post('/visualize/xyz/', {'code': self.code})
+        self.assertEqual(response.status_code, 404)
+
+    def test_parse_store_expires_entries(self):
+        store = ParseStore(ttl=-1)
+        store.put('t', object())
+        self.assertIsNone(store.get('t'))
+
+
+class TraversalTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_walk_yields_preorder_with_exits(self):
+        tree = ast.parse("a + b")
+        events = [(event, type(node).__name__) for event, node, _, _ in
+                  walk(tree, ast.iter_child_nodes, exits=True)]
+        self.assertEqual(events[:3], [('enter', 'Module'), ('enter', 'Expr'), ('enter', 'BinOp')])
+        self.assertEqual(events[-1], (EXIT, 'Module'))
+
+    def test_walk_limits(self):
+        tree = ast.parse("a + b")
+        with self.assertRaises(TraversalLimitExceeded):
+            list(walk(tree, ast.iter_child_nodes, max_nodes=3))
+        with self.assertRaises(TraversalLimitExceeded):
+            list(walk(tree, ast.iter_child_nodes, max_depth=2))
+
+    def test_deep_python_expression(self):
+        tree = ast.parse(" + ".join(["a"] * 2000))
+        for builder in python_frontend.BUILDERS.values():
+            builder(tree)
+        self.assertGreater(len(python_frontend.build_ast(tree)["nodes"]), 4000)
+
+    def test_deep_java_expression(self):
+        tree = _parse_java("class A { int f(int a) { return " + " + ".join(["a"] * 3000) + "; } }")
+        for builder in java_frontend.BUILDERS.values():
+            builder(tree)
+        self.assertGreater(len(java_frontend.build_ddg(tree)["nodes"]), 3000)
+
+    def test_deeply_nested_statements(self):
+        # Deeper than the recursion limit; the parsers cannot produce this,
+        # so the trees are built directly.
+        depth = sys.getrecursionlimit() * 2
+        body = ast.parse("y = x").body
+        for _ in range(depth):
+            body = [ast.If(test=ast.Name('x', ast.Load()), body=body, orelse=[])]
+        tree = ast.Module(body=ast.parse("x = 1").body + body, type_ignores=[])
+        self.assertEqual(len(python_frontend.build_cfg(tree)["nodes"]), 2 * depth + 3)
+        self.assertEqual(len(python_frontend.build_ddg(tree)["edges"]), depth + 1)
+
+        unit = _parse_java("class A { void m(int x) { x = 1; } }")
+        method = unit.types[0].body[0]
+        for _ in range(depth):
+            condition = javalang.tree.MemberReference(member='x', qualifier='', selectors=[])
+            method.body = [javalang.tree.IfStatement(
+                condition=condition, then_statement=javalang.tree.BlockStatement(statements=method.body))]
+        self.assertEqual(len(java_frontend.build_cfg(unit)["nodes"]), 2 * depth + 3)
+        self.assertEqual(len(java_frontend.build_ddg(unit)["edges"]), depth)
+
+    @override_settings(CODE_VISUALIZER_LIMITS={'MAX_NODES': 50, 'MAX_DEPTH': None})
+    def test_node_cap_rejects_request(self):
+        response = self.client.post('/visualize/', {'code': _large_python_source(5), 'language': 'python'})
+        self.assertEqual(response.status_code, 413)
+
+    def test_python_call_graph_global_calls(self):
+        cfg = python_frontend.build_calls(ast.parse("def f():\n    pass\ndef g():\n    f()\nf()\n"))
+        self.assertIn({"id": "Global", "label": "Program Entry"}, cfg["nodes"])
+        self.assertEqual(
+            {(e["source"], e["target"]) for e in cfg["edges"]},
+            {("g", "f"), ("Global", "f")},
+        )
+
+    def test_java_call_graph_walks_class_bodies_once(self):
+        tree = _parse_java("class A { void m() { n(); } void n() {} }")
+        cfg = java_frontend.build_calls(tree)
+        self.assertEqual([n["id"] for n in cfg["nodes"]], ["A.m", "A.n"])
+
+    def test_java_call_graph_constructors_and_field_initializers(self):
+        tree = _parse_java("class A { static int s = k(); int x = m(); A() { h(); } "
+                           "void h() {} int m() { return 1; } static int k() { return 2; } }")
+        calls = java_frontend.build_calls(tree)
+        edges = {(edge["source"], edge["target"]) for edge in calls["edges"]}
+        self.assertEqual(edges, {("A.<init>", "A.h"), ("A.<init>", "A.m"), ("A.<clinit>", "A.k")})
+
+
+class ControlFlowGraphTests(TestCase):
+    def _edges(self, graph):
+        return {(graph.keys[s], graph.keys[t], None if a < 0 else graph.strings[a])
+                for s, t, a in zip(graph.edge_src, graph.edge_dst, graph.edge_attrs)}
+
+    def test_python_branches_loops_and_try(self):
+        code = (
+            "def f(x):\n"
+            "    if x:\n"
+            "        return 1\n"
+            "    for i in x:\n"
+            "        if i:\n"
+            "            break\n"
+            "        continue\n"
+            "    try:\n"
+            "        g()\n"
+            "    except ValueError:\n"
+            "        raise\n"
+            "    return 2\n"
+        )
+        graph = build_python_cfg(ast.parse(code))
+        labels = {key: graph.label(index) for key, index in graph.index.items()}
+        self.assertEqual(labels["f/0"], "if x")
+        edges = self._edges(graph)
+        self.assertIn(("f/0", "f/1", "true"), edges)
+        self.assertIn(("f/1", "f/exit", "return"), edges)
+        loop = next(key for key, label in labels.items() if label == "for i in x")
+        self.assertIn(("f/2", loop, None), edges)
+        self.assertTrue(any(source == loop and label == "next" for source, _, label in edges))
+        self.assertTrue(any(target == loop and label == "continue" for _, target, label in edges))
+        self.assertTrue(any(label == "break" for _, _, label in edges))
+        handler = next(key for key, label in labels.items() if label.startswith("except ValueError"))
+        self.assertTrue(any(target == handler and label == "exception" for _, target, label in edges))
+        self.assertIn((handler, "f/exit", "raise"), edges)
+
+    def test_java_switch_labels_and_finally(self):
+        tree = _parse_java(
+            "class A { int f(int x) { outer: while (x > 0) { switch (x) { case 1: x++; "
+            "case 2: continue outer; default: break; } } "
+            "try { g(); } catch (E e) { h(); } finally { k(); } return x; } }"
+        )
+        graph = build_java_cfg(tree)
+        labels = {graph.label(index): key for key, index in graph.index.items()}
+        edges = self._edges(graph)
+        # Case 1 falls through to case 2, which continues the labelled loop.
+        self.assertIn((labels["case 1\nx++"], labels["case 2\ncontinue outer"], None), edges)
+        self.assertIn((labels["case 2\ncontinue outer"], labels["while (x > 0)"], "continue"), edges)
+        self.assertIn((labels["try\ng()"], labels["catch (E e)\nh()"], "exception"), edges)
+        self.assertIn((labels["catch (E e)\nh()"], labels["k()"], None), edges)
+        self.assertIn((labels["k()"], labels["return x"], None), edges)
+        self.assertIn((labels["k()"], "A.f/exit", "raise"), edges)
+        self.assertIn((labels["return x"], "A.f/exit", "return"), edges)
+
+    def test_try_finally_without_handlers(self):
+        graph = build_python_cfg(ast.parse("def f():\n    try:\n        a()\n    finally:\n        b()\n    c()\n"))
+        labels = {graph.label(index): key for key, index in graph.index.items()}
+        edges = self._edges(graph)
+        # The normal path runs the finally block and goes on to c(); an exception leaves the function.
+        self.assertIn((labels["try\na()"], labels["b()"], None), edges)
+        self.assertIn((labels["b()"], labels["c()"], None), edges)
+        self.assertIn((labels["b()"], "f/exit", "raise"), edges)
+        self.assertNotIn((labels["try\na()"], labels["b()"], "exception"), edges)
+
+    def test_each_statement_visited_once(self):
+        tree = ast.parse(_large_python_source(2000) + "\nclass C:\n    def m(self):\n        def inner():\n            pass\n")
+        builder = PythonControlFlow()
+        graph = builder.module(tree)
+        self.assertEqual(builder.statements, sum(isinstance(node, ast.stmt) for node in ast.walk(tree)))
+        units = {key.rsplit('/', 1)[0] for key in graph.keys}
+        self.assertEqual(len(units), 2000 + 4)
+        self.assertIn("C.m.inner", units)
+
+    def test_duplicate_names_and_limits(self):
+        graph = build_python_cfg(ast.parse("def f():\n    pass\ndef f():\n    pass\n"))
+        self.assertIn("f#2/entry", graph)
+        with self.assertRaises(TraversalLimitExceeded):
+            build_python_cfg(ast.parse(_large_python_source(20)), max_nodes=10)
+
+    def test_call_graph_endpoint(self):
+        code = "def f():\n    pass\ndef g():\n    f()\n"
+        data = self.client.post('/visualize/calls/', {'code': code}).json()
+        self.assertEqual(data["calls"], python_frontend.build_calls(ast.parse(code)))
+
+
+class DataFlowTests(TestCase):
+    def _python_links(self, code):
+        """Return the DDG edges as ``(label@line, label@line)`` pairs."""
+        tree = ast.parse(code)
+        ids = NodeIds()
+        nodes = {ids(node): node for _, node, _, _ in walk(tree, ast.iter_child_nodes)}
+        graph = build_python_ddg(tree)
+
+        def name(index):
+            return f"{graph.label(index)}@{nodes[graph.keys[index]].lineno}"
+        return {(name(s), name(t)) for s, t in zip(graph.edge_src, graph.edge_dst)}
+
+    def _java_links(self, code):
+        graph = build_java_ddg(_parse_java(code))
+        return sorted((graph.label(s), graph.label(t)) for s, t in zip(graph.edge_src, graph.edge_dst))
+
+    def test_python_definitions_reach_through_branches_and_loops(self):
+        links = self._python_links(
+            "x = 1\n"
+            "x = 2\n"
+            "if c:\n"
+            "    x = 3\n"
+            "for i in x:\n"
+            "    x = i\n"
+            "print(x)\n"
+        )
+        # ``x = 1`` is killed before any use; both branches reach the loop.
+        self.assertEqual(links, {
+            ("Name (x)@2", "Name (x)@5"), ("Name (x)@4", "Name (x)@5"), ("Name (i)@5", "Name (i)@6"),
+            ("Name (x)@2", "Name (x)@7"), ("Name (x)@4", "Name (x)@7"), ("Name (x)@6", "Name (x)@7"),
+        })
+
+    def test_python_lambdas(self):
+        links = self._python_links(
+            "d = 2\n"
+            "f = lambda x, y=d, *, z=d: x + y\n"
+            "print(f(1))\n"
+        )
+        # Defaults are evaluated where the lambda stands; parameters are local to it.
+        self.assertEqual(links, {
+            ("Name (d)@1", "Name (d)@2"), ("Parameter: x@2", "Name (x)@2"), ("Parameter: y@2", "Name (y)@2"),
+            ("Name (f)@2", "Name (f)@3"),
+        })
+
+    def test_python_scopes(self):
+        links = self._python_links(
+            "n = 1\n"
+            "class C:\n"
+            "    n = 2\n"
+            "    k = n\n"
+            "    def m(self, a):\n"
+            "        total = [n for n in a]\n"
+            "        return n + len(total) + self.k\n"
+            "def g():\n"
+            "    global n\n"
+            "    return n\n"
+        )
+        self.assertEqual(links, {
+            ("Name (n)@3", "Name (n)@4"),
+            # The comprehension variable stays in the comprehension.
+            ("Name (n)@6", "Name (n)@6"), ("Parameter: a@5", "Name (a)@6"),
+            # Methods do not see class attributes; they see the module.
+            ("Name (n)@1", "Name (n)@7"), ("Name (total)@6", "Name (total)@7"),
+            ("Parameter: self@5", "Name (self)@7"), ("Name (n)@1", "Name (n)@10"),
+        })
+
+    def test_java_locals_fields_and_lambdas(self):
+        links = self._java_links(
+            "class A { int f; int g(int a) { int b = a; for (int i = 0; i < a; i++) { b += i; } "
+            "Runnable r = (x) -> x + b; f = b; return f; } int h() { return f; } }"
+        )
+        self.assertEqual(links, sorted([
+            ("Parameter: a", "Use: a"), ("Parameter: a", "Use: a"),
+            ("Variable: i", "Assignment: i"), ("Variable: i", "Use: i"), ("Variable: i", "Use: i"),
+            ("Assignment: i", "Assignment: i"), ("Assignment: i", "Use: i"), ("Assignment: i", "Use: i"),
+            ("Variable: b", "Assignment: b"), ("Assignment: b", "Assignment: b"),
+            ("Variable: b", "Use: b"), ("Assignment: b", "Use: b"),
+            ("Variable: b", "Use: b"), ("Assignment: b", "Use: b"),
+            ("Parameter: x", "Use: x"),
+            # Assigning a field kills the value it had on entry.
+            ("Assignment: f", "Use: f"), ("Field: f", "Use: f"),
+        ]))
+
+    def test_only_definitions_point_at_uses(self):
+        graph = python_frontend.build_ddg(ast.parse(_large_python_source(50)))
+        labels = {node["id"]: node["label"] for node in graph["nodes"]}
+        self.assertTrue(graph["edges"])
+        for edge in graph["edges"]:
+            self.assertTrue(labels[edge["target"]].startswith("Name ("))
+
+
+class SummaryTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_tree_summary_fits_budget(self):
+        graph = python_frontend.build_ast(ast.parse(_large_python_source(50)))
+        summary = summarize_tree(graph, 40, 8)
+        ids = {node["id"] for node in summary["nodes"]}
+        self.assertLessEqual(len(ids), 40)
+        self.assertEqual(summary["nodes"][0]["id"], "0")
+        # Every hidden node is counted by exactly one visible node.
+        hidden = sum(node.get("collapsed", 0) for node in summary["nodes"])
+        more = sum(1 for node in summary["nodes"] if "more" in node)
+        self.assertEqual(len(ids) - more + hidden, len(graph["nodes"]))
+        self.assertTrue(all(edge["source"] in ids and edge["target"] in ids for edge in summary["edges"]))
+
+    def test_java_tree_summary_follows_containment(self):
+        graph = java_frontend.build_ast(_parse_java(_large_java_source(5, 3)))
+        summary = summarize_tree(graph, 30, 3)
+        hidden = sum(node.get("collapsed", 0) for node in summary["nodes"])
+        more = sum(1 for node in summary["nodes"] if "more" in node)
+        self.assertEqual(len(summary["nodes"]) - more + hidden, len(graph["nodes"]))
+
+    def test_wide_nodes_are_paged(self):
+        graph = python_frontend.build_ast(ast.parse(_large_python_source(50)))
+        summary = summarize_tree(graph, 10, 8)
+        self.assertEqual(len(summary["nodes"]), 10)
+        more = summary["nodes"][-1]
+        self.assertEqual((more["id"], more["more"]), ("0+8", 43))
+        self.assertIn({"source": "0", "target": "0+8"}, summary["edges"])
+        # Every expand of a ``more`` node shows further children of the module.
+        shown = {edge["target"] for edge in summary["edges"] if edge["source"] == "0"}
+        while more is not None:
+            page = summarize_tree(graph, 10, 8, root=more["id"])
+            self.assertLessEqual(len(page["nodes"]), 10)
+            targets = {edge["target"] for edge in page["edges"] if edge["source"] == "0"}
+            self.assertTrue(targets - shown)
+            shown |= targets
+            more = next((node for node in page["nodes"] if node["id"].startswith("0+")), None)
+        module_children = {edge["target"] for edge in graph["edges"] if edge["source"] == "0"}
+        self.assertEqual({target for target in shown if "+" not in target}, module_children)
+        self.assertIsNone(summarize_tree(graph, 10, 8, root="0+999"))
+
+    def test_graphs_are_clustered_by_unit(self):
+        tree = ast.parse(_large_python_source(20))
+        cfg = summarize(python_frontend.build_cfg(tree), 'cfg', tree, 'python', 30, 8)
+        self.assertEqual(len(cfg["nodes"]), 21)
+        self.assertIn({"id": "func_3", "label": "func_3 (5 nodes)", "collapsed": 5}, cfg["nodes"])
+        ddg = summarize(python_frontend.build_ddg(tree), 'ddg', tree, 'python', 30, 8)
+        self.assertEqual({node["id"] for node in ddg["nodes"]}, {f"func_{i}" for i in range(20)} | {"<module>"})
+        # Each function is defined in the module and calls itself.
+        self.assertIn({"source": "<module>", "target": "func_3", "count": 1}, ddg["edges"])
+
+        # Units that do not fit are left in a cluster of the rest.
+        cfg = summarize(python_frontend.build_cfg(tree), 'cfg', tree, 'python', 10, 8)
+        self.assertEqual([node["id"] for node in cfg["nodes"]],
+                         ["<module>"] + [f"func_{i}" for i in range(8)] + ["<module>.*+8"])
+        self.assertEqual(cfg["nodes"][-1]["label"], "\u2026 12 more in <module> (60 nodes)")
+
+    def test_classes_are_clustered_before_their_methods(self):
+        tree = _parse_java(_large_java_source(5, 3))
+        cfg = summarize(java_frontend.build_cfg(tree), 'cfg', tree, 'java', 10, 8)
+        # Classes are opened breadth first while their methods fit.
+        self.assertEqual([node["id"] for node in cfg["nodes"]], [
+            "Shape0.area0", "Shape0.area1", "Shape0.area2", "Shape1.area0", "Shape1.area1", "Shape1.area2",
+            "Shape2.area0", "Shape2.*+1", "Shape3.*", "Shape4.*",
+        ])
+        part = expand(java_frontend.build_cfg(tree), 'cfg', 'Shape2.*', tree, 'java', 10, 8)
+        self.assertEqual({node["id"] for node in part["nodes"]}, {"Shape2.area0", "Shape2.area1", "Shape2.area2"})
+        self.assertIsNone(expand(java_frontend.build_cfg(tree), 'cfg', 'Nope.*', tree, 'java', 10, 8))
+
+    def test_summaries_fit_budget_on_large_input(self):
+        inputs = (('python', python_frontend, _large_python_source(600)),
+                  ('java', java_frontend, _large_java_source(150, 2)))
+        for language, frontend, code in inputs:
+            tree = frontend.parse(code)
+            for name, builder in frontend.BUILDERS.items():
+                graph = builder(tree)
+                with self.subTest(language=language, graph=name):
+                    summary = summarize(graph, name, tree, language, 100, 8)
+                    self.assertLessEqual(len(summary["nodes"]), 100)
+                    collapsed = [node for node in summary["nodes"] if node.get("collapsed")]
+                    part = expand(graph, name, collapsed[-1]["id"], tree, language, 100, 8)
+                    self.assertLessEqual(len(part["nodes"]), 100)
+                    self.assertNotEqual([node["id"] for node in part["nodes"]], [collapsed[-1]["id"]])
+
+    def test_expand_returns_the_collapsed_part(self):
+        code = _large_python_source(20)
+        response = self.client.post('/visualize/', {'code': code, 'graphs': 'ast,cfg', 'summary': '10'}).json()
+        collapsed = next(node for node in response["ast"]["nodes"] if node.get("collapsed"))
+        part = self.client.post('/visualize/expand/', {
+            'token': response["token"], 'summary': '10', 'graph': 'ast', 'node': collapsed["id"],
+        }).json()
+        self.assertEqual(part["nodes"][0]["id"], collapsed["id"])
+        self.assertLessEqual(len(part["nodes"]), 10)
+
+        cluster = self.client.post('/visualize/expand/', {
+            'token': response["token"], 'graph': 'cfg', 'node': 'func_3',
+        }).json()
+        self.assertTrue(all(node["id"].startswith("func_3/") for node in cluster["nodes"]))
+        self.assertTrue(any(node["label"].startswith("Entry:") for node in cluster["nodes"]))
+
+        missing = self.client.post('/visualize/expand/', {'token': response["token"], 'graph': 'cfg', 'node': 'nope'})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_invalid_summary_count(self):
+        for value in ('x', '\u00b2', '-5'):
+            response = self.client.post('/visualize/', {'code': 'x = 1', 'summary': value})
+            self.assertEqual(response.status_code, 400)
+
+    def test_summary_cannot_be_streamed(self):
+        response = self.client.post('/visualize/', {'code': 'x = 1', 'summary': '1', 'format': 'ndjson'})
+        self.assertEqual(response.status_code, 400)
+
+
+def _unfolded_size(graph):
+    """Return the number of nodes of the tree a graph with shared subtrees stands for."""
+    edges = {}
+    for edge in graph["edges"]:
+        source, target = edge["source"], edge["target"]
+        if edge.get("relationship") in ('implements', 'extends'):
+            source, target = target, source
+        edges.setdefault(source, []).append((target, edge.get("count", 1)))
+    targets = {target for children in edges.values() for target, _ in children}
+    def size(node_id):
+        return 1 + sum(count * size(target) for target, count in edges.get(node_id, ()))
+    return sum(size(node["id"]) for node in graph["nodes"] if node["id"] not in targets)
+
+
+JAVA_BEAN = "class Bean {\n" + "".join(
+    f"  private int f{i};\n  public int getF{i}() {{ return this.value; }}\n"
+    f"  public void setF{i}(int v) {{ this.value = v; }}\n" for i in range(20)
+) + "}\n"
+
+
+class SharingTests(TestCase):
+    def test_repeated_subtrees_are_stored_once(self):
+        graph = python_frontend.build_ast(ast.parse("x = [1, 2, 3]\ny = [1, 2, 3]\nz = [1, 2]\n"))
+        shared, stats = share_subtrees(graph)
+        lists = [node for node in shared["nodes"] if node["label"] == "List"]
+        self.assertEqual([(node["count"], node["size"]) for node in lists if "count" in node], [(2, 5)])
+        self.assertEqual(len(lists), 2)
+        # Both assignments link to the one kept copy.
+        self.assertEqual(len([edge for edge in shared["edges"] if edge["target"] == lists[0]["id"]]), 2)
+        self.assertEqual(stats["nodes"], len(graph["nodes"]))
+        self.assertEqual(stats["shared_nodes"], len(graph["nodes"]) - 4)
+        self.assertEqual(stats["ratio"], round(stats["nodes"] / stats["shared_nodes"], 2))
+
+    def test_boilerplate_unfolds_to_the_same_tree(self):
+        graph = java_frontend.build_ast(parse_java(JAVA_BEAN))
+        shared, stats = share_subtrees(graph)
+        self.assertGreater(stats["ratio"], 1.5)
+        self.assertEqual(_unfolded_size(shared), len(graph["nodes"]))
+        self.assertEqual({node["label"] for node in shared["nodes"]}, {node["label"] for node in graph["nodes"]})
+        unshared, stats = share_subtrees(graph, min_size=len(graph["nodes"]))
+        self.assertEqual(unshared["nodes"], graph["nodes"])
+        self.assertEqual(stats["ratio"], 1.0)
+
+    def test_endpoint(self):
+        response = self.client.post('/visualize/ast/', {'code': JAVA_BEAN, 'language': 'java', 'share': '1'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["sharing"]["shared_nodes"], len(data["ast"]["nodes"]))
+        self.assertTrue(any(node.get("count", 0) > 1 for node in data["ast"]["nodes"]))
+        compact = self.client.post('/visualize/ast/', {'code': JAVA_BEAN, 'language': 'java', 'share': '1',
+                                                        'format': 'compact'}).json()
+        self.assertEqual(len(compact["ast"]["nodes"]), len(data["ast"]["nodes"]))
+        self.assertNotIn("sharing", self.client.post('/visualize/ast/', {'code': JAVA_BEAN, 'language': 'java'}).json())
+        for fields in ({'share': 'x'}, {'share': '1', 'summary': '1'}):
+            response = self.client.post('/visualize/ast/', {'code': 'x = 1', **fields})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/visualize/ast/', {'code': 'x = 1', 'share': '1'},
+                                    HTTP_ACCEPT=NDJSON_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 400)
+
+    def test_layout(self):
+        with mock.patch('code_visualizer.views.apply_layout') as layout:
+            response = self.client.post('/visualize/ast/', {'code': 'x = [1, 2]', 'share': '1', 'layout': '1'})
+        self.assertEqual(response.status_code, 200)
+        layout.assert_called_once_with(mock.ANY, 'ast')
+        self.assertIn("sharing", response.json())
+
+
+class LayoutTests(TestCase):
+    graph = {
+        "nodes": [{"id": "a", "label": "A"}, {"id": "b", "label": "B"}],
+        "edges": [{"source": "a", "target": "b"}],
+    }
+    json0 = json.dumps({
+        "bb": "0,0,100,200",
+        "objects": [{"name": "0", "pos": "50,180"}, {"name": "1", "pos": "50,20"}],
+    }).encode()
+
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_positions_are_flipped_to_top_left_origin(self):
+        with mock.patch.object(graphviz.Digraph, 'pipe', return_value=self.json0) as pipe:
+            self.assertEqual(compute_layout(self.graph, 'dot'), [(50.0, 20.0), (50.0, 180.0)])
+        pipe.assert_called_once_with(format='json0')
+
+    def test_missing_graphviz_leaves_graph_unpositioned(self):
+        graph = json.loads(json.dumps(self.graph))
+        with mock.patch.object(graphviz.Digraph, 'pipe', side_effect=graphviz.ExecutableNotFound(['sfdp'])):
+            apply_layout(graph, 'ddg')
+        self.assertIn('layout_error', graph)
+        self.assertNotIn('x', graph["nodes"][0])
+
+    def test_layout_request_is_cached_separately(self):
+        data = {'code': 'x = 1', 'language': 'python', 'graphs': 'ast'}
+        plain = self.client.post('/visualize/', data).json()
+        with mock.patch('code_visualizer.views.apply_layout') as layout:
+            response = self.client.post('/visualize/', dict(data, layout='1'))
+        layout.assert_called_once()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotIn('x', plain['ast']['nodes'][0])
+
+    @skipUnless(shutil.which('dot'), "Graphviz is not installed")
+    def test_dot_layout(self):
+        graph = apply_layout(python_frontend.build_ast(ast.parse("x = 1")), 'ast')
+        self.assertTrue(all('x' in node and 'y' in node for node in graph["nodes"]))
+
+
+class CompactGraphTests(TestCase):
+    def test_labels_are_interned(self):
+        graph = CompactGraph()
+        graph.add_node('a', 'Name')
+        graph.add_node('b', 'Name')
+        self.assertEqual(graph.strings, ['Name'])
+        self.assertEqual(list(graph.node_labels), [0, 0])
+
+    def test_readding_updates_label_and_attribute(self):
+        graph = CompactGraph()
+        a = graph.add_node('a', 'Interface: a')
+        b = graph.add_node('b', 'b')
+        self.assertEqual(graph.add_node('a', 'Class: a'), a)
+        graph.add_edge(a, b, 'extends')
+        graph.add_edge(a, b, 'implements')
+        self.assertEqual(graph.to_dict(edge_attr='relationship'), {
+            "nodes": [{"id": "a", "label": "Class: a"}, {"id": "b", "label": "b"}],
+            "edges": [{"source": "a", "target": "b", "relationship": "implements"}],
+        })
+
+    def test_remove_isolated_keeps_order(self):
+        graph = CompactGraph()
+        for key in 'abcd':
+            graph.add_node(key, key.upper())
+        graph.add_edge(graph.index['d'], graph.index['a'], 'calls')
+        graph.add_edge(graph.index['a'], graph.index['c'], 'calls')
+        graph.remove_isolated()
+        self.assertEqual(graph.to_dict(edge_attr='label'), {
+            "nodes": [{"id": "a", "label": "A"}, {"id": "c", "label": "C"}, {"id": "d", "label": "D"}],
+            "edges": [{"source": "a", "target": "c", "label": "calls"},
+                      {"source": "d", "target": "a", "label": "calls"}],
+        })
+
+    def test_to_networkx(self):
+        tree = ast.parse(_large_python_source(3))
+        graph = build_python_ast_graph(tree)
+        nx_graph = graph.to_networkx()
+        self.assertEqual(nx_graph.number_of_nodes(), len(graph))
+        self.assertEqual(_reference_python_ast(tree), {
+            "nodes": [{"id": n, "label": nx_graph.nodes[n]["label"]} for n in nx_graph.nodes],
+            "edges": [{"source": u, "target": v} for u, v in nx_graph.edges],
+        })
+
+
+def _decode_compact(graph):
+    """Python mirror of decodeCompactGraph in upload.html."""
+    labels = graph["labels"]
+    nodes = [{"id": str(i), "label": labels[label]} for i, label in enumerate(graph["nodes"])]
+    for name, column in graph.get("node_attrs", {}).items():
+        for node, value in zip(nodes, column):
+            if value is not None:
+                node[name] = value
+    edges = [{"source": str(s), "target": str(t)} for s, t in zip(graph["source"], graph["target"])]
+    for name, column in graph.get("edge_attrs", {}).items():
+        for edge, value in zip(edges, column):
+            if value >= 0:
+                edge[name] = labels[value]
+    for name, column in graph.get("edge_values", {}).items():
+        for edge, value in zip(edges, column):
+            if value is not None:
+                edge[name] = value
+    return {"nodes": nodes, "edges": edges}
+
+
+def _renumber(graph):
+    """Replace node ids by their positions, as the compact format does.
+
+    Like node attributes, edge attributes set to None are left out.
+    """
+    index = {node["id"]: str(i) for i, node in enumerate(graph["nodes"])}
+    edges = [{name: value for name, value in edge.items() if value is not None} for edge in graph["edges"]]
+    return {
+        "nodes": [dict(node, id=index[node["id"]]) for node in graph["nodes"]],
+        "edges": [dict(edge, source=index[edge["source"]], target=index[edge["target"]]) for edge in edges],
+    }
+
+
+class CompactFormatTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_round_trip(self):
+        tree = _parse_java(_large_java_source(2, 2))
+        graph = java_frontend.build_ast(tree)
+        graph["nodes"][0]["x"] = 1.5
+        encoded = compact_graph(graph)
+        strings = {node["label"] for node in graph["nodes"]} | {edge["relationship"] for edge in graph["edges"]}
+        self.assertEqual(sorted(encoded["labels"]), sorted(strings))
+        self.assertEqual(_decode_compact(encoded), _renumber(graph))
+
+    def test_non_string_edge_attributes(self):
+        graph, _ = share_subtrees(python_frontend.build_ast(ast.parse("x = [1, 1]")), min_size=1)
+        encoded = compact_graph(graph)
+        self.assertTrue(all(isinstance(label, str) for label in encoded["labels"]))
+        self.assertIn("count", encoded["edge_values"])
+        self.assertNotIn("edge_attrs", encoded)
+        self.assertEqual(_decode_compact(encoded), _renumber(graph))
+
+    def test_verbose_is_default(self):
+        response = self.client.post('/visualize/ast/', {'code': 'x = 1', 'language': 'python'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('nodes', response.json()['ast'])
+
+    def test_format_parameter(self):
+        response = self.client.post('/visualize/', {'code': 'x = 1', 'language': 'python', 'format': 'compact'})
+        self.assertEqual(response['Content-Type'], COMPACT_MEDIA_TYPE)
+        data = json.loads(response.content)
+        self.assertEqual(data["format"], "compact")
+        verbose = self.client.post('/visualize/', {'code': 'x = 1', 'language': 'python'}).json()
+        for name in ('ast', 'cfg', 'ddg'):
+            self.assertEqual(_decode_compact(data[name]), _renumber(verbose[name]))
+
+    def test_accept_header_and_gzip(self):
+        response = self.client.post(
+            '/visualize/cfg/', {'code': 'x = 1', 'language': 'python'},
+            HTTP_ACCEPT=COMPACT_MEDIA_TYPE, HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(data["format"], "compact")
+        self.assertIn('token', data)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+
+class BatchTests(TestCase):
+    files = [
+        ('pkg/a.py', b"def f():\n    return 1\n"),
+        ('pkg/B.java', b"class B { void m() { n(); } void n() {} }"),
+        ('pkg/broken.py', b"def (:\n"),
+    ]
+
+    def _zip(self, files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, source in files:
+                archive.writestr(name, source)
+            archive.writestr('README.md', 'ignored')
+        return SimpleUploadedFile('project.zip', buffer.getvalue(), content_type='application/zip')
+
+    def test_process_pool_matches_inline(self):
+        pooled = analyze_files(self.files, ('ast', 'cfg'), workers=2)
+        inline = analyze_files(self.files, ('ast', 'cfg'), workers=1)
+        # Node ids are deterministic, so results match across processes.
+        self.assertEqual(pooled, inline)
+        self.assertEqual([f["file"] for f in pooled["files"]], ['pkg/a.py', 'pkg/B.java', 'pkg/broken.py'])
+
+    def test_zip_upload_reports_per_file_errors(self):
+        response = self.client.post('/visualize/batch/', {'archive': self._zip(self.files), 'graphs': 'cfg'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["summary"]["files"], 3)
+        self.assertEqual(data["summary"]["failed"], 1)
+        self.assertEqual(data["summary"]["languages"], {"python": 1, "java": 1})
+        self.assertIn("Syntax error", data["files"][2]["error"])
+        self.assertEqual(set(data["files"][0]["graphs"]), {"cfg"})
+
+    def test_multipart_files(self):
+        uploads = [SimpleUploadedFile(name.split('/')[-1], source) for name, source in self.files[:2]]
+        response = self.client.post('/visualize/batch/', {'files': uploads})
+        self.assertEqual(response.json()["summary"]["analyzed"], 2)
+
+    @override_settings(CODE_VISUALIZER_BATCH={'MAX_FILES': 2})
+    def test_file_limit(self):
+        response = self.client.post('/visualize/batch/', {'archive': self._zip(self.files)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in self.files:
+                path = os.path.join(directory, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(source)
+            output = os.path.join(directory, 'out.json')
+            call_command('visualize_batch', directory, '--workers', '1', '--output', output,
+                         '--summary-only', stderr=io.StringIO())
+            with open(output) as f:
+                summary = json.load(f)
+        self.assertEqual(summary["files"], 3)
+        self.assertEqual(summary["failed"], 1)
+
+    def test_management_command_reuses_saved_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in self.files:
+                path = os.path.join(directory, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(source)
+            output = os.path.join(directory, 'out.json')
+            index = os.path.join(directory, 'index.pickle')
+            call_command('visualize_batch', directory, '--workers', '1', '--output', output, '--index', index,
+                         stderr=io.StringIO())
+            with mock.patch('code_visualizer.batch.file_symbols_for') as extract:
+                call_command('visualize_batch', directory, '--workers', '1', '--output', output, '--index', index,
+                             stderr=io.StringIO())
+            extract.assert_not_called()
+            with open(output) as f:
+                result = json.load(f)
+        # The same default graphs as the batch view.
+        analyzed = [entry for entry in result["files"] if "graphs" in entry]
+        self.assertTrue(all(tuple(entry["graphs"]) == views.DEFAULT_GRAPHS for entry in analyzed))
+
+
+class SymbolIndexTests(TestCase):
+    def _index(self, files):
+        index = SymbolIndex()
+        symbols = []
+        for path, code in files:
+            language = 'java' if path.endswith('.java') else 'python'
+            tree = get_frontend(language).parse(code)
+            symbols.append(file_symbols_for(tree, language, path))
+            index.update(symbols[-1], code_digest(code))
+        return index, symbols
+
+    def _edges(self, index, symbols):
+        data = build_call_graph(index, symbols).to_dict()
+        return {(edge["source"], edge["target"]) for edge in data["edges"]}
+
+    def test_python_forward_reference_and_methods(self):
+        code = "def f():\n    g()\nclass C:\n    def m(self):\n        self.n()\n    def n(self):\n        f()\ndef g():\n    C()\n"
+        index, symbols = self._index([('', code)])
+        self.assertEqual(self._edges(index, symbols), {("f", "g"), ("C.m", "C.n"), ("C.n", "f")})
+
+    def test_python_cross_file_imports(self):
+        index, symbols = self._index([
+            ('pkg/a.py', "def helper():\n    pass\n"),
+            ('pkg/b.py', "from pkg.a import helper\nfrom . import a\ndef run():\n    helper()\n    a.helper()\n"),
+        ])
+        self.assertEqual(self._edges(index, symbols), {("pkg.b.run", "pkg.a.helper")})
+
+    def test_java_qualifier_types_and_inheritance(self):
+        index, symbols = self._index([
+            ('Z.java', "package p; public class Z { void q() {} }"),
+            ('B.java', "package p; class Base { void shared() {} }"),
+            ('A.java', "package p; class A extends Base { Z z; void m() { z.q(); shared(); } }"),
+        ])
+        edges = self._edges(index, symbols)
+        self.assertIn(("p.A.m", "p.Z.q"), edges)
+        self.assertIn(("p.A.m", "p.Base.shared"), edges)
+        self.assertIn(("p.A", "p.Base"), edges)
+
+    def test_incremental_update(self):
+        index, symbols = self._index([('a.py', "def f():\n    pass\n"), ('b.py', "from a import f\ndef g():\n    f()\n")])
+        self.assertFalse(index.update(symbols[0], code_digest("def f():\n    pass\n")))
+        replaced = file_symbols_for(ast.parse("def h():\n    pass\n"), 'python', 'a.py')
+        self.assertTrue(index.update(replaced, code_digest("def h():\n    pass\n")))
+        self.assertNotIn("a.f", index)
+        self.assertIn("a.h", index)
+        self.assertEqual(self._edges(index, [replaced, symbols[1]]), set())
+        index.remove('a.py')
+        self.assertNotIn("a.h", index)
+
+    def test_project_index_is_kept_up_to_date(self):
+        files = [
+            ('pkg/a.py', b"def helper():\n    pass\n"),
+            ('pkg/b.py', b"from pkg.a import helper\ndef run():\n    helper()\n"),
+            ('pkg/c.py', b"def other():\n    pass\n"),
+        ]
+        analyze_files(files, ('ast',), workers=1, project='demo')
+        changed = [files[0], (files[1][0], b"from pkg.a import helper\ndef run2():\n    helper()\n")]
+        with mock.patch('code_visualizer.batch.file_symbols_for', wraps=file_symbols_for) as extract:
+            result = analyze_files(changed, ('ast',), workers=1, project='demo')
+        self.assertEqual([call.args[2] for call in extract.call_args_list], ['pkg/b.py'])
+        edges = {(edge["source"], edge["target"]) for edge in result["call_graph"]["edges"]}
+        self.assertEqual(edges, {("pkg.b.run2", "pkg.a.helper")})
+        index, _ = project_index('demo')
+        self.assertEqual(set(index.files), {'pkg/a.py', 'pkg/b.py'})
+        self.assertNotIn("pkg.c.other", index)
+
+    def test_batch_includes_project_call_graph(self):
+        result = analyze_files([
+            ('pkg/a.py', b"def helper():\n    pass\n"),
+            ('pkg/b.py', b"from pkg.a import helper\ndef run():\n    helper()\n"),
+        ], ('ast',), workers=1)
+        edges = {(edge["source"], edge["target"]) for edge in result["call_graph"]["edges"]}
+        self.assertEqual(edges, {("pkg.b.run", "pkg.a.helper")})
+        self.assertNotIn("symbols", result["files"][0])
+
+
+class StreamingTests(TestCase):
+    def _stream(self, data, **extra):
+        response = self.client.post('/visualize/', data, **extra)
+        self.assertEqual(response['Content-Type'], NDJSON_MEDIA_TYPE)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def _assemble(self, lines, graph):
+        nodes, edges = [], []
+        for line in lines:
+            if line.get("graph") == graph:
+                seen = {node["id"] for node in nodes}
+                for edge in line.get("edges", ()):
+                    # Endpoints always arrive before the edge.
+                    self.assertIn(edge["source"], seen)
+                    self.assertIn(edge["target"], seen)
+                nodes.extend(line.get("nodes", ()))
+                edges.extend(line.get("edges", ()))
+        return {"nodes": nodes, "edges": edges}
+
+    def test_stream_matches_json(self):
+        for language, code in (('python', _large_python_source(60)), ('java', _large_java_source(3, 5))):
+            expected = self.client.post('/visualize/', {'code': code, 'language': language}).json()
+            lines = self._stream({'code': code, 'language': language, 'format': 'ndjson'})
+            self.assertEqual(lines[0]["graphs"], list(views.DEFAULT_GRAPHS))
+            self.assertEqual(lines[-1], {"done": True})
+            for graph in views.DEFAULT_GRAPHS:
+                streamed = self._assemble(lines, graph)
+                self.assertEqual(streamed["nodes"], expected[graph]["nodes"])
+                key = lambda edge: (edge["source"], edge["target"])
+                self.assertEqual(sorted(streamed["edges"], key=key), sorted(expected[graph]["edges"], key=key))
+
+    def test_accept_header_and_token(self):
+        lines = self._stream({'code': 'x = 1', 'graphs': 'ast'}, HTTP_ACCEPT=NDJSON_MEDIA_TYPE)
+        self.assertEqual(lines[0]["graphs"], ["ast"])
+        self.assertTrue(lines[0]["token"].startswith("python:"))
+
+    def test_chunks_flush_nodes_before_edges(self):
+        records = [(NODE, 1, 'a'), (NODE, 2, 'b'), (EDGE, 1, 2, None), (NODE, 3, 'c'), (EDGE, 2, 3, 'x')]
+        chunks = list(graph_chunks('ast', records, 'label', chunk_size=2))
+        self.assertEqual(chunks, [
+            {"graph": "ast", "nodes": [{"id": "1", "label": "a"}, {"id": "2", "label": "b"}]},
+            {"graph": "ast", "nodes": [{"id": "3", "label": "c"}]},
+            {"graph": "ast", "edges": [{"source": "1", "target": "2", "label": None},
+                                       {"source": "2", "target": "3", "label": "x"}]},
+        ])
+
+    @override_settings(CODE_VISUALIZER_LIMITS={'MAX_NODES': 50})
+    def test_limit_reported_in_stream(self):
+        lines = self._stream({'code': _large_python_source(20), 'format': 'ndjson'})
+        self.assertIn("too large", lines[-1]["error"])
+
+    def test_layout_rejected(self):
+        response = self.client.post('/visualize/', {'code': 'x = 1', 'format': 'ndjson', 'layout': '1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncEndpointTests(TestCase):
+    async def test_matches_sync_endpoint(self):
+        data = {'code': _large_python_source(20), 'graphs': 'cfg,ddg'}
+        response = await self.async_client.post('/visualize/async/', data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        expected = await asyncio.to_thread(lambda: self.client.post('/visualize/', data))
+        self.assertEqual(expected['X-Cache'], 'HIT')
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_single_graph_and_errors(self):
+        response = await self.async_client.post('/visualize/async/ast/', {'code': 'x = 1'})
+        self.assertEqual(set(response.json()), {"ast", "token"})
+        response = await self.async_client.post('/visualize/async/nope/', {'code': 'x = 1'})
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post('/visualize/async/', {'code': 'def (:'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CODE_VISUALIZER_WORKERS={'KIND': 'process', 'WORKERS': 1})
+    async def test_process_pool_tokens_and_spans(self):
+        get_registry().clear()
+        first = await self.async_client.post('/visualize/async/ast/', {'code': 'x = 1\ny = x'})
+        self.assertEqual(first.status_code, 200)
+        response = await self.async_client.post('/visualize/async/cfg/', {'token': first.json()["token"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["cfg"], python_frontend.build_cfg(ast.parse('x = 1\ny = x')))
+        for stage in ('parse', 'ast', 'cfg'):
+            self.assertEqual(get_registry().get(STAGE_SECONDS, stage=stage, language='python').count, 1)
+
+    async def test_busy_pool_returns_503(self):
+        pool = AnalysisPool(workers=1, max_queue=0)
+        pool.pending = 1
+        with mock.patch.object(views, 'get_analysis_pool', return_value=pool):
+            response = await self.async_client.post('/visualize/async/', {'code': 'y = 2'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(CODE_VISUALIZER_WORKERS={'TIMEOUT': 0.01})
+    async def test_timeout_returns_504(self):
+        release = threading.Event()
+        original = views._analyze
+
+        def slow(options):
+            release.wait(5)
+            return original(options)
+
+        with mock.patch.object(views, '_analyze', slow):
+            response = await self.async_client.post('/visualize/async/', {'code': 'z = 3'})
+        release.set()
+        self.assertEqual(response.status_code, 504)
+
+
+class AnalysisPoolTests(TestCase):
+    async def test_queue_limit_and_cancellation(self):
+        pool = AnalysisPool(workers=1, max_queue=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(pool.run(release.wait, 5))
+        queued = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(PoolBusy):
+            await pool.run(release.wait, 5)
+        # A cancelled caller (e.g. a disconnected client) frees its queue slot.
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        self.assertEqual(pool.pending, 1)
+        release.set()
+        self.assertTrue(await running)
+        self.assertEqual(pool.pending, 0)
+        pool.shutdown()
+
+
+@override_settings(CODE_VISUALIZER_JOBS={'WORKERS': 0, 'PROGRESS_INTERVAL': 0})
+class JobTests(TestCase):
+    def _submit(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/jobs/', data)
+
+    def test_submit_poll_and_fetch(self):
+        code = _large_python_source(30)
+        response = self._submit({'code': code, 'graphs': 'ast,ddg'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "queued")
+        status = self.client.get(response['Location']).json()
+        self.assertEqual(status["status"], "done")
+        self.assertGreater(status["progress"], 0)
+        result = self.client.get(status["result"]).json()
+        expected = self.client.post('/visualize/', {'code': code}).json()
+        self.assertEqual(set(result), {"ast", "ddg"})
+        self.assertEqual(len(result["ast"]["nodes"]), len(expected["ast"]["nodes"]))
+        self.assertEqual(len(result["ddg"]["edges"]), len(expected["ddg"]["edges"]))
+
+    def test_reuse_by_content_hash(self):
+        first = self._submit({'code': 'x = 1', 'language': 'python'})
+        second = self._submit({'code': 'x = 1', 'language': 'python'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json()["id"], second.json()["id"])
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+        other = self._submit({'code': 'x = 1', 'graphs': 'cfg'})
+        self.assertNotEqual(other.json()["id"], first.json()["id"])
+        # Jobs built by older builders are not reused.
+        AnalysisJob.objects.update(analysis_version=ANALYSIS_VERSION - 1)
+        rebuilt = self._submit({'code': 'x = 1', 'language': 'python'})
+        self.assertEqual(rebuilt.status_code, 202)
+        self.assertNotEqual(rebuilt.json()["id"], first.json()["id"])
+
+    @override_settings(CODE_VISUALIZER_JOBS={'WORKERS': 0})
+    def test_inline_job_is_reported_done(self):
+        # Outside a transaction on_commit runs the job before submit_job returns.
+        with mock.patch('code_visualizer.jobs.transaction.on_commit', side_effect=lambda callback: callback()):
+            response = self.client.post('/jobs/', {'code': 'x = 1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "done")
+
+    def test_failed_job(self):
+        response = self._submit({'code': 'class {', 'language': 'java'})
+        job_url = response['Location']
+        self.assertEqual(self.client.get(job_url).json()["status"], "failed")
+        result = self.client.get(job_url + 'result/')
+        self.assertEqual(result.status_code, 422)
+        self.assertIn("java", result.json()["error"])
+
+    def test_pending_job_and_claiming(self):
+        with mock.patch('code_visualizer.jobs.dispatch'):
+            response = self._submit({'code': 'y = 2'})
+        job_id = response.json()["id"]
+        self.assertEqual(self.client.get(f'/jobs/{job_id}/result/').status_code, 409)
+        self.assertTrue(run_job(job_id))
+        # A job is only ever run by the worker that claimed it.
+        self.assertFalse(run_job(job_id))
+        self.assertEqual(self.client.get(f'/jobs/{job_id}/result/').status_code, 200)
+
+    def test_abandoned_jobs_are_replaced(self):
+        with mock.patch('code_visualizer.jobs.dispatch') as dispatch:
+            first = self._submit({'code': 'z = 3'}).json()
+            # Resubmitting a queued job dispatches it again.
+            self._submit({'code': 'z = 3'})
+            self.assertEqual(dispatch.call_count, 2)
+        AnalysisJob.objects.filter(pk=first["id"]).update(
+            status=AnalysisJob.RUNNING, started=timezone.now() - timedelta(hours=1))
+        second = self._submit({'code': 'z = 3'}).json()
+        self.assertNotEqual(second["id"], first["id"])
+        self.assertEqual(second["status"], "queued")
+        self.assertEqual(self.client.get(f'/jobs/{first["id"]}/').json()["status"], "failed")
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get('/jobs/00000000-0000-0000-0000-000000000000/').status_code, 404)
+
+    def test_progress_callback(self):
+        counts = []
+        with report_progress(counts.append):
+            nodes = sum(1 for _ in walk(ast.parse(_large_python_source(30)), ast.iter_child_nodes))
+        self.assertEqual(sum(counts), nodes)
+
+
+INCREMENTAL_PYTHON = """import os
+X = 1
+
+@decorate
+def f(a):
+    y = a + X
+    return g(y)
+
+def g(b):
+    return b
+
+class C(Base):
+    z = 3
+    def m(self):
+        return f(self.z)
+    def n(self):
+        return self.m()
+
+print(f(2))
+"""
+
+INCREMENTAL_JAVA = """package shapes;
+import java.util.List;
+public class Area extends Base implements Shape {
+    private int width;
+    private Helper helper;
+    public Area() { width = 1; }
+    public int get(int height) { return width * height; }
+    public void run() { get(2); helper.go(); }
+}
+interface Shape { void run(); }
+class Helper { void go() {} }
+"""
+
+
+class IncrementalTests(TestCase):
+    EDITS = {
+        'python': (INCREMENTAL_PYTHON, INCREMENTAL_PYTHON
+                   .replace("return b\n", "return b * 2\n")
+                   .replace("        return self.m()", "        q = 1\n        return g(q)")),
+        'java': (INCREMENTAL_JAVA, INCREMENTAL_JAVA.replace("{ get(2); helper.go(); }", "{ int w = get(width); }")),
+    }
+
+    def _apply(self, graph, delta):
+        nodes = {node["id"]: node["label"] for node in graph["nodes"]}
+        edges = {(edge["source"], edge["target"]) for edge in graph["edges"]}
+        for node_id in delta["removed_nodes"]:
+            del nodes[node_id]
+        nodes.update((node["id"], node["label"]) for node in delta["added_nodes"])
+        edges.difference_update((edge["source"], edge["target"]) for edge in delta["removed_edges"])
+        edges.update((edge["source"], edge["target"]) for edge in delta["added_edges"])
+        return nodes, edges
+
+    def test_labels_match_full_build(self):
+        for language, (code, _) in self.EDITS.items():
+            state, _ = incremental.analyze(code, language)
+            graphs = incremental.graphs(state)
+            tree = get_frontend(language).parse(code)
+            for name, builder in get_frontend(language).builders.items():
+                expected = builder(tree)
+                self.assertCountEqual([node["label"] for node in graphs[name]["nodes"]],
+                                      [node["label"] for node in expected["nodes"]])
+                self.assertEqual(len(graphs[name]["edges"]), len(expected["edges"]))
+            # Control-flow units are named the same way in both builds.
+            self.assertCountEqual(graphs["cfg"]["nodes"], get_frontend(language).builders["cfg"](tree)["nodes"])
+
+    def test_delta_reproduces_full_build(self):
+        for language, (before, after) in self.EDITS.items():
+            base, _ = incremental.analyze(before, language)
+            state, regions = incremental.analyze(after, language, base)
+            self.assertEqual(len(regions["changed"]), 2 if language == 'python' else 1)
+            self.assertFalse(regions["added"] or regions["removed"])
+            affected = set(regions["changed"])
+            delta = incremental.diff(base, state, affected)
+            old, new = incremental.graphs(base), incremental.graphs(incremental.analyze(after, language)[0])
+            for name in views.GRAPH_TYPES:
+                nodes, edges = self._apply(old[name], delta[name])
+                self.assertEqual(nodes, {node["id"]: node["label"] for node in new[name]["nodes"]})
+                self.assertEqual(edges, {(edge["source"], edge["target"]) for edge in new[name]["edges"]})
+
+    def test_unchanged_regions_keep_ids(self):
+        code = INCREMENTAL_PYTHON
+        base, _ = incremental.analyze(code, 'python')
+        # Whitespace outside a definition does not change it.
+        state, regions = incremental.analyze("\n\n" + code.replace("return b", "return b + 1"), 'python', base)
+        self.assertEqual(regions["changed"], ["def:g"])
+        self.assertIs(state.regions["def:f"], base.regions["def:f"])
+        self.assertIn("class:C.def:m/0", state.regions["class:C.def:m"].ast_nodes)
+
+    def test_java_token_hash_ignores_formatting(self):
+        base, _ = incremental.analyze(INCREMENTAL_JAVA, 'java')
+        reformatted = INCREMENTAL_JAVA.replace("{ width = 1; }", "{\n        // set up\n        width = 1;\n    }")
+        _, regions = incremental.analyze(reformatted, 'java', base)
+        self.assertEqual(regions["changed"], [])
+        # Fields are part of every method's hash.
+        _, regions = incremental.analyze(INCREMENTAL_JAVA.replace("int width;", "long width;"), 'java', base)
+        self.assertIn("class:Area", regions["changed"])
+        self.assertIn("class:Area.method:get", regions["changed"])
+
+    def test_endpoint(self):
+        before, after = self.EDITS['python']
+        first = self.client.post('/visualize/incremental/', {'code': before}).json()
+        self.assertEqual(set(first), {"id", "ast", "cfg", "ddg", "calls"})
+        second = self.client.post('/visualize/incremental/', {'code': after, 'base': first["id"]}).json()
+        self.assertEqual(second["base"], first["id"])
+        self.assertEqual(second["regions"]["changed"], ["def:g", "class:C.def:n"])
+        self.assertEqual(set(second["delta"]), {"ast", "cfg", "ddg", "calls"})
+
+        get_incremental_store().clear()
+        expired = self.client.post('/visualize/incremental/', {'code': after, 'base': second["id"]}).json()
+        self.assertIn("ast", expired)
+        self.assertNotIn("delta", expired)
+
+    def test_endpoint_errors(self):
+        response = self.client.post('/visualize/incremental/', {'code': 'def f(:'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/visualize/incremental/', {'code': 'x = 1', 'language': 'cobol'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkTests(TestCase):
+    def test_command_writes_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command('benchmark', '--sizes', 'small', 'deep', '--repeat', '1', '--no-memory',
+                         '--output', path, stdout=io.StringIO(), stderr=io.StringIO())
+            with open(path) as f:
+                results = json.load(f)
+        self.assertEqual(set(results["inputs"]), {"python/small", "java/small", "python/deep", "java/deep"})
+        small = results["inputs"]["python/small"]
+        self.assertEqual(list(small["stages"]), ["parse", "ast", "cfg", "ddg", "calls", "json", "compact"])
+        self.assertGreater(small["graphs"]["ast"]["nodes"], 100)
+        self.assertNotIn("peak_bytes", small["stages"]["parse"])
+
+    def test_compare_flags_regressions(self):
+        stages = {"parse": {"median": 0.1, "min": 0.1}, "ast": {"median": 0.1, "min": 0.1}}
+        baseline = {"inputs": {"python/small": {"stages": stages, "graphs": {"ast": {"nodes": 5, "edges": 4}}}}}
+        current = json.loads(json.dumps(baseline))
+        current["inputs"]["python/small"]["stages"]["ast"]["median"] = 0.2
+        current["inputs"]["python/small"]["stages"]["parse"]["median"] = 0.11
+        self.assertEqual([(r["stage"], r["change"]) for r in compare_benchmarks(baseline, current)], [("ast", 1.0)])
+        current["inputs"]["python/small"]["graphs"]["ast"]["nodes"] = 6
+        self.assertEqual(len(compare_benchmarks(baseline, current)), 2)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+        get_java_cache().clear()
+        get_registry().clear()
+
+    def test_histograms_render_as_prometheus_text(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.observe('stage_seconds', 0.05, stage='parse')
+        registry.observe('stage_seconds', 0.5, stage='parse')
+        registry.observe('stage_seconds', 5.0, stage='parse')
+        lines = registry.render().splitlines()
+        self.assertEqual(lines[1], "# TYPE stage_seconds histogram")
+        self.assertEqual(lines[2:], [
+            'stage_seconds_bucket{stage="parse",le="0.1"} 1',
+            'stage_seconds_bucket{stage="parse",le="1.0"} 2',
+            'stage_seconds_bucket{stage="parse",le="+Inf"} 3',
+            'stage_seconds_sum{stage="parse"} 5.55',
+            'stage_seconds_count{stage="parse"} 3',
+        ])
+
+    @override_settings(CODE_VISUALIZER_METRICS={'SERVER_TIMING': True})
+    def test_stages_are_timed(self):
+        response = self.client.post('/visualize/', {'code': 'class A { }', 'language': 'java', 'graphs': 'ast'})
+        stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['tokenize', 'parse', 'ast', 'serialize', 'total'])
+        self.assertEqual(get_registry().get(STAGE_SECONDS, stage='ast', language='java').count, 1)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('code_visualizer_stage_seconds_count{language="java",stage="parse"} 1', body)
+        self.assertIn('method="POST",status="200",view="visualize_code"', body)
+        self.assertIn('code_visualizer_result_cache_requests_total{result="miss"} 1', body)
+
+    @override_settings(CODE_VISUALIZER_METRICS={'PROFILE_INTERVAL': 0.001})
+    def test_profile_is_only_for_staff(self):
+        data = {'code': _large_python_source(100), 'graphs': 'ast,ddg'}
+        response = self.client.post('/visualize/?profile=1', data)
+        self.assertIn('ast', response.json())
+
+        user = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(user)
+        get_result_cache().clear()
+        response = self.client.post('/visualize/?profile=1', data)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('_build_payload (views.py:', response.content.decode())
+
+        get_result_cache().clear()
+        response = self.client.post('/visualize/?profile=cprofile', data)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(response.content)
+            f.flush()
+            stats = pstats.Stats(f.name)
+        self.assertTrue(any(name == '_build_payload' for _, _, name in stats.stats))
+
+
+class JavaFrontendTests(TestCase):
+    BROKEN = (
+        "package demo;\nimport java.util.List;\n"
+        "class A { void f() { int x = 1; } }\n"
+        "class B { void g() { int = ; } }\n"
+        "class C { }\n"
+    )
+
+    def setUp(self):
+        get_java_cache().clear()
+
+    def test_trees_are_memoized(self):
+        code = _large_java_source(2, 2)
+        first = parse_java(code)
+        self.assertIs(parse_java(code), first)
+        self.assertEqual(get_java_cache().stats()["hits"], 1)
+
+    def test_disk_cache_survives_restarts(self):
+        code = _large_java_source(2, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CODE_VISUALIZER_CACHE={'JAVA_PARSE_DIR': directory}):
+                tree = parse_java(code)
+                restarted = JavaParseCache(directory=directory)
+                with mock.patch('code_visualizer.java_frontend.get_java_cache', return_value=restarted), \
+                        mock.patch.object(javalang.parser.Parser, 'parse') as parse:
+                    loaded = parse_java(code)
+                parse.assert_not_called()
+                self.assertEqual(restarted.stats()["disk_hits"], 1)
+                self.assertIsNot(loaded, tree)
+                self.assertEqual(java_frontend.build_ast(loaded), java_frontend.build_ast(tree))
+
+    def test_broken_type_does_not_fail_the_file(self):
+        tree = parse_java(self.BROKEN)
+        self.assertEqual([declaration.name for declaration in tree.types], ["A", "C"])
+        self.assertEqual(tree.package.name, "demo")
+        self.assertEqual([error["line"] for error in tree.errors], [4])
+
+        response = self.client.post('/visualize/', {'code': self.BROKEN, 'language': 'java'}).json()
+        self.assertEqual(response["parse_errors"], tree.errors)
+        labels = [node["label"] for node in response["ast"]["nodes"]]
+        self.assertIn("ClassDeclaration - C", labels)
+
+    def test_unrecoverable_file_raises(self):
+        with self.assertRaises(javalang.parser.JavaSyntaxError):
+            parse_java("class B { void g() { int = ; } }")
+
+
+class FrontendTests(TestCase):
+    def test_registry_maps_languages_and_extensions(self):
+        self.assertEqual(languages(), ('python', 'java'))
+        self.assertEqual(language_for('src/Main.JAVA'), 'java')
+        self.assertIsNone(language_for('notes.txt'))
+        with self.assertRaises(UnsupportedLanguage):
+            get_frontend('ruby')
+        self.assertEqual(views.generate_control_flow_graph('x = 1', 'ruby'), {"error": "Unsupported language"})
+
+    def test_registered_frontend_is_served(self):
+        with mock.patch.dict('code_visualizer.frontends._frontends'), \
+                mock.patch.dict('code_visualizer.frontends._extensions'):
+            register('python2', 'code_visualizer.python_frontend', ('.py2',))
+            self.assertEqual(language_for('old.py2'), 'python2')
+            response = self.client.post('/visualize/ast/', {'code': 'x = 1', 'language': 'python2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ast"], python_frontend.build_ast(ast.parse('x = 1')))
+
+    def test_python_requests_do_not_import_java(self):
+        imports = measure_imports(1, {name: IMPORT_SCENARIOS[name] for name in ('python', 'preload', 'export')})
+        self.assertEqual(imports["python"]["modules"], [])
+        self.assertEqual(imports["export"]["modules"], [])
+        self.assertIn('javalang.parser', imports["preload"]["modules"])
+        baseline = {"inputs": {}, "imports": {"python": {"median": 0.1, "modules": []}}}
+        current = {"inputs": {}, "imports": {"python": {"median": 0.1, "modules": ["javalang.parser"]}}}
+        self.assertEqual([r["stage"] for r in compare_benchmarks(baseline, current)], ["python"])
+
+
+class GraphStoreTests(TestCase):
+    code = "def f(x):\n    if x:\n        return g(x)\n    return 0\n\ndef g(y):\n    return y + 1\n"
+
+    def _store(self, graph='ast', code=None):
+        response = self.client.post('/graphs/', {'code': code or self.code, 'graph': graph})
+        return response, response['Location']
+
+    def test_store_and_reuse(self):
+        response, url = self._store()
+        self.assertEqual(response.status_code, 201)
+        expected = python_frontend.build_ast(ast.parse(self.code))
+        self.assertEqual(response.json()["nodes"], len(expected["nodes"]))
+        self.assertEqual(self.client.get(url).json()["edges"], len(expected["edges"]))
+        again, _ = self._store()
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["id"], response.json()["id"])
+        self.assertEqual(StoredGraph.objects.count(), 1)
+
+        # Paging through every node gives back the whole graph.
+        nodes, edges, offset = [], [], 0
+        while offset is not None:
+            page = self.client.get(f'{url}nodes/', {'offset': offset, 'limit': 4}).json()
+            self.assertLessEqual(len(page["nodes"]), 4)
+            nodes += page["nodes"]
+            edges += page["edges"]
+            offset = page["next"]
+        self.assertEqual(nodes, expected["nodes"])
+        self.assertLessEqual(len(edges), len(expected["edges"]))
+
+    def test_graphs_of_older_builders_are_rebuilt(self):
+        first, _ = self._store()
+        StoredGraph.objects.update(analysis_version=ANALYSIS_VERSION - 1)
+        again, _ = self._store()
+        self.assertEqual(again.status_code, 201)
+        self.assertNotEqual(again.json()["id"], first.json()["id"])
+
+    def test_children_and_units(self):
+        _, url = self._store()
+        page = self.client.get(f'{url}children/', {'node': '1', 'limit': 2}).json()
+        self.assertEqual([node["label"] for node in page["nodes"]], ["arguments", "If"])
+        self.assertEqual(page["next"], 2)
+        rest = self.client.get(f'{url}children/', {'node': '1', 'offset': 2}).json()
+        self.assertEqual([node["label"] for node in rest["nodes"]], ["Return"])
+        self.assertIsNone(rest["next"])
+
+        units = self.client.get(f'{url}units/').json()["units"]
+        self.assertEqual([unit["name"] for unit in units], ["<module>", "f", "g"])
+        in_g = self.client.get(f'{url}nodes/', {'unit': 'g'}).json()
+        self.assertIn("BinOp", [node["label"] for node in in_g["nodes"]])
+        self.assertNotIn("If", [node["label"] for node in in_g["nodes"]])
+        returns = self.client.get(f'{url}nodes/', {'label': 'Return'}).json()["nodes"]
+        self.assertEqual(len(returns), 3)
+
+    def test_neighborhood_and_path(self):
+        _, url = self._store()
+        around = self.client.get(f'{url}neighborhood/', {'node': '1', 'hops': 1}).json()
+        self.assertEqual({node["id"]: node["distance"] for node in around["nodes"]},
+                         {'1': 0, '0': 1, '2': 1, '4': 1, '11': 1})
+        self.assertEqual(len(around["edges"]), 4)
+        capped = self.client.get(f'{url}neighborhood/', {'node': '1', 'hops': 3, 'limit': 3}).json()
+        self.assertEqual(len(capped["nodes"]), 3)
+        self.assertTrue(capped["truncated"])
+
+        path = self.client.get(f'{url}path/', {'source': '0', 'target': '8'}).json()
+        self.assertEqual([node["label"] for node in path["nodes"]], ["Module", "FunctionDef", "If", "Return", "Call"])
+        self.assertEqual([(edge["source"], edge["target"]) for edge in path["edges"]],
+                         [('0', '1'), ('1', '4'), ('4', '7'), ('7', '8')])
+        self.assertEqual(self.client.get(f'{url}path/', {'source': '8', 'target': '0'}).json()["nodes"], [])
+        undirected = self.client.get(f'{url}path/', {'source': '8', 'target': '0', 'directed': '0'}).json()
+        self.assertEqual(len(undirected["nodes"]), 5)
+        # Across functions, up to the module and back down.
+        across = self.client.get(f'{url}path/', {'source': '4', 'target': '16', 'directed': '0'}).json()
+        self.assertEqual(across["nodes"][2]["label"], "Module")
+
+    def test_cfg_units(self):
+        _, url = self._store('cfg')
+        page = self.client.get(f'{url}nodes/', {'unit': 'f'}).json()
+        self.assertTrue(all(node["id"].startswith('f/') for node in page["nodes"]))
+        self.assertIn({"source": "f/entry", "target": "f/0"}, page["edges"])
+
+    def test_errors(self):
+        _, url = self._store()
+        self.assertEqual(self.client.post('/graphs/', {'code': 'x = 1', 'graph': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.post('/graphs/', {'code': 'def f(:', 'graph': 'ast'}).status_code, 400)
+        self.assertEqual(self.client.get(f'{url}bogus/').status_code, 404)
+        self.assertEqual(self.client.get(f'{url}children/').status_code, 400)
+        self.assertEqual(self.client.get(f'{url}children/', {'node': 'zz'}).status_code, 404)
+        for params in ({'limit': 'x'}, {'offset': '\u00b2'}, {'hops': '-1'}):
+            self.assertEqual(self.client.get(f'{url}nodes/', params).status_code, 400)
+        self.assertEqual(self.client.get('/graphs/00000000-0000-0000-0000-000000000000/nodes/').status_code, 404)
+        self.assertEqual(GraphNode.objects.count(), StoredGraph.objects.get().node_count)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(shutil.rmtree, self.output)
+        os.makedirs(os.path.join(self.root, 'pkg'))
+        self._write('pkg/mod.py', "def f(x):\n    if x:\n        return x\n    return 0\n")
+        self._write('Shape.java', "class Shape extends Base { int area() { return 1; } }")
+
+    def _write(self, path, code):
+        with open(os.path.join(self.root, path), 'w') as f:
+            f.write(code)
+
+    def _export(self, **kwargs):
+        return export_tree(self.root, self.output, ('ast', 'cfg'), ('dot', 'graphml', 'json'), workers=1, **kwargs)
+
+    def test_writes_every_format(self):
+        self.assertEqual(self._export(), {"exported": 2, "skipped": 0, "failed": 0})
+        with open(os.path.join(self.output, 'pkg/mod.py.cfg.json')) as f:
+            graph = json.load(f)
+        self.assertEqual(graph, python_frontend.build_cfg(ast.parse("def f(x):\n    if x:\n        return x\n    return 0\n")))
+        graphml = nx.read_graphml(os.path.join(self.output, 'Shape.java.ast.graphml'))
+        self.assertEqual(graphml.number_of_nodes(), len(java_frontend.build_ast(
+            _parse_java("class Shape extends Base { int area() { return 1; } }"))["nodes"]))
+        with open(os.path.join(self.output, 'pkg/mod.py.cfg.dot')) as f:
+            self.assertIn('[label=true]', f.read())
+
+    def test_unchanged_files_are_skipped(self):
+        self._export()
+        with mock.patch('code_visualizer.frontends.Frontend.parse') as parse:
+            self.assertEqual(self._export(), {"exported": 0, "skipped": 2, "failed": 0})
+            # Touched but identical files are hashed, not parsed.
+            os.utime(os.path.join(self.root, 'Shape.java'), ns=(1, 1))
+            self.assertEqual(self._export(), {"exported": 0, "skipped": 2, "failed": 0})
+        parse.assert_not_called()
+
+        self._write('pkg/mod.py', "x = 1\n")
+        os.remove(os.path.join(self.root, 'Shape.java'))
+        self.assertEqual(self._export(), {"exported": 1, "skipped": 0, "failed": 0})
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'Shape.java.ast.dot')))
+        self.assertEqual(self._export(force=True), {"exported": 1, "skipped": 0, "failed": 0})
+
+    def test_stale_outputs_are_removed(self):
+        self._export()
+
+        def exists(name):
+            return os.path.exists(os.path.join(self.output, name))
+
+        # Graphs and formats no longer asked for, even with force.
+        export_tree(self.root, self.output, ('ast',), ('json',), workers=1, force=True)
+        self.assertTrue(exists('pkg/mod.py.ast.json'))
+        self.assertFalse(exists('pkg/mod.py.ast.dot'))
+        self.assertFalse(exists('pkg/mod.py.cfg.json'))
+        # A file that now fails to parse.
+        self._write('pkg/mod.py', "def f(:")
+        self.assertEqual(export_tree(self.root, self.output, ('ast',), ('json',), workers=1),
+                         {"exported": 0, "skipped": 1, "failed": 1})
+        self.assertFalse(exists('pkg/mod.py.ast.json'))
+        # Sources deleted before a forced run.
+        os.remove(os.path.join(self.root, 'Shape.java'))
+        export_tree(self.root, self.output, ('ast',), ('json',), workers=1, force=True)
+        self.assertFalse(exists('Shape.java.ast.json'))
+
+    def test_command_reports_failures(self):
+        self._write('bad.py', "def f(:")
+        out, err = io.StringIO(), io.StringIO()
+        call_command('visualize_export', self.root, '--output', self.output, '--workers', '1',
+                     '--formats', 'json', stdout=out, stderr=err)
+        self.assertIn("2 exported, 0 unchanged, 1 failed", out.getvalue())
+        self.assertIn("bad.py: Syntax error", err.getvalue())
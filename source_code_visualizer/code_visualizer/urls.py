@@ -4,4 +4,17 @@ from . import views
 urlpatterns = [
     path('', views.upload_code, name='upload_code'),
     path('visualize/', views.upload_code, name='visualize_code'),
+    path('visualize/batch/', views.visualize_batch, name='visualize_batch'),
+    path('visualize/incremental/', views.visualize_incremental, name='visualize_incremental'),
+    path('visualize/expand/', views.visualize_expand, name='visualize_expand'),
+    path('visualize/async/', views.visualize_async, name='visualize_async'),
+    path('visualize/async/<str:graph>/', views.visualize_async, name='visualize_async_graph'),
+    path('visualize/<str:graph>/', views.visualize_graph, name='visualize_graph'),
+    path('graphs/', views.graph_store, name='graph_store'),
+    path('graphs/<uuid:graph_id>/', views.stored_graph, name='stored_graph'),
+    path('graphs/<uuid:graph_id>/<str:query>/', views.graph_query, name='graph_query'),
+    path('metrics', views.metrics, name='metrics'),
+    path('jobs/', views.job_submit, name='job_submit'),
+    path('jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<uuid:job_id>/result/', views.job_result, name='job_result'),
 ]
@@ -1,430 +1,743 @@
-from django.shortcuts import render
-from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
-import ast
-import javalang
-import networkx as nx
-import graphviz
-import os
+from django.views.decorators.http import require_GET, require_POST
+import asyncio
+import hashlib
+import json
+
+from .batch import BatchError, analyze_files, batch_options, read_zip
+from .cache import (
+    ParseTokenExpired, code_digest, get_incremental_store, get_parse_store, get_result_cache, make_cache_key,
+)
+from . import graphstore, incremental
+from .engine import TraversalLimitExceeded, traversal_limits
+from .frontends import UnsupportedLanguage, get_frontend, languages
+from .jobs import submit_job
+from .layout import apply_layout
+from .metrics import PROMETHEUS_MEDIA_TYPE, collect_spans, get_registry, record_spans, render_counters, span
+from .models import AnalysisJob, StoredGraph
+from .pool import PoolBusy, get_analysis_pool, pool_options
+from .stream import NDJSON_MEDIA_TYPE, graph_chunks, ndjson_line, wants_stream
+from .sharing import DEFAULT_MIN_SIZE, share_subtrees
+from .summary import expand, graph_groups, summarize, summary_options
+from .wire import (
+    COMPACT_MEDIA_TYPE, JSON_MEDIA_TYPE, choose_encoding, compact_payload, compress, wants_compact,
+)
 
 def parse_python_ast(code):
     """Generate Abstract Syntax Tree for Python code."""
     try:
-        tree = ast.parse(code)
-        return _convert_ast_to_graph(tree)
+        return _build_graph(code, 'python', 'ast')
     except SyntaxError as e:
         return {"error": str(e)}
 
 def parse_java_ast(code):
     """Generate Abstract Syntax Tree for Java code."""
     try:
-        tokens = list(javalang.tokenizer.tokenize(code))
-        parser = javalang.parser.Parser(tokens)
-        tree = parser.parse()
-        return _convert_java_ast_to_graph(tree)
+        return _build_graph(code, 'java', 'ast')
     except Exception as e:
         return {"error": str(e)}
 
 def generate_control_flow_graph(code, language):
     """Generate Control Flow Graph for given code."""
     try:
-        if language == 'python':
-            tree = ast.parse(code)
-            cfg = _build_python_cfg(tree)
-        elif language == 'java':
-            tokens = list(javalang.tokenizer.tokenize(code))
-            parser = javalang.parser.Parser(tokens)
-            tree = parser.parse()
-            cfg = _build_java_cfg(tree)
-        else:
-            return {"error": "Unsupported language"}
-        
-        return cfg
+        return _build_graph(code, language, 'cfg')
+    except UnsupportedLanguage:
+        return {"error": "Unsupported language"}
     except Exception as e:
         return {"error": str(e)}
 
 def generate_data_dependency_graph(code, language):
     """Generate Data Dependency Graph for given code."""
     try:
-        if language == 'python':
-            tree = ast.parse(code)
-            ddg = _build_python_ddg(tree)
-        elif language == 'java':
-            tokens = list(javalang.tokenizer.tokenize(code))
-            parser = javalang.parser.Parser(tokens)
-            tree = parser.parse()
-            ddg = _build_java_ddg(tree)
-        else:
-            return {"error": "Unsupported language"}
-        
-        return ddg
+        return _build_graph(code, language, 'ddg')
+    except UnsupportedLanguage:
+        return {"error": "Unsupported language"}
     except Exception as e:
         return {"error": str(e)}
 
-def _graph_to_dict(graph):
-    """Convert NetworkX graph to dictionary representation."""
-    return {
-        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
-        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
-    }
+def _build_graph(code, language, graph):
+    """Parse ``code`` with the front end for ``language`` and build one graph."""
+    frontend = get_frontend(language)
+    return frontend.builders[graph](frontend.parse(code))
 
-def _convert_ast_to_graph(node, graph=None, parent=None):
-    """Convert Python AST to NetworkX graph."""
-    if graph is None:
-        graph = nx.DiGraph()
-    
-    node_id = str(id(node))
-    node_label = type(node).__name__
-    
-    # Add additional info for certain node types
-    if isinstance(node, ast.Name):
-        node_label += f" ({node.id})"
-    elif isinstance(node, ast.Num):
-        node_label += f" ({node.n})"
-    elif isinstance(node, ast.Str):
-        node_label += f" ({node.s})"
-    
-    graph.add_node(node_id, label=node_label)
+def _encode_json(data):
+    """Serialize ``data`` exactly as JsonResponse would."""
+    return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+def _json_bytes_response(payload, cache_status=None, content_type=JSON_MEDIA_TYPE, encoding=None, etag=None):
+    """Wrap already-serialized (and possibly compressed) JSON bytes in a response."""
+    response = HttpResponse(payload, content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if cache_status:
+        response['X-Cache'] = cache_status
+    if etag:
+        response['ETag'] = etag
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+def _result_etag(cache_key):
+    """Return the ETag of the response stored under ``cache_key``.
+
+    Node ids are deterministic, so the same code and options always give
+    byte-identical responses and the tag can be derived from the cache key
+    without building anything.
+    """
+    return quote_etag(hashlib.sha256(cache_key.encode('utf-8')).hexdigest()[:32])
+
+def _not_modified(request, options):
+    """Return a 304 response if the client already has this result, else None.
+
+    Visualizing is a safe, repeatable query that happens to be POSTed
+    because of the size of the code, so ``If-None-Match`` is honoured as
+    it would be for a GET.
+    """
+    if options["stream"]:
+        return None
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if options["etag"] not in etags and '*' not in etags:
+        return None
+    response = HttpResponseNotModified()
+    response['ETag'] = options["etag"]
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+GRAPH_TYPES = ('ast', 'cfg', 'ddg', 'calls')
+# Built when a request does not name its graphs.
+DEFAULT_GRAPHS = ('ast', 'cfg', 'ddg')
+def _stream_graphs(tree, language, graph_names, token=None):
+    """Yield the requested graphs as NDJSON lines while they are built.
+
+    The first line lists the graphs (and the parse token), then node and
+    edge chunks follow; the last line is ``{"done": true}`` or, if the
+    build fails part way, ``{"error": ...}``.
+    """
+    header = {"format": "ndjson", "graphs": list(graph_names)}
+    if token:
+        header["token"] = token
+    yield ndjson_line(header)
+    try:
+        for name in graph_names:
+            with span(name, language):
+                records, edge_attr = get_frontend(language).records(tree, name)
+            for chunk in graph_chunks(name, records, edge_attr):
+                yield ndjson_line(chunk)
+    except TraversalLimitExceeded as e:
+        yield ndjson_line({"error": f"{language} code is too large to visualize: {str(e)}"})
+        return
+    except Exception as e:
+        yield ndjson_line({"error": f"Error processing {language} code: {str(e)}"})
+        return
+    yield ndjson_line({"done": True})
+
+def _make_parse_token(language, digest):
+    return f"{language}:{digest}"
+
+def _split_parse_token(token):
+    """Return (language, digest) for a parse token, or None if malformed."""
+    language, _, digest = token.partition(':')
+    if language not in languages() or len(digest) != 64:
+        return None
+    return language, digest
+
+def _visualize_request(request, graph_names):
+    """Validate a visualize request.
+
+    Returns ``(options, None)``, or ``(None, error response)`` when the
+    request cannot be served.
+    """
+    code = request.POST.get('code', '')
+    token = request.POST.get('token', '')
     
-    if parent is not None:
-        parent_id = str(id(parent))
-        graph.add_edge(parent_id, node_id)
+    if code:
+        language = request.POST.get('language', 'python')
+        # Validate language
+        if language not in languages():
+            return None, JsonResponse({"error": "Unsupported language"}, status=400)
+        digest = code_digest(code)
+        token = _make_parse_token(language, digest)
+    elif token and graph_names is not None:
+        parsed_token = _split_parse_token(token)
+        if parsed_token is None:
+            return None, JsonResponse({"error": "Invalid parse token"}, status=400)
+        language, digest = parsed_token
+    else:
+        return None, JsonResponse({"error": "No code provided"}, status=400)
     
-    for child in ast.iter_child_nodes(node):
-        _convert_ast_to_graph(child, graph, node)
+    with_layout = request.POST.get('layout', '') in ('1', 'true', 'on')
+    summary = _count_option(request.POST.get('summary', ''), summary_options()['MAX_NODES'])
+    if summary is False:
+        return None, JsonResponse({"error": "summary must be 1 or a node count"}, status=400)
+    share = _count_option(request.POST.get('share', ''), DEFAULT_MIN_SIZE)
+    if share is False:
+        return None, JsonResponse({"error": "share must be 1 or a minimum subtree size"}, status=400)
+    if share and summary:
+        return None, JsonResponse({"error": "Summaries and shared subtrees cannot be combined"}, status=400)
+    stream = wants_stream(request)
+    if stream and with_layout:
+        return None, JsonResponse({"error": "Layout is not available when streaming"}, status=400)
+    if stream and summary:
+        return None, JsonResponse({"error": "Summaries are not available when streaming"}, status=400)
+    if stream and share:
+        return None, JsonResponse({"error": "Shared subtrees are not available when streaming"}, status=400)
+    compact = not stream and wants_compact(request)
+    encoding = choose_encoding(request) if compact else None
+    cache_key_parts = list(graph_names or ())
+    if summary:
+        cache_key_parts.append(f'summary{summary}')
+    if share:
+        cache_key_parts.append(f'share{share}')
+    if with_layout:
+        cache_key_parts.append('layout')
+    if compact:
+        cache_key_parts.append('compact')
+    if encoding:
+        cache_key_parts.append(encoding)
+    cache_key = make_cache_key(language, digest, *cache_key_parts)
     
     return {
-        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
-        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
-    }
+        "code": code,
+        "token": token,
+        "language": language,
+        "digest": digest,
+        "graph_names": graph_names,
+        "layout": with_layout,
+        "summary": summary,
+        "share": share,
+        "stream": stream,
+        "compact": compact,
+        "encoding": encoding,
+        "content_type": COMPACT_MEDIA_TYPE if compact else JSON_MEDIA_TYPE,
+        "cache_key": cache_key,
+        "etag": _result_etag(cache_key),
+    }, None
+
+def _count_option(value, default):
+    """Return the count asked for by a field such as ``summary`` or ``share``.
+
+    ``1``/``true``/``on`` ask for ``default`` and a number for that many
+    nodes. Returns None when the option is off and False when the value
+    is invalid.
+    """
+    if value in ('', '0', 'false', 'off'):
+        return None
+    if value in ('1', 'true', 'on'):
+        return default
+    try:
+        count = int(value)
+    except ValueError:
+        return False
+    return count if count > 0 else False
+
+def _load_tree(code, token, language):
+    """Return the parsed tree for ``token``, parsing ``code`` if it is not stored."""
+    parse_store = get_parse_store()
+    tree = parse_store.get(token)
+    if tree is None:
+        if not code:
+            raise ParseTokenExpired(token)
+        tree = get_frontend(language).parse(code)
+        parse_store.put(token, tree)
+    return tree
 
-def _convert_java_ast_to_graph(node, graph=None, parent=None):
-    """Convert Java AST to NetworkX graph with enhanced OOP visualization."""
-    if graph is None:
-        graph = nx.DiGraph()
+def _build_payload(tree, options):
+    """Build the requested graphs and return the encoded response body."""
+    graph_names = options["graph_names"]
+    language = options["language"]
+    builders = get_frontend(language).builders
+    result = {}
+    for name in graph_names or DEFAULT_GRAPHS:
+        with span(name, language):
+            result[name] = builders[name](tree)
+    if options["share"] and "ast" in result:
+        with span('share', language):
+            result["ast"], result["sharing"] = share_subtrees(result["ast"], options["share"])
+    if options["summary"]:
+        max_depth = summary_options()['MAX_DEPTH']
+        with span('summary', language):
+            for name in graph_names or DEFAULT_GRAPHS:
+                result[name] = summarize(result[name], name, tree, language, options["summary"],
+                                         max_depth, traversal_limits())
+    if options["layout"]:
+        with span('layout', language):
+            # Only the graphs: ``sharing`` holds statistics, not nodes.
+            for name in graph_names or DEFAULT_GRAPHS:
+                apply_layout(result[name], name)
+    if graph_names is not None:
+        result["token"] = options["token"]
+    if getattr(tree, 'errors', None):
+        result["parse_errors"] = tree.errors
     
-    node_id = str(id(node))
-    node_label = type(node).__name__
+    with span('serialize', language):
+        if options["compact"]:
+            result = compact_payload(result, graph_names or DEFAULT_GRAPHS)
+        return compress(_encode_json(result), options["encoding"])
+
+def _analyze(options):
+    """Parse and build one response body; the unit of work for the analysis pool."""
+    tree = _load_tree(options["code"], options["token"], options["language"])
+    return _build_payload(tree, options)
+
+def _analyze_in_process(options, tree):
+    """``_analyze`` for a process pool worker.
+
+    The parse store and the metrics registry live in the web process, so
+    the tree for a token is looked up there and passed in (None to parse
+    ``code``). Returns ``(payload, tree if it was parsed here, spans)``.
+    """
+    with collect_spans() as spans:
+        parsed = None
+        if tree is None:
+            tree = parsed = get_frontend(options["language"]).parse(options["code"])
+        payload = _build_payload(tree, options)
+    return payload, parsed, spans
 
-    # Add more detailed information for different node types
-    if hasattr(node, 'name') and node.name is not None:
-        node_label += f"\n{node.name}"
+async def _run_analysis(options, timeout):
+    """Build one response body on the analysis pool."""
+    pool = get_analysis_pool()
+    if pool.kind != 'process':
+        return await pool.run(_analyze, options, timeout=timeout)
+    parse_store = get_parse_store()
+    tree = parse_store.get(options["token"])
+    if tree is None and not options["code"]:
+        raise ParseTokenExpired(options["token"])
+    payload, parsed, spans = await pool.run(_analyze_in_process, options, tree, timeout=timeout)
+    record_spans(spans, options["language"])
+    if parsed is not None:
+        parse_store.put(options["token"], parsed)
+    return payload
+
+def _error_response(error, language):
+    """Return the error response for an exception raised while analyzing code."""
+    if isinstance(error, ParseTokenExpired):
+        return JsonResponse({"error": "Parse token expired, resend the code"}, status=410)
+    if isinstance(error, TraversalLimitExceeded):
+        return JsonResponse({
+            "error": f"{language} code is too large to visualize: {str(error)}"
+        }, status=413)
+    if isinstance(error, SyntaxError):
+        return JsonResponse({
+            "error": f"Syntax error in {language} code: {str(error)}"
+        }, status=400)
+    return JsonResponse({
+        "error": f"Error processing {language} code: {str(error)}"
+    }, status=500)
+
+def _visualize(request, graph_names=None):
+    """Build the requested graphs for posted code or a parse token.
+
+    With ``graph_names`` unset all graphs are returned in the original
+    payload; otherwise only the named graphs are built and the payload
+    carries a ``token`` that later requests can send instead of the code
+    to reuse the parsed tree. A truthy ``layout`` field adds Graphviz node
+    coordinates, which are cached with the graphs. Clients that ask for
+    the compact format get columnar graphs, compressed if they accept it;
+    clients that ask for NDJSON get the graphs streamed as they are built.
+    """
+    options, error = _visualize_request(request, graph_names)
+    if error is not None:
+        return error
+    not_modified = _not_modified(request, options)
+    if not_modified is not None:
+        return not_modified
     
-    # Handle extends relationship
-    if hasattr(node, 'extends') and node.extends is not None:
-        if hasattr(node.extends, 'name') and node.extends.name is not None:
-            node_label += f"\nextends {node.extends.name}"
+    cache = get_result_cache()
+    payload = None if options["stream"] else cache.get(options["cache_key"])
+    if payload is not None:
+        return _json_bytes_response(payload, 'HIT', options["content_type"], options["encoding"], options["etag"])
     
-    # Handle implements relationship
-    if hasattr(node, 'implements') and node.implements is not None:
-        implements = []
-        for i in node.implements:
-            if hasattr(i, 'name') and i.name is not None:
-                implements.append(i.name)
-        if implements:
-            node_label += f"\nimplements {', '.join(implements)}"
+    try:
+        tree = _load_tree(options["code"], options["token"], options["language"])
+        if options["stream"]:
+            # Streamed graphs bypass the result cache.
+            response = StreamingHttpResponse(
+                _stream_graphs(tree, options["language"], graph_names or DEFAULT_GRAPHS,
+                               options["token"] if graph_names else None),
+                content_type=NDJSON_MEDIA_TYPE,
+            )
+            patch_vary_headers(response, ('Accept',))
+            return response
+        payload = _build_payload(tree, options)
+    except Exception as e:
+        return _error_response(e, options["language"])
     
-    # Add node with enhanced label
-    graph.add_node(node_id, label=node_label)
+    cache.set(options["cache_key"], payload)
+    return _json_bytes_response(payload, 'MISS', options["content_type"], options["encoding"], options["etag"])
+
+async def _visualize_async(request, graph_names=None):
+    """Like ``_visualize``, but analysis runs on the bounded worker pool.
+
+    Returns 503 when the pool's queue is full and 504 when the analysis
+    exceeds ``CODE_VISUALIZER_WORKERS['TIMEOUT']``. If the client goes
+    away the request is cancelled and queued work is dropped.
+    """
+    options, error = _visualize_request(request, graph_names)
+    if error is not None:
+        return error
+    not_modified = _not_modified(request, options)
+    if not_modified is not None:
+        return not_modified
+    if options["stream"]:
+        return JsonResponse({"error": "Streaming is not available on the async endpoints"}, status=400)
     
-    if parent is not None:
-        parent_id = str(id(parent))
-        # Add different edge styles for different relationships
-        if isinstance(node, javalang.tree.ClassDeclaration):
-            if hasattr(node, 'extends') and node.extends is not None:
-                graph.add_edge(node_id, parent_id, relationship='extends')
-            if hasattr(node, 'implements') and node.implements:
-                graph.add_edge(node_id, parent_id, relationship='implements')
-        else:
-            graph.add_edge(parent_id, node_id, relationship='contains')
+    cache = get_result_cache()
+    payload = cache.get(options["cache_key"])
+    if payload is not None:
+        return _json_bytes_response(payload, 'HIT', options["content_type"], options["encoding"], options["etag"])
     
-    # Recursively process child nodes
-    if hasattr(node, 'children'):
-        for child in node.children:
-            if child is not None:
-                if isinstance(child, javalang.ast.Node):
-                    _convert_java_ast_to_graph(child, graph, node)
-                elif isinstance(child, list):
-                    for item in child:
-                        if item is not None and isinstance(item, javalang.ast.Node):
-                            _convert_java_ast_to_graph(item, graph, node)
+    timeout = pool_options()['TIMEOUT']
+    try:
+        payload = await _run_analysis(options, timeout)
+    except PoolBusy as e:
+        response = JsonResponse({"error": f"Server is busy, try again later: {str(e)}"}, status=503)
+        response['Retry-After'] = '1'
+        return response
+    except asyncio.TimeoutError:
+        return JsonResponse({"error": f"Analysis took longer than {timeout} seconds"}, status=504)
+    except Exception as e:
+        return _error_response(e, options["language"])
     
-    return {
-        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', '')).replace('\n', ' - ')} for n in graph.nodes],
-        "edges": [{"source": str(e[0]), "target": str(e[1]), 
-                  "relationship": graph.edges[e].get('relationship', 'contains')} for e in graph.edges]
-    }
+    cache.set(options["cache_key"], payload)
+    return _json_bytes_response(payload, 'MISS', options["content_type"], options["encoding"], options["etag"])
+
+def _parse_graph_selector(graphs):
+    """Return the graph names listed in ``graphs`` and the unknown ones."""
+    graph_names = tuple(name.strip() for name in graphs.split(',') if name.strip())
+    return graph_names, [name for name in graph_names if name not in GRAPH_TYPES]
 
-def _build_python_cfg(node):
-    """Build Control Flow Graph for Python code focusing on function-level control flow."""
-    graph = nx.DiGraph()
-    current_function = None
+@csrf_exempt
+def upload_code(request):
+    """Handle code upload and visualization.
+
+    An optional ``graphs`` field (e.g. ``ast,cfg``) limits which graphs
+    are built.
+    """
+    if request.method == 'POST':
+        graph_names, unknown = _parse_graph_selector(request.POST.get('graphs', ''))
+        if not graph_names:
+            return _visualize(request)
+        if unknown:
+            return JsonResponse({"error": f"Unknown graph type: {', '.join(unknown)}"}, status=400)
+        return _visualize(request, graph_names)
     
-    def add_edge_if_new(source, target, label=""):
-        if not graph.has_edge(source, target):
-            graph.add_edge(source, target, label=label)
+    return render(request, 'code_visualizer/upload.html')
+
+@csrf_exempt
+@require_POST
+def visualize_graph(request, graph):
+    """Build a single graph type, reusing a parsed tree when given a token."""
+    if graph not in GRAPH_TYPES:
+        return JsonResponse({"error": f"Unknown graph type: {graph}"}, status=404)
+    return _visualize(request, (graph,))
+
+@csrf_exempt
+@require_POST
+def visualize_expand(request):
+    """Return the part of a summarized graph behind one collapsed ``node``.
     
-    def visit(node):
-        nonlocal current_function
-        
-        if isinstance(node, ast.FunctionDef):
-            # Create node for function
-            graph.add_node(node.name, label=f"Function: {node.name}")
-            prev_function = current_function
-            current_function = node.name
-            
-            # Find all function calls within this function
-            for child in ast.walk(node):
-                if isinstance(child, ast.Call) and isinstance(child.func, ast.Name):
-                    called_func = child.func.id
-                    if called_func in graph:
-                        add_edge_if_new(current_function, called_func, "calls")
-            
-            current_function = prev_function
-            
-        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-            # If we're in the global scope
-            if current_function is None and node.func.id in graph:
-                add_edge_if_new("Global", node.func.id, "calls")
-        
-        # Add entry point
-        elif isinstance(node, ast.If) and isinstance(node.test, ast.Compare):
-            if any(isinstance(c, ast.Name) and c.id == "__name__" for c in ast.walk(node.test)):
-                if any(isinstance(c, ast.Str) and c.s == "__main__" for c in ast.walk(node.test)):
-                    graph.add_node("Global", label="Program Entry")
-                    for child in node.body:
-                        if isinstance(child, ast.Call) and isinstance(child.func, ast.Name):
-                            add_edge_if_new("Global", child.func.id, "calls")
-        
-        # Recursively visit all children
-        for child in ast.iter_child_nodes(node):
-            visit(child)
+    Takes the ``code`` or ``token`` and the ``summary`` budget of the
+    summarized request. An AST node expands into its own summarized
+    subtree; a cluster of the other graphs into its nodes and the edges
+    touching them.
+    """
+    graph = request.POST.get('graph', '')
+    node_id = request.POST.get('node', '')
+    if graph not in GRAPH_TYPES:
+        return JsonResponse({"error": f"Unknown graph type: {graph}"}, status=400)
+    if not node_id:
+        return JsonResponse({"error": "No node provided"}, status=400)
+    options, error = _visualize_request(request, (graph,))
+    if error is not None:
+        return error
+    language = options["language"]
+    budget = options["summary"] or summary_options()['MAX_NODES']
     
-    # Start visiting from the root
-    visit(node)
+    cache = get_result_cache()
+    cache_key = make_cache_key(language, options["digest"], 'expand', graph, node_id, budget)
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return _json_bytes_response(payload, 'HIT')
     
-    # Remove isolated nodes
-    for node in list(graph.nodes()):
-        if not list(graph.predecessors(node)) and not list(graph.successors(node)):
-            graph.remove_node(node)
+    try:
+        tree = _load_tree(options["code"], options["token"], language)
+        subgraph = expand(get_frontend(language).builders[graph](tree), graph, node_id, tree, language, budget,
+                          summary_options()['MAX_DEPTH'], traversal_limits())
+    except Exception as e:
+        return _error_response(e, language)
+    if subgraph is None:
+        return JsonResponse({"error": f"Unknown node: {node_id}"}, status=404)
     
-    return {
-        "nodes": [{"id": n, "label": graph.nodes[n]["label"]} for n in graph.nodes],
-        "edges": [{"source": e[0], "target": e[1], "label": graph.edges[e]["label"]} for e in graph.edges]
-    }
+    payload = _encode_json({"graph": graph, "node": node_id, **subgraph, "token": options["token"]})
+    cache.set(cache_key, payload)
+    return _json_bytes_response(payload, 'MISS')
 
-def _build_java_cfg(node):
-    """Build Control Flow Graph for Java code focusing on class and method-level control flow."""
-    graph = nx.DiGraph()
-    current_class = None
-    current_method = None
-    
-    def add_edge_if_new(source, target, label=""):
-        if not graph.has_edge(source, target):
-            graph.add_edge(source, target, label=label)
-    
-    def get_full_method_name(method_name):
-        return f"{current_class}.{method_name}" if current_class else method_name
-    
-    def visit(node):
-        nonlocal current_class, current_method
-        
-        if isinstance(node, javalang.tree.ClassDeclaration):
-            current_class = node.name
-            # Add class node
-            graph.add_node(current_class, label=f"Class: {current_class}")
-            
-            # Handle inheritance
-            if node.extends:
-                parent_class = node.extends.name
-                graph.add_node(parent_class, label=f"Class: {parent_class}")
-                add_edge_if_new(current_class, parent_class, "extends")
-            
-            # Handle interfaces
-            if node.implements:
-                for interface in node.implements:
-                    interface_name = interface.name
-                    graph.add_node(interface_name, label=f"Interface: {interface_name}")
-                    add_edge_if_new(current_class, interface_name, "implements")
-            
-            # Visit class members
-            for child in node.body:
-                visit(child)
-                
-            current_class = None
-            
-        elif isinstance(node, javalang.tree.MethodDeclaration):
-            method_name = get_full_method_name(node.name)
-            graph.add_node(method_name, label=f"Method: {method_name}")
-            prev_method = current_method
-            current_method = method_name
-            
-            # Find method calls within this method
-            for path, child in node.filter(javalang.tree.MethodInvocation):
-                if hasattr(child, 'member'):
-                    called_method = child.member
-                    # If method call includes class qualifier, use it
-                    if hasattr(child, 'qualifier') and child.qualifier:
-                        called_method = f"{child.qualifier}.{called_method}"
-                    else:
-                        # Assume it's a method in the current class
-                        called_method = get_full_method_name(called_method)
-                    
-                    if called_method != current_method:  # Avoid self-loops
-                        graph.add_node(called_method, label=f"Method: {called_method}")
-                        add_edge_if_new(current_method, called_method, "calls")
-            
-            current_method = prev_method
-        
-        # Visit all children
-        if hasattr(node, 'children'):
-            for child in node.children:
-                if child is not None:
-                    if isinstance(child, list):
-                        for item in child:
-                            if item is not None:
-                                visit(item)
-                    else:
-                        visit(child)
+@csrf_exempt
+@require_POST
+async def visualize_async(request, graph=None):
+    """Async variant of ``/visualize/`` and ``/visualize/<graph>/``.
+
+    Parsing and graph building run on a worker pool so they never block
+    the ASGI event loop.
+    """
+    if graph is not None:
+        if graph not in GRAPH_TYPES:
+            return JsonResponse({"error": f"Unknown graph type: {graph}"}, status=404)
+        return await _visualize_async(request, (graph,))
+    graph_names, unknown = _parse_graph_selector(request.POST.get('graphs', ''))
+    if unknown:
+        return JsonResponse({"error": f"Unknown graph type: {', '.join(unknown)}"}, status=400)
+    return await _visualize_async(request, graph_names or None)
+
+@csrf_exempt
+@require_POST
+def visualize_batch(request):
+    """Analyze many files at once, from a zip ``archive`` and/or ``files`` uploads.
+
+    Files are parsed in parallel; per-file errors are reported in the
+    result instead of failing the batch. Batches naming the same
+    ``project`` share a symbol index, so only changed files are re-indexed.
+    """
+    graph_names, unknown = _parse_graph_selector(request.POST.get('graphs', ''))
+    if unknown:
+        return JsonResponse({"error": f"Unknown graph type: {', '.join(unknown)}"}, status=400)
+    graph_names = graph_names or DEFAULT_GRAPHS
     
-    # Start visiting from the root
-    visit(node)
+    options = batch_options()
+    try:
+        files = []
+        if 'archive' in request.FILES:
+            files.extend(read_zip(request.FILES['archive'], options['MAX_FILES'], options['MAX_BYTES']))
+        for upload in request.FILES.getlist('files'):
+            if upload.size > options['MAX_BYTES']:
+                raise BatchError(f"{upload.name} is larger than {options['MAX_BYTES']} bytes")
+            files.append((upload.name, upload.read()))
+        if len(files) > options['MAX_FILES']:
+            raise BatchError(f"Batch contains more than {options['MAX_FILES']} files")
+        if sum(len(source) for _, source in files) > options['MAX_BYTES']:
+            raise BatchError(f"Batch is larger than {options['MAX_BYTES']} bytes")
+    except BatchError as e:
+        return JsonResponse({"error": str(e)}, status=400)
     
-    # Remove isolated nodes
-    for node in list(graph.nodes()):
-        if not list(graph.predecessors(node)) and not list(graph.successors(node)):
-            graph.remove_node(node)
+    if not files:
+        return JsonResponse({"error": "No files provided"}, status=400)
     
-    return {
-        "nodes": [{"id": n, "label": graph.nodes[n]["label"]} for n in graph.nodes],
-        "edges": [{"source": e[0], "target": e[1], "label": graph.edges[e]["label"]} for e in graph.edges]
-    }
+    return JsonResponse(analyze_files(files, graph_names, project=request.POST.get('project', '')))
 
-def _build_python_ddg(node):
-    """Build Data Dependency Graph for Python code."""
-    graph = nx.DiGraph()
-    variables = {}
-    
-    def visit(node, parent_id=None):
-        node_id = str(id(node))
-        node_label = type(node).__name__
-        
-        if isinstance(node, ast.Name):
-            node_label += f" ({node.id})"
-            if isinstance(parent_id, ast.Assign):
-                # Variable definition
-                variables[node.id] = node_id
-            elif node.id in variables:
-                # Variable usage - create dependency edge
-                graph.add_edge(variables[node.id], node_id)
-        
-        graph.add_node(node_id, label=node_label)
-        
-        if parent_id:
-            graph.add_edge(str(id(parent_id)), node_id)
-        
-        for child in ast.iter_child_nodes(node):
-            visit(child, node)
+@csrf_exempt
+@require_POST
+def visualize_incremental(request):
+    """Re-analyze edited code against an earlier result.
+
+    ``base`` is the ``id`` of an earlier response. Only the top-level
+    definitions and methods whose source changed are rebuilt, and the
+    response carries a per-graph ``delta`` instead of the full graphs.
+    Node ids of unchanged definitions stay the same. Without a ``base``,
+    or once it has expired, the full graphs are returned.
+    """
+    code = request.POST.get('code', '')
+    language = request.POST.get('language', 'python')
+    if not code:
+        return JsonResponse({"error": "No code provided"}, status=400)
+    if language not in incremental.LANGUAGES:
+        return JsonResponse({"error": "Unsupported language"}, status=400)
     
-    if isinstance(node, ast.AST):
-        visit(node)
+    store = get_incremental_store()
+    base_id = request.POST.get('base', '')
+    base = store.get(base_id) if base_id else None
+    try:
+        with span('incremental', language):
+            state, regions = incremental.analyze(code, language, base, **traversal_limits())
+    except Exception as e:
+        return _error_response(e, language)
+    store.put(state.id, state)
     
-    return {
-        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
-        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
+    if base is None:
+        result = incremental.graphs(state)
+        result["id"] = state.id
+        return JsonResponse(result)
+    affected = set(regions["changed"]) | set(regions["added"]) | set(regions["removed"])
+    return JsonResponse({
+        "id": state.id,
+        "base": base.id,
+        "delta": incremental.diff(base, state, affected),
+        "regions": regions,
+    })
+
+def _job_status(job):
+    """Return the status payload of a background job."""
+    status = {
+        "id": str(job.id),
+        "status": job.status,
+        "language": job.language,
+        "graphs": list(job.graph_names),
+        "progress": job.progress,
+        "created": job.created,
+        "started": job.started,
+        "finished": job.finished,
     }
+    if job.status == AnalysisJob.DONE:
+        status["result"] = f"/jobs/{job.id}/result/"
+    elif job.status == AnalysisJob.FAILED:
+        status["error"] = job.error
+    return status
 
-def _build_java_ddg(node):
-    """Build Data Dependency Graph for Java code with field dependencies."""
-    graph = nx.DiGraph()
-    variables = {}
-    
-    def visit(node, parent_id=None):
-        node_id = str(id(node))
-        node_label = type(node).__name__
-        
-        # Track field declarations and method parameters
-        if isinstance(node, javalang.tree.FieldDeclaration):
-            for declarator in node.declarators:
-                var_name = declarator.name
-                node_label = f"Field: {var_name}"
-                variables[var_name] = node_id
-        elif isinstance(node, javalang.tree.FormalParameter):
-            var_name = node.name
-            node_label = f"Parameter: {var_name}"
-            variables[var_name] = node_id
-        elif isinstance(node, javalang.tree.VariableDeclarator):
-            var_name = node.name
-            node_label = f"Variable: {var_name}"
-            variables[var_name] = node_id
-        elif isinstance(node, javalang.tree.MemberReference):
-            if node.member in variables:
-                graph.add_edge(variables[node.member], node_id)
-        
-        graph.add_node(node_id, label=node_label)
-        
-        if parent_id:
-            graph.add_edge(str(id(parent_id)), node_id)
-        
-        # Process children
-        for child in node.children:
-            if isinstance(child, javalang.ast.Node):
-                visit(child, node)
-            elif isinstance(child, list):
-                for item in child:
-                    if isinstance(item, javalang.ast.Node):
-                        visit(item, node)
-    
-    if isinstance(node, javalang.ast.Node):
-        visit(node)
+@csrf_exempt
+@require_POST
+def job_submit(request):
+    """Queue ``code`` for analysis in the background.
+
+    Returns 202 with the job's status, or 200 if the job is already
+    finished: one for the same code, language and graphs existed, or it
+    ran inline (``WORKERS`` set to 0) as soon as it was submitted.
+    """
+    code = request.POST.get('code', '')
+    language = request.POST.get('language', 'python')
+    if not code:
+        return JsonResponse({"error": "No code provided"}, status=400)
+    if language not in languages():
+        return JsonResponse({"error": "Unsupported language"}, status=400)
+    graph_names, unknown = _parse_graph_selector(request.POST.get('graphs', ''))
+    if unknown:
+        return JsonResponse({"error": f"Unknown graph type: {', '.join(unknown)}"}, status=400)
     
+    job, _ = submit_job(code, language, graph_names or DEFAULT_GRAPHS)
+    job.refresh_from_db()
+    response = JsonResponse(_job_status(job), status=200 if job.status == AnalysisJob.DONE else 202)
+    response['Location'] = f"/jobs/{job.id}/"
+    return response
+
+@require_GET
+def job_status(request, job_id):
+    """Report a background job's status and progress (tree nodes processed)."""
+    job = get_object_or_404(AnalysisJob.objects.defer('code', 'result'), pk=job_id)
+    return JsonResponse(_job_status(job))
+
+@require_GET
+def job_result(request, job_id):
+    """Return a finished job's graphs; 409 while it is still queued or running."""
+    job = get_object_or_404(AnalysisJob.objects.defer('code'), pk=job_id)
+    if job.status == AnalysisJob.DONE:
+        return _json_bytes_response(job.result.encode('utf-8'))
+    if job.status == AnalysisJob.FAILED:
+        return JsonResponse({"error": job.error}, status=422)
+    return JsonResponse({"error": f"Job is {job.status}", "progress": job.progress}, status=409)
+
+def _stored_graph_status(stored):
+    """Return the description of a stored graph."""
     return {
-        "nodes": [{"id": str(n), "label": str(graph.nodes[n].get('label', ''))} for n in graph.nodes],
-        "edges": [{"source": str(e[0]), "target": str(e[1])} for e in graph.edges]
+        "id": str(stored.id),
+        "language": stored.language,
+        "graph": stored.graph,
+        "nodes": stored.node_count,
+        "edges": stored.edge_count,
+        "created": stored.created,
     }
 
 @csrf_exempt
-def upload_code(request):
-    """Handle code upload and visualization."""
-    if request.method == 'POST':
-        code = request.POST.get('code', '')
-        language = request.POST.get('language', 'python')
-        
-        # Validate input
-        if not code:
-            return JsonResponse({"error": "No code provided"}, status=400)
-        
-        # Validate language
-        if language not in ['python', 'java']:
-            return JsonResponse({"error": "Unsupported language"}, status=400)
-        
+@require_POST
+def graph_store(request):
+    """Store one ``graph`` of the posted ``code`` (or ``token``) for paged queries.
+
+    Returns 201 with the stored graph's id and size, or 200 if the graph
+    of the same code is already stored.
+    """
+    graph = request.POST.get('graph', '')
+    if graph not in GRAPH_TYPES:
+        return JsonResponse({"error": f"Unknown graph type: {graph}"}, status=400)
+    options, error = _visualize_request(request, (graph,))
+    if error is not None:
+        return error
+    language = options["language"]
+    
+    stored = graphstore.find_graph(language, options["digest"], graph)
+    created = False
+    if stored is None:
         try:
-            # Generate visualizations based on language
-            if language == 'python':
-                tree = ast.parse(code)
-                ast_graph = _convert_ast_to_graph(tree)
-                cfg_graph = _build_python_cfg(tree)
-                ddg_graph = _build_python_ddg(tree)
-            else:  # java
-                tokens = list(javalang.tokenizer.tokenize(code))
-                parser = javalang.parser.Parser(tokens)
-                tree = parser.parse()
-                ast_graph = _convert_java_ast_to_graph(tree)
-                cfg_graph = _build_java_cfg(tree)
-                ddg_graph = _build_java_ddg(tree)
-            
-            return JsonResponse({
-                "ast": ast_graph,
-                "cfg": cfg_graph,
-                "ddg": ddg_graph
-            })
-        except SyntaxError as e:
-            return JsonResponse({
-                "error": f"Syntax error in {language} code: {str(e)}"
-            }, status=400)
+            tree = _load_tree(options["code"], options["token"], language)
+            with span(graph, language):
+                data = get_frontend(language).builders[graph](tree)
+            with span('store', language):
+                stored, created = graphstore.store_graph(
+                    language, options["digest"], graph, data,
+                    graph_groups(graph, tree, language, **traversal_limits()),
+                )
         except Exception as e:
-            return JsonResponse({
-                "error": f"Error processing {language} code: {str(e)}"
-            }, status=500)
+            return _error_response(e, language)
+    response = JsonResponse(_stored_graph_status(stored), status=201 if created else 200)
+    response['Location'] = f"/graphs/{stored.id}/"
+    return response
+
+@require_GET
+def stored_graph(request, graph_id):
+    """Describe a stored graph."""
+    return JsonResponse(_stored_graph_status(get_object_or_404(StoredGraph, pk=graph_id)))
+
+def _count_param(request, name, default):
+    """Return a non-negative integer query parameter, or None if it is not one."""
+    raw = request.GET.get(name, '')
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+@require_GET
+def graph_query(request, graph_id, query):
+    """Answer a query about part of a stored graph.
     
-    return render(request, 'code_visualizer/upload.html')
+    ``nodes`` (optionally those with a ``label``, a label ``prefix`` or in
+    the function or class ``unit``), ``units`` and ``children`` (of
+    ``node``) are paged with ``offset`` and ``limit``. ``neighborhood``
+    returns up to ``limit`` nodes within ``hops`` edges of ``node``, and
+    ``path`` a shortest path from ``source`` to ``target`` (following
+    edges backwards too with ``directed=0``).
+    """
+    if query not in graphstore.QUERIES:
+        return JsonResponse({"error": f"Unknown query: {query}"}, status=404)
+    stored = get_object_or_404(StoredGraph, pk=graph_id)
+    options = graphstore.graph_store_options()
+    offset = _count_param(request, 'offset', 0)
+    limit = _count_param(request, 'limit', options['PAGE_SIZE'])
+    hops = _count_param(request, 'hops', 1)
+    if offset is None or limit is None or hops is None or limit == 0:
+        return JsonResponse({"error": "offset, limit and hops must be non-negative integers"}, status=400)
+    limit = min(limit, options['MAX_PAGE_SIZE'])
+    
+    if query == 'nodes':
+        return JsonResponse(graphstore.nodes(stored, offset, limit, label=request.GET.get('label'),
+                                             prefix=request.GET.get('prefix'), unit=request.GET.get('unit')))
+    if query == 'units':
+        return JsonResponse(graphstore.units(stored, offset, limit))
+    
+    endpoints = ('source', 'target') if query == 'path' else ('node',)
+    node_ids = [request.GET.get(name, '') for name in endpoints]
+    if not all(node_ids):
+        return JsonResponse({"error": f"No {' or '.join(endpoints)} provided"}, status=400)
+    for node_id in node_ids:
+        if not graphstore.has_node(stored, node_id):
+            return JsonResponse({"error": f"Unknown node: {node_id}"}, status=404)
+    if query == 'children':
+        return JsonResponse(graphstore.children(stored, node_ids[0], offset, limit))
+    if query == 'neighborhood':
+        return JsonResponse(graphstore.neighborhood(stored, node_ids[0], min(hops, options['MAX_HOPS']), limit))
+    directed = request.GET.get('directed', '1') not in ('0', 'false', 'off')
+    return JsonResponse(graphstore.path(stored, *node_ids, options['MAX_PATH_LENGTH'], directed))
+
+@require_GET
+def metrics(request):
+    """Expose the stage and request timings and cache counters in the Prometheus text format."""
+    stats = get_result_cache().stats()
+    body = get_registry().render() + render_counters(
+        'code_visualizer_result_cache_requests_total', "Result cache lookups by outcome.",
+        {(('result', 'hit'),): stats["hits"] - stats["shared_hits"],
+         (('result', 'shared_hit'),): stats["shared_hits"],
+         (('result', 'miss'),): stats["misses"]},
+    )
+    return HttpResponse(body, content_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,109 @@
+"""Compact columnar wire format and response compression."""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+COMPACT_MEDIA_TYPE = 'application/vnd.code-visualizer.compact+json'
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def wants_compact(request):
+    """Return True if the client asked for the compact format.
+
+    ``format=compact`` (POST or query string) or an ``Accept`` header that
+    names the compact media type opts in; verbose JSON stays the default.
+    """
+    requested = request.POST.get('format') or request.GET.get('format')
+    if requested:
+        return requested == 'compact'
+    return COMPACT_MEDIA_TYPE in request.headers.get('Accept', '')
+
+
+def compact_graph(graph):
+    """Encode a ``{"nodes", "edges"}`` graph into columns.
+
+    Nodes are identified by their position. ``labels`` is a deduplicated
+    string table: node labels and string edge attributes (``edge_attrs``)
+    are indexes into it. Other node attributes (e.g. layout coordinates)
+    and other edge attributes (``edge_values``, e.g. the ``count`` of
+    shared subtrees) are plain columns.
+    """
+    labels = []
+    label_index = {}
+
+    def intern(text):
+        position = label_index.get(text)
+        if position is None:
+            position = label_index[text] = len(labels)
+            labels.append(text)
+        return position
+
+    nodes = graph["nodes"]
+    index = {node["id"]: position for position, node in enumerate(nodes)}
+    node_attrs = {}
+    for position, node in enumerate(nodes):
+        for name, value in node.items():
+            if name not in ('id', 'label'):
+                node_attrs.setdefault(name, [None] * len(nodes))[position] = value
+
+    edges = graph["edges"]
+    edge_columns = {}
+    for position, edge in enumerate(edges):
+        for name, value in edge.items():
+            if name not in ('source', 'target'):
+                edge_columns.setdefault(name, [None] * len(edges))[position] = value
+    edge_attrs = {}
+    edge_values = {}
+    for name, column in edge_columns.items():
+        if all(value is None or isinstance(value, str) for value in column):
+            edge_attrs[name] = [-1 if value is None else intern(value) for value in column]
+        else:
+            edge_values[name] = column
+
+    encoded = {key: value for key, value in graph.items() if key not in ('nodes', 'edges')}
+    encoded.update({
+        "labels": labels,
+        "nodes": [intern(node["label"]) for node in nodes],
+        "source": [index[edge["source"]] for edge in edges],
+        "target": [index[edge["target"]] for edge in edges],
+    })
+    if node_attrs:
+        encoded["node_attrs"] = node_attrs
+    if edge_attrs:
+        encoded["edge_attrs"] = edge_attrs
+    if edge_values:
+        encoded["edge_values"] = edge_values
+    return encoded
+
+
+def compact_payload(result, graph_names):
+    """Encode every graph in a visualization result."""
+    payload = {"format": "compact"}
+    for key, value in result.items():
+        payload[key] = compact_graph(value) if key in graph_names else value
+    return payload
+
+
+def choose_encoding(request):
+    """Return the best supported content coding the client accepts, or None."""
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(payload, encoding):
+    """Compress ``payload`` with the given content coding."""
+    if encoding == 'br':
+        return brotli.compress(payload)
+    if encoding == 'gzip':
+        return gzip.compress(payload, compresslevel=6)
+    return payload
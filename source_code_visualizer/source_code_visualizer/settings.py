@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'code_visualizer.metrics.metrics_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -122,3 +123,88 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache for serialized visualization results. BACKEND may name an alias
+# from CACHES to share results between worker processes. Parsed Java trees
+# are memoized by content; JAVA_PARSE_DIR, if set, is a private directory
+# where they are also pickled for restarts and other workers.
+CODE_VISUALIZER_CACHE = {
+    'MAX_BYTES': 64 * 1024 * 1024,
+    'BACKEND': None,
+    'PARSE_TTL': 300,
+    'PARSE_MAX_ENTRIES': 32,
+    'JAVA_PARSE_MAX_ENTRIES': 64,
+    'JAVA_PARSE_DIR': None,
+}
+
+# Optional caps on the number of tree nodes and the nesting depth the graph
+# builders will walk. None disables a cap.
+CODE_VISUALIZER_LIMITS = {
+    'MAX_NODES': None,
+    'MAX_DEPTH': None,
+}
+
+# Level-of-detail summaries (summary=1). Graphs with more than MAX_NODES
+# nodes are summarized: the AST is cut off below MAX_DEPTH levels or when the
+# budget runs out, the other graphs are clustered by function and class.
+CODE_VISUALIZER_SUMMARY = {
+    'MAX_NODES': 500,
+    'MAX_DEPTH': 8,
+}
+
+# Multi-file analysis (POST /visualize/batch/ and manage.py visualize_batch).
+# WORKERS defaults to the CPU count; MAX_BYTES is the total uncompressed size.
+CODE_VISUALIZER_BATCH = {
+    'WORKERS': None,
+    'MAX_FILES': 500,
+    'MAX_BYTES': 50 * 1024 * 1024,
+}
+
+# Worker pool behind the async endpoints (/visualize/async/...). KIND is
+# 'thread' or 'process'; WORKERS defaults to the CPU count. Requests beyond
+# WORKERS + MAX_QUEUE get a 503, and analyses longer than TIMEOUT seconds
+# a 504.
+CODE_VISUALIZER_WORKERS = {
+    'KIND': 'thread',
+    'WORKERS': None,
+    'MAX_QUEUE': 16,
+    'TIMEOUT': 30,
+}
+
+# Background jobs (POST /jobs/). WORKERS is the number of worker processes;
+# 0 runs jobs inline in the web process. Progress is saved to the database
+# at most every PROGRESS_INTERVAL seconds; jobs running for longer than
+# STALE_AFTER seconds are considered abandoned.
+CODE_VISUALIZER_JOBS = {
+    'WORKERS': 2,
+    'PROGRESS_INTERVAL': 0.5,
+    'STALE_AFTER': 600,
+}
+
+# Request and stage timings, exposed at /metrics. SERVER_TIMING adds a
+# Server-Timing header with the stages of each request. With PROFILE set,
+# staff users can add ?profile=1 (sampled, collapsed stacks for flame
+# graphs) or ?profile=cprofile (a cProfile dump) to a request.
+CODE_VISUALIZER_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'PROFILE': True,
+    'PROFILE_INTERVAL': 0.005,
+}
+
+# Graphs stored for paged queries (POST /graphs/). Pages hold PAGE_SIZE
+# nodes unless the client asks for up to MAX_PAGE_SIZE; neighborhoods reach
+# at most MAX_HOPS edges and paths at most MAX_PATH_LENGTH.
+CODE_VISUALIZER_GRAPH_STORE = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+    'MAX_HOPS': 3,
+    'MAX_PATH_LENGTH': 64,
+}
+
+# Language front ends are imported on first use, so a process that only
+# ever sees Python never loads the Java parser. With PRELOAD they are all
+# imported when Django starts, e.g. before a prefork server forks.
+CODE_VISUALIZER_FRONTENDS = {
+    'PRELOAD': False,
+}